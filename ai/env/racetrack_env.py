@@ -0,0 +1,180 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from ..ppo.ppo_reward import calculate_reward
+from .track import FJC_CONFIG_PATH, RAYS_MODEL_PATH, REPO_ROOT
+from .track_index import TRACK_CACHE_PATH, load_track_index
+
+COMMON_CONFIG_PATH = os.path.join(REPO_ROOT, 'ui', 'static', 'common-with-flask-config.json')
+
+# Ray directions relative to the car heading, in the order Racetrack.getState reports them:
+# left, right, forward, forwardLeft1, forwardLeft2, forwardRight1, forwardRight2
+RAY_ANGLES = np.array([np.pi / 2, -np.pi / 2, 0.0, np.pi / 8, np.pi / 4, -np.pi / 8, -np.pi / 4])
+
+
+class RacetrackEnv:
+    """
+    Headless NumPy stand-in for the Three.js racetrack used in training mode.
+
+    Reproduces the contract between Racetrack.js and app.py: the 11 normalized
+    observations of Racetrack.getState, the action indices of action_mappings in
+    common-with-flask-config.json, the win/death rules of Racetrack.aiTick and the
+    reward of Agent.calculateReward. The car is a kinematic bicycle model tuned to
+    the limits in Physics.js, and the walls are the boxes of racetrackRays.glb
+    flattened into 2D boundary segments.
+
+    The API follows Gym: reset() returns an observation and step(action) returns
+    (observation, reward, done, info).
+    """
+
+    # Timing of the UI: 60 physics ticks per second, one decision every call_frequency ticks
+    physics_dt = 1 / 60
+    ticks_per_action = 15
+    collision_check_ticks = 5
+
+    # Racetrack.js limits
+    max_ray_length = 20
+    ray_miss_distance = 1000
+    tolerance_distance_rays = 0.8
+    stall_speed = 0.001
+    stall_time = 5.0
+
+    # Physics.js car options
+    max_speed = 0.075 * 60
+    acceleration = 2.0
+    rolling_friction = 1.0
+    steering_speed = 0.005 * 1000 / 60
+    steering_max = np.pi * 0.07
+    wheelbase = 0.635 + 0.475
+    ride_height = 0.5
+
+    start_position = (0.0, 0.0)
+    start_heading = np.pi
+
+    def __init__(self, max_steps=2000, start_heading_noise=0.05, seed=None,
+                 rays_model_path=RAYS_MODEL_PATH, fjc_config_path=FJC_CONFIG_PATH,
+                 common_config_path=COMMON_CONFIG_PATH, track_cache_path=TRACK_CACHE_PATH):
+        with open(common_config_path) as f:
+            common_config = json.load(f)
+        self.state_space = common_config['state_space']
+        self.action_space = common_config['action_space']
+        self.controls = np.array([[common_config['action_mappings'][str(i)].get(action, False)
+                                   for action in ('up', 'left', 'right')]
+                                  for i in range(self.action_space)], dtype=bool)
+
+        self.max_steps = max_steps
+        self.start_heading_noise = start_heading_noise
+        self.rng = np.random.default_rng(seed)
+
+        # Observations clip rays at max_ray_length, so only distances up to it need to be exact
+        self.track = load_track_index(rays_model_path, fjc_config_path, radius=self.max_ray_length,
+                                      cache_path=track_cache_path)
+        self.segments, self.wall_z = self.track.segments, self.track.wall_z
+        self.centerline = self.track.centerline
+        self.centerline_lengths = self.track.centerline_lengths
+        self.centerline_offsets = self.track.centerline_offsets
+        self.track_length = self.track.track_length
+
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.x, self.y = self.start_position
+        self.heading = self.start_heading + float(self.rng.normal(0.0, self.start_heading_noise))
+        self.speed = 0.0
+        self.steering = 0.0
+        self.left = False
+        self.right = False
+        self.elapsed = 0.0
+        self.steps = 0
+        self.segment_index = 0
+        self.percent_completed = 0.0
+        self.car_z = self.centerline[0, 2] + self.ride_height
+        self.ray_lengths = self._cast_rays()
+        self.last_observation = self.observation()
+        return self.last_observation
+
+    def _update_progress(self):
+        # Same local search as Racetrack.getClosestPointOnLineSegments: only the
+        # neighbouring segments are considered, so the bridge crossing is unambiguous
+        start = max(0, self.segment_index - 1)
+        end = min(len(self.centerline) - 2, self.segment_index + 1)
+        a = self.centerline[start:end + 1]
+        b = self.centerline[start + 1:end + 2]
+        ab = b[:, :2] - a[:, :2]
+        t = np.clip(((self.x - a[:, 0]) * ab[:, 0] + (self.y - a[:, 1]) * ab[:, 1])
+                    / (ab ** 2).sum(axis=1), 0.0, 1.0)
+        closest = a + t[:, None] * (b - a)
+        distance = np.hypot(closest[:, 0] - self.x, closest[:, 1] - self.y)
+        i = int(distance.argmin())
+
+        self.segment_index = start + i
+        self.car_z = closest[i, 2] + self.ride_height
+        completed = self.centerline_offsets[self.segment_index] + t[i] * self.centerline_lengths[self.segment_index]
+        self.percent_completed = float(completed / self.track_length * 100)
+
+    def _cast_rays(self):
+        # Only walls spanning the car's height are hit, like the 3D raycaster
+        return self.track.cast_rays((self.x, self.y), self.heading + RAY_ANGLES, self.car_z, self.ray_miss_distance)
+
+    def observation(self):
+        rays = np.minimum(self.ray_lengths, self.max_ray_length) / self.max_ray_length
+        return np.array([self.percent_completed / 100,
+                         self.speed * self.physics_dt * 10,
+                         self.left,
+                         self.right,
+                         *rays], dtype=np.float32)
+
+    def _physics_tick(self, up):
+        strength = self.steering_speed
+        if self.right:
+            self.steering -= strength
+        elif self.left:
+            self.steering += strength
+        elif abs(self.steering) > strength:
+            self.steering -= math.copysign(strength, self.steering)
+        else:
+            self.steering = 0.0
+        self.steering = min(max(self.steering, -self.steering_max), self.steering_max)
+
+        if up:
+            self.speed = min(self.speed + self.acceleration * self.physics_dt, self.max_speed)
+        else:
+            self.speed = max(self.speed - self.rolling_friction * self.physics_dt, 0.0)
+
+        self.heading += self.speed / self.wheelbase * math.tan(self.steering) * self.physics_dt
+        self.x += self.speed * math.cos(self.heading) * self.physics_dt
+        self.y += self.speed * math.sin(self.heading) * self.physics_dt
+        self.elapsed += self.physics_dt
+
+    def step(self, action):
+        up, self.left, self.right = self.controls[int(action)].tolist()
+        crashed = False
+        for tick in range(1, self.ticks_per_action + 1):
+            self._physics_tick(up)
+            if tick % self.collision_check_ticks == 0 or tick == self.ticks_per_action:
+                self._update_progress()
+                self.ray_lengths = self._cast_rays()
+                if self.percent_completed >= 100:
+                    break
+                if self.ray_lengths.min() <= self.tolerance_distance_rays:
+                    crashed = True
+                    break
+        self.steps += 1
+
+        observation = self.observation()
+        win = self.percent_completed >= 100
+        stalled = self.speed * self.physics_dt < self.stall_speed and self.elapsed > self.stall_time
+        truncated = self.steps >= self.max_steps
+        done = bool(win or crashed or stalled or truncated)
+
+        reward = calculate_reward(self.last_observation, observation, done, win)
+        self.last_observation = observation
+        info = {"win": bool(win), "crashed": crashed, "stalled": stalled,
+                "truncated": truncated and not (win or crashed or stalled),
+                "percent_completed": self.percent_completed}
+        return observation, reward, done, info
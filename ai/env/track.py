@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import struct
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+RAYS_MODEL_PATH = os.path.join(REPO_ROOT, 'ui', 'src', 'models', 'racetrack', 'racetrackRays.glb')
+FJC_CONFIG_PATH = os.path.join(REPO_ROOT, 'ui', 'src', 'javascript', 'fjcConfig.js')
+
+
+def read_glb_json(path):
+    """
+    Read the JSON chunk of a binary glTF (.glb) file.
+
+    Args:
+    path (str): Path to the .glb file.
+
+    Returns:
+    dict: The parsed glTF document.
+    """
+    with open(path, 'rb') as f:
+        magic, _, _ = struct.unpack('<4sII', f.read(12))
+        if magic != b'glTF':
+            raise ValueError(f"{path} is not a binary glTF file")
+        chunk_length, chunk_type = struct.unpack('<I4s', f.read(8))
+        if chunk_type != b'JSON':
+            raise ValueError(f"{path} does not start with a JSON chunk")
+        return json.loads(f.read(chunk_length))
+
+
+def _node_matrix(node):
+    if 'matrix' in node:
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T
+
+    x, y, z, w = node.get('rotation', [0, 0, 0, 1])
+    rotation = np.array([
+        [1 - 2*(y*y + z*z), 2*(x*y - z*w), 2*(x*z + y*w)],
+        [2*(x*y + z*w), 1 - 2*(x*x + z*z), 2*(y*z - x*w)],
+        [2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x*x + y*y)],
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get('scale', [1, 1, 1]))
+    matrix[:3, 3] = node.get('translation', [0, 0, 0])
+    return matrix
+
+
+def load_wall_segments(path=RAYS_MODEL_PATH):
+    """
+    Extract the 2D track boundary from the racetrack raycasting model.
+
+    Every mesh in racetrackRays.glb is a wall box. Each box is transformed to world
+    space from its POSITION bounds and node transforms, and its footprint in the
+    x-y plane becomes four boundary segments. The world-space z range is kept so
+    walls on the bridge and on the road underneath it can be told apart.
+
+    Args:
+    path (str): Path to the .glb model.
+
+    Returns:
+    tuple: (segments, z_ranges) where segments has shape [n, 2, 2] (start and end
+        x-y points) and z_ranges has shape [n, 2] (min and max z of the wall).
+    """
+    gltf = read_glb_json(path)
+    segments = []
+    z_ranges = []
+
+    def visit(node_index, parent_matrix):
+        node = gltf['nodes'][node_index]
+        matrix = parent_matrix @ _node_matrix(node)
+        if 'mesh' in node:
+            for primitive in gltf['meshes'][node['mesh']]['primitives']:
+                accessor = gltf['accessors'][primitive['attributes']['POSITION']]
+                lo, hi = accessor['min'], accessor['max']
+                corners = np.array([[x, y, z, 1.0] for x in (lo[0], hi[0])
+                                    for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+                world = (matrix @ corners.T).T[:, :3]
+                # Footprint corners in order around the box (bottom face)
+                footprint = world[[0, 2, 6, 4], :2]
+                for i in range(4):
+                    segments.append([footprint[i], footprint[(i + 1) % 4]])
+                    z_ranges.append([world[:, 2].min(), world[:, 2].max()])
+        for child in node.get('children', []):
+            visit(child, matrix)
+
+    scene = gltf['scenes'][gltf.get('scene', 0)]
+    for node_index in scene['nodes']:
+        visit(node_index, np.eye(4))
+
+    return np.array(segments, dtype=np.float64), np.array(z_ranges, dtype=np.float64)
+
+
+def load_centerline(path=FJC_CONFIG_PATH):
+    """
+    Read the track centerline (pointsForLine) used for progress in the UI.
+
+    Args:
+    path (str): Path to fjcConfig.js.
+
+    Returns:
+    numpy.ndarray: Centerline points with shape [n, 3].
+    """
+    with open(path) as f:
+        source = f.read()
+    block = source[source.index('pointsForLine'):]
+    number = r'(-?\d+(?:\.\d+)?)'
+    points = re.findall(rf'x:\s*{number},\s*y:\s*{number},\s*z:\s*{number}', block)
+    return np.array(points, dtype=np.float64)
+
+
+def cast_rays(origin, angles, segments, max_distance=1000.0):
+    """
+    Distance from origin to the nearest segment along each ray direction.
+
+    Args:
+    origin (array-like): Ray origin (x, y).
+    angles (array-like): World-space ray angles in radians.
+    segments (numpy.ndarray): Boundary segments with shape [n, 2, 2].
+    max_distance (float): Distance reported for rays that hit nothing.
+
+    Returns:
+    numpy.ndarray: Hit distance for each angle.
+    """
+    origins = np.asarray(origin, dtype=np.float64)[None]
+    return cast_rays_batched(origins, np.asarray(angles)[None], segments, max_distance=max_distance)[0]
+
+
+def cast_rays_batched(origins, angles, segments, active=None, max_distance=1000.0):
+    """
+    Cast every ray of every car against every segment in one vectorized call.
+
+    Args:
+    origins (numpy.ndarray): Ray origins with shape [cars, 2].
+    angles (numpy.ndarray): World-space ray angles with shape [cars, rays].
+    segments (numpy.ndarray): Boundary segments shared by all cars with shape [n, 2, 2],
+        or each car's own segments with shape [cars, n, 2, 2].
+    active (numpy.ndarray, optional): Boolean mask [cars, n] of the segments each car can hit.
+    max_distance (float): Distance reported for rays that hit nothing.
+
+    Returns:
+    numpy.ndarray: Hit distances with shape [cars, rays].
+    """
+    dx = np.cos(angles)[..., None]
+    dy = np.sin(angles)[..., None]
+    sx = (segments[..., 0, 0] - origins[:, 0:1])[:, None, :]
+    sy = (segments[..., 0, 1] - origins[:, 1:2])[:, None, :]
+    ex = (segments[..., 1, 0] - segments[..., 0, 0])[..., None, :]
+    ey = (segments[..., 1, 1] - segments[..., 0, 1])[..., None, :]
+
+    # Solve origin + t * direction = start + u * edge; parallel pairs get denom 0 and never hit
+    denom = dx * ey - dy * ex
+    parallel = denom == 0
+    denom = np.where(parallel, 1.0, denom)
+    t = (sx * ey - sy * ex) / denom
+    u = (sx * dy - sy * dx) / denom
+    hit = ~parallel & (t > 0) & (u >= 0) & (u <= 1)
+    if active is not None:
+        hit &= active[:, None, :]
+    return np.where(hit, t, max_distance).min(axis=-1)
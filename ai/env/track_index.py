@@ -0,0 +1,289 @@
+import hashlib
+import math
+import os
+
+import numpy as np
+
+from .track import FJC_CONFIG_PATH, RAYS_MODEL_PATH, REPO_ROOT, cast_rays, cast_rays_batched, load_centerline, \
+    load_wall_segments
+
+TRACK_CACHE_PATH = os.path.join(REPO_ROOT, 'ai', 'env', 'track_cache.npz')
+# Bump when the cached arrays change meaning, so stale caches are rebuilt
+CACHE_VERSION = 1
+
+
+def _point_rect_distance(points, lo, hi):
+    """Distance from points [..., 2] to axis-aligned rectangles [lo, hi]."""
+    gap = np.maximum(np.maximum(lo - points, points - hi), 0.0)
+    return np.hypot(gap[..., 0], gap[..., 1])
+
+
+def _point_segment_distance(points, a, b):
+    """Distance from points [..., 2] to segments a-b [..., 2]."""
+    ab = b - a
+    length_squared = np.maximum((ab ** 2).sum(axis=-1), 1e-12)
+    t = np.clip(((points - a) * ab).sum(axis=-1) / length_squared, 0.0, 1.0)
+    closest = a + t[..., None] * ab
+    return np.hypot(points[..., 0] - closest[..., 0], points[..., 1] - closest[..., 1])
+
+
+def _segment_crosses_rect(a, b, lo, hi):
+    """Liang-Barsky clipping: whether segments a-b [..., 2] pass through rectangles [lo, hi]."""
+    d = b - a
+    t0 = np.zeros(np.broadcast_shapes(a.shape[:-1], lo.shape[:-1]))
+    t1 = np.ones_like(t0)
+    inside = np.ones(t0.shape, dtype=bool)
+    for axis in range(2):
+        p, lo_gap, hi_gap = d[..., axis], lo[..., axis] - a[..., axis], hi[..., axis] - a[..., axis]
+        parallel = p == 0
+        inside &= ~parallel | ((lo_gap <= 0) & (hi_gap >= 0))
+        safe = np.where(parallel, 1.0, p)
+        enter = np.where(parallel, -np.inf, np.minimum(lo_gap / safe, hi_gap / safe))
+        leave = np.where(parallel, np.inf, np.maximum(lo_gap / safe, hi_gap / safe))
+        t0, t1 = np.maximum(t0, enter), np.minimum(t1, leave)
+    return inside & (t0 <= t1)
+
+
+def _segment_rect_distance(a, b, lo, hi):
+    """Smallest distance between segments a-b and rectangles [lo, hi] (0 where they overlap)."""
+    corners = [lo, np.stack([lo[..., 0], hi[..., 1]], axis=-1), hi, np.stack([hi[..., 0], lo[..., 1]], axis=-1)]
+    distance = np.minimum(_point_rect_distance(a, lo, hi), _point_rect_distance(b, lo, hi))
+    for corner in corners:
+        distance = np.minimum(distance, _point_segment_distance(corner, a, b))
+    return np.where(_segment_crosses_rect(a, b, lo, hi), 0.0, distance)
+
+
+def _compressed_rows(mask):
+    """Row start offsets and column indices of a boolean [rows, columns] mask (CSR layout)."""
+    counts = mask.sum(axis=1)
+    starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return starts, np.nonzero(mask)[1].astype(np.int32)
+
+
+def build_track_arrays(segments, wall_z, centerline, radius, cell_size):
+    """
+    Precompute the geometry tables behind TrackIndex.
+
+    The grid covers the walls' bounding box grown by radius. Each cell lists
+    the walls within radius of any point in it, so a ray query from the cell
+    only tests those walls and still finds every hit up to radius away; points
+    outside the grid have no wall within radius. Each cell also lists the
+    centerline segments that can be the closest one to a point in it: those no
+    farther from the cell than the smallest distance guaranteed to reach some
+    segment from anywhere in the cell.
+
+    Args:
+    segments (numpy.ndarray): Wall segments [n, 2, 2] from load_wall_segments.
+    wall_z (numpy.ndarray): Wall z ranges [n, 2].
+    centerline (numpy.ndarray): Centerline points [m, 3] from load_centerline.
+    radius (float): Largest ray distance that must be exact.
+    cell_size (float): Side of a grid cell.
+
+    Returns:
+    dict: Arrays to pass to TrackIndex or save with np.savez.
+    """
+    points = segments.reshape(-1, 2)
+    origin = points.min(axis=0) - radius
+    shape = np.ceil((points.max(axis=0) + radius - origin) / cell_size).astype(np.int64)
+    ix, iy = np.meshgrid(np.arange(shape[0]), np.arange(shape[1]), indexing='ij')
+    lo = origin + np.stack([ix.ravel(), iy.ravel()], axis=1) * cell_size
+    lo, hi = lo[:, None], (lo + cell_size)[:, None]
+
+    # Slack so rounding never drops a wall exactly radius away; cells in blocks to bound memory on big tracks
+    near = np.concatenate([_segment_rect_distance(segments[None, :, 0], segments[None, :, 1],
+                                                  lo[i:i + 1024], hi[i:i + 1024]) <= radius * (1 + 1e-9)
+                           for i in range(0, len(lo), 1024)])
+    wall_starts, wall_cells = _compressed_rows(near)
+
+    a, b = centerline[None, :-1, :2], centerline[None, 1:, :2]
+    corners = [lo, np.stack([lo[..., 0], hi[..., 1]], axis=-1), hi, np.stack([hi[..., 0], lo[..., 1]], axis=-1)]
+    farthest = np.max([_point_segment_distance(corner, a, b) for corner in corners], axis=0)
+    reach = farthest.min(axis=1, keepdims=True)
+    line_starts, line_cells = _compressed_rows(_segment_rect_distance(a, b, lo, hi) <= reach * (1 + 1e-9))
+
+    lengths = np.linalg.norm(np.diff(centerline, axis=0), axis=1)
+    return {
+        "segments": segments, "wall_z": wall_z, "centerline": centerline,
+        "centerline_lengths": lengths, "centerline_offsets": np.concatenate([[0.0], np.cumsum(lengths)]),
+        "grid_origin": origin, "grid_shape": shape, "cell_size": np.float64(cell_size), "radius": np.float64(radius),
+        "wall_starts": wall_starts, "wall_cells": wall_cells, "line_starts": line_starts, "line_cells": line_cells,
+    }
+
+
+class TrackIndex:
+    """
+    Track geometry with a uniform grid over the walls and the centerline.
+
+    Answers the two per-tick queries of the racetrack from the handful of
+    walls or centerline segments near the car instead of all of them: ray
+    distances (exact up to radius; farther walls may be reported as misses)
+    and the track progress of arbitrary points, from the cumulative arc
+    length of the centerline. Built by build_track_arrays or loaded from the
+    cache written by load_track_index.
+    """
+
+    def __init__(self, segments, wall_z, centerline, centerline_lengths, centerline_offsets, grid_origin,
+                 grid_shape, cell_size, radius, wall_starts, wall_cells, line_starts, line_cells, **_):
+        self.segments = segments
+        self.wall_z = wall_z
+        self.centerline = centerline
+        self.centerline_lengths = centerline_lengths
+        self.centerline_offsets = centerline_offsets
+        self.track_length = float(centerline_offsets[-1])
+        self.grid_origin = tuple(float(v) for v in grid_origin)
+        self.grid_shape = tuple(int(n) for n in grid_shape)
+        self.cell_size = float(cell_size)
+        self.radius = float(radius)
+        self.wall_starts, self.wall_cells = wall_starts, wall_cells
+        self.line_starts, self.line_cells = line_starts, line_cells
+        self._wall_bounds = wall_starts.tolist()
+        self._cell_segments = segments[wall_cells]
+        self._cell_wall_z = wall_z[wall_cells]
+
+    def cells(self, x, y):
+        """Grid cell of each point, or -1 outside the grid."""
+        ix = np.floor((np.asarray(x) - self.grid_origin[0]) / self.cell_size).astype(np.int64)
+        iy = np.floor((np.asarray(y) - self.grid_origin[1]) / self.cell_size).astype(np.int64)
+        inside = (ix >= 0) & (ix < self.grid_shape[0]) & (iy >= 0) & (iy < self.grid_shape[1])
+        return np.where(inside, ix * self.grid_shape[1] + iy, -1)
+
+    @staticmethod
+    def _gather(cells, starts, members):
+        """Padded [points, k] member indices of each point's cell and the mask of real entries."""
+        counts = np.where(cells >= 0, starts[cells + 1] - starts[cells], 0)
+        width = int(counts.max()) if counts.size else 0
+        offsets = np.arange(width)
+        valid = offsets < counts[:, None]
+        positions = np.where(valid, starts[np.maximum(cells, 0)][:, None] + offsets, 0)
+        return np.where(valid, members[np.minimum(positions, len(members) - 1)], 0), valid
+
+    def cast_rays(self, origin, angles, z, max_distance=1000.0):
+        """
+        Ray distances from one car, like track.cast_rays over the walls spanning height z.
+
+        Args:
+        origin (tuple): Ray origin (x, y).
+        angles (numpy.ndarray): World-space ray angles in radians.
+        z (float): Height of the car; only walls spanning it are hit.
+        max_distance (float): Distance reported for rays that hit nothing.
+
+        Returns:
+        numpy.ndarray: Hit distance for each angle, exact up to self.radius.
+        """
+        ix = math.floor((origin[0] - self.grid_origin[0]) / self.cell_size)
+        iy = math.floor((origin[1] - self.grid_origin[1]) / self.cell_size)
+        if not (0 <= ix < self.grid_shape[0] and 0 <= iy < self.grid_shape[1]):
+            return np.full(len(angles), float(max_distance))
+        cell = ix * self.grid_shape[1] + iy
+        # Walls stored cell by cell, so a cell's walls are a slice rather than a gather
+        start, end = self._wall_bounds[cell], self._wall_bounds[cell + 1]
+        wall_z = self._cell_wall_z[start:end]
+        segments = self._cell_segments[start:end][(wall_z[:, 0] <= z) & (wall_z[:, 1] >= z)]
+        if not len(segments):
+            return np.full(len(angles), float(max_distance))
+        return cast_rays(origin, angles, segments, max_distance)
+
+    def cast_rays_batched(self, origins, angles, z, max_distance=1000.0):
+        """
+        Ray distances of many cars, like track.cast_rays_batched with each car's height mask.
+
+        Args:
+        origins (numpy.ndarray): Ray origins [cars, 2].
+        angles (numpy.ndarray): World-space ray angles [cars, rays].
+        z (numpy.ndarray): Height of each car [cars].
+        max_distance (float): Distance reported for rays that hit nothing.
+
+        Returns:
+        numpy.ndarray: Hit distances [cars, rays], exact up to self.radius.
+        """
+        walls, valid = self._gather(self.cells(origins[:, 0], origins[:, 1]), self.wall_starts, self.wall_cells)
+        if not valid.any():
+            return np.full(angles.shape, float(max_distance))
+        active = valid & (self.wall_z[walls, 0] <= z[:, None]) & (self.wall_z[walls, 1] >= z[:, None])
+        return cast_rays_batched(origins, angles, self.segments[walls], active, max_distance)
+
+    def progress(self, points):
+        """
+        Track progress of points from the closest centerline segment, as Racetrack.js computes it.
+
+        Distances are measured in the x-y plane, so where the track crosses
+        itself at the bridge either level may be chosen; the simulators keep
+        following the car's previous segment there instead.
+
+        Args:
+        points (numpy.ndarray): Positions [n, 2].
+
+        Returns:
+        tuple: (closest centerline segment [n], % of the track completed [n]).
+        """
+        points = np.asarray(points, dtype=np.float64)
+        cells = self.cells(points[:, 0], points[:, 1])
+        candidates, valid = self._gather(cells, self.line_starts, self.line_cells)
+        # Points outside the grid fall back to every segment
+        outside = cells < 0
+        if outside.any():
+            every = np.arange(len(self.centerline) - 1)
+            width = max(candidates.shape[1], len(every))
+            candidates = np.pad(candidates, ((0, 0), (0, width - candidates.shape[1])))
+            valid = np.pad(valid, ((0, 0), (0, width - valid.shape[1])))
+            candidates[outside, :len(every)] = every
+            valid[outside, :len(every)] = True
+
+        a, b = self.centerline[candidates, :2], self.centerline[candidates + 1, :2]
+        ab = b - a
+        t = np.clip(((points[:, None] - a) * ab).sum(axis=-1) / (ab ** 2).sum(axis=-1), 0.0, 1.0)
+        closest = a + t[..., None] * ab
+        distance = np.where(valid, np.hypot(*(closest - points[:, None]).transpose(2, 0, 1)), np.inf)
+        best = distance.argmin(axis=1)
+        rows = np.arange(len(points))
+        segment = candidates[rows, best]
+        completed = self.centerline_offsets[segment] + t[rows, best] * self.centerline_lengths[segment]
+        return segment, completed / self.track_length * 100
+
+
+def _cache_key(rays_model_path, fjc_config_path, radius, cell_size):
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{float(radius)!r}:{float(cell_size)!r}".encode())
+    for path in (rays_model_path, fjc_config_path):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_track_index(rays_model_path=RAYS_MODEL_PATH, fjc_config_path=FJC_CONFIG_PATH, radius=20.0, cell_size=2.0,
+                     cache_path=TRACK_CACHE_PATH):
+    """
+    Load the track geometry and its grid, from the cache if it matches the sources.
+
+    The cache is an .npz file keyed by a hash of racetrackRays.glb,
+    fjcConfig.js, the radius and the cell size, so editing the track or the
+    parameters rebuilds it. It is rewritten atomically, and a cache that
+    cannot be written is not an error.
+
+    Args:
+    rays_model_path (str): Path to racetrackRays.glb.
+    fjc_config_path (str): Path to fjcConfig.js.
+    radius (float): Largest ray distance that must be exact (the ray length the agent observes).
+    cell_size (float): Side of a grid cell.
+    cache_path (str, optional): Cache file, or None to always build.
+
+    Returns:
+    TrackIndex: The track geometry.
+    """
+    key = _cache_key(rays_model_path, fjc_config_path, radius, cell_size)
+    if cache_path is not None and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached["key"]) == key:
+                return TrackIndex(**{name: cached[name] for name in cached.files})
+
+    segments, wall_z = load_wall_segments(rays_model_path)
+    arrays = build_track_arrays(segments, wall_z, load_centerline(fjc_config_path), radius, cell_size)
+    if cache_path is not None:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, key=np.array(key), **arrays)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return TrackIndex(**arrays)
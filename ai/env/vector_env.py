@@ -0,0 +1,153 @@
+import numpy as np
+
+from .racetrack_env import RAY_ANGLES, RacetrackEnv
+
+
+class VectorEnv(RacetrackEnv):
+    """
+    N independent cars on the racetrack, stepped together as NumPy arrays.
+
+    Uses the same track data, constants and observation/reward contract as
+    RacetrackEnv, but keeps positions, headings, speeds and progress as arrays of
+    length num_envs and computes all 7 x N rays in one vectorized call. Cars that
+    finish are reset automatically, so step() always returns the observation the
+    next action should be chosen from.
+
+    step(actions) returns (observations [N, 11], rewards [N], dones [N], infos)
+    where infos is a dict of per-car arrays.
+    """
+
+    def __init__(self, num_envs, **kwargs):
+        self.num_envs = num_envs
+        super().__init__(**kwargs)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        n = self.num_envs
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.heading = np.zeros(n)
+        self.speed = np.zeros(n)
+        self.steering = np.zeros(n)
+        self.left = np.zeros(n, dtype=bool)
+        self.right = np.zeros(n, dtype=bool)
+        self.elapsed = np.zeros(n)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.segment_index = np.zeros(n, dtype=np.int64)
+        self.percent_completed = np.zeros(n)
+        self.car_z = np.zeros(n)
+        self.ray_lengths = np.zeros((n, len(RAY_ANGLES)))
+        self.last_observation = np.zeros((n, self.state_space), dtype=np.float32)
+        self._reset_cars(np.ones(n, dtype=bool))
+        return self.last_observation.copy()
+
+    def _reset_cars(self, mask):
+        count = int(mask.sum())
+        self.x[mask], self.y[mask] = self.start_position
+        self.heading[mask] = self.start_heading + self.rng.normal(0.0, self.start_heading_noise, count)
+        self.speed[mask] = 0.0
+        self.steering[mask] = 0.0
+        self.left[mask] = False
+        self.right[mask] = False
+        self.elapsed[mask] = 0.0
+        self.steps[mask] = 0
+        self.segment_index[mask] = 0
+        self.percent_completed[mask] = 0.0
+        self.car_z[mask] = self.centerline[0, 2] + self.ride_height
+        self.ray_lengths[mask] = self._cast_rays()[mask]
+        self.last_observation[mask] = self.observation()[mask]
+
+    def _update_progress(self, mask):
+        # Vectorized Racetrack.getClosestPointOnLineSegments over each car's neighbouring segments
+        last_segment = len(self.centerline) - 2
+        start = np.clip(self.segment_index - 1, 0, last_segment)
+        candidates = np.minimum(start[:, None] + np.arange(3), last_segment)
+        a = self.centerline[candidates]
+        b = self.centerline[candidates + 1]
+        ab = b[..., :2] - a[..., :2]
+        t = np.clip(((self.x[:, None] - a[..., 0]) * ab[..., 0] + (self.y[:, None] - a[..., 1]) * ab[..., 1])
+                    / (ab ** 2).sum(axis=-1), 0.0, 1.0)
+        closest = a + t[..., None] * (b - a)
+        distance = np.hypot(closest[..., 0] - self.x[:, None], closest[..., 1] - self.y[:, None])
+        best = distance.argmin(axis=1)
+        rows = np.arange(self.num_envs)
+
+        segment_index = candidates[rows, best]
+        completed = self.centerline_offsets[segment_index] + t[rows, best] * self.centerline_lengths[segment_index]
+        self.segment_index = np.where(mask, segment_index, self.segment_index)
+        self.car_z = np.where(mask, closest[rows, best, 2] + self.ride_height, self.car_z)
+        self.percent_completed = np.where(mask, completed / self.track_length * 100, self.percent_completed)
+
+    def _cast_rays(self):
+        origins = np.stack([self.x, self.y], axis=1)
+        return self.track.cast_rays_batched(origins, self.heading[:, None] + RAY_ANGLES, self.car_z,
+                                            self.ray_miss_distance)
+
+    def observation(self):
+        rays = np.minimum(self.ray_lengths, self.max_ray_length) / self.max_ray_length
+        observations = np.empty((self.num_envs, self.state_space), dtype=np.float32)
+        observations[:, 0] = self.percent_completed / 100
+        observations[:, 1] = self.speed * self.physics_dt * 10
+        observations[:, 2] = self.left
+        observations[:, 3] = self.right
+        observations[:, 4:] = rays
+        return observations
+
+    def _physics_tick(self, up, running):
+        strength = self.steering_speed
+        centered = np.where(np.abs(self.steering) > strength,
+                            self.steering - strength * np.sign(self.steering), 0.0)
+        steering = np.where(self.right, self.steering - strength,
+                            np.where(self.left, self.steering + strength, centered))
+        steering = np.clip(steering, -self.steering_max, self.steering_max)
+
+        speed = np.where(up, np.minimum(self.speed + self.acceleration * self.physics_dt, self.max_speed),
+                         np.maximum(self.speed - self.rolling_friction * self.physics_dt, 0.0))
+        heading = self.heading + speed / self.wheelbase * np.tan(steering) * self.physics_dt
+
+        # Cars that already finished during this step stay frozen
+        self.steering = np.where(running, steering, self.steering)
+        self.speed = np.where(running, speed, self.speed)
+        self.heading = np.where(running, heading, self.heading)
+        self.x = np.where(running, self.x + speed * np.cos(heading) * self.physics_dt, self.x)
+        self.y = np.where(running, self.y + speed * np.sin(heading) * self.physics_dt, self.y)
+        self.elapsed = np.where(running, self.elapsed + self.physics_dt, self.elapsed)
+
+    def step(self, actions):
+        controls = self.controls[np.asarray(actions, dtype=np.int64)]
+        up, self.left, self.right = controls[:, 0], controls[:, 1], controls[:, 2]
+
+        running = np.ones(self.num_envs, dtype=bool)
+        crashed = np.zeros(self.num_envs, dtype=bool)
+        for tick in range(1, self.ticks_per_action + 1):
+            self._physics_tick(up, running)
+            if tick % self.collision_check_ticks == 0 or tick == self.ticks_per_action:
+                self._update_progress(running)
+                self.ray_lengths = np.where(running[:, None], self._cast_rays(), self.ray_lengths)
+                finished = running & (self.percent_completed >= 100)
+                crashed |= running & ~finished & (self.ray_lengths.min(axis=1) <= self.tolerance_distance_rays)
+                running &= ~(finished | crashed)
+                if not running.any():
+                    break
+        self.steps += 1
+
+        observations = self.observation()
+        win = self.percent_completed >= 100
+        stalled = (self.speed * self.physics_dt < self.stall_speed) & (self.elapsed > self.stall_time)
+        truncated = self.steps >= self.max_steps
+        dones = win | crashed | stalled | truncated
+
+        # ai/ppo/ppo_reward.calculate_reward, applied to all cars at once
+        rewards = np.where(dones & ~win, -1.0,
+                           (observations[:, 0] - self.last_observation[:, 0]) * 100).astype(np.float32)
+        infos = {"win": win, "crashed": crashed, "stalled": stalled,
+                 "truncated": truncated & ~(win | crashed | stalled),
+                 "percent_completed": self.percent_completed.copy()}
+
+        self.last_observation = observations
+        if dones.any():
+            self._reset_cars(dones)
+            observations = self.last_observation.copy()
+        return observations, rewards, dones, infos
+
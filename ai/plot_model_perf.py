@@ -1,23 +1,16 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
+from ppo.ppo_registry import ModelRegistry
 
-dir_path = './saved_ppo_tf_models/actor'
-dir_names = [name for name in os.listdir(
-    dir_path) if os.path.isdir(os.path.join(dir_path, name))]
 
-episodes = []
-avgs = []
-for dir_name in dir_names:
-    parts = dir_name.split('_')
-    episode_num = int(parts[2])
-    avg_num = float(parts[4])
-    episodes.append(episode_num)
-    avgs.append(avg_num)
+registry = ModelRegistry('./saved_ppo_tf_models/models.jsonl')
+if not registry.exists():
+    registry.rebuild()
 
-sorted_data = sorted(zip(episodes, avgs), key=lambda x: x[0])
-episodes_sorted, avgs_sorted = zip(*sorted_data)
+entries = registry.range()
+episodes_sorted = [entry['episode'] for entry in entries]
+avgs_sorted = [entry['average_track_completion'] for entry in entries]
 
 coefficients = np.polyfit(episodes_sorted, avgs_sorted, 4)
 polynomial = np.poly1d(coefficients)
@@ -1,128 +1,222 @@
 import os
 import numpy as np
 import tensorflow as tf
-from tensorflow_probability.python.distributions import Categorical
 
 # Local imports
 from .ppo_memory import PPOMemory
+from .ppo_advantage import compute_gae
+from .ppo_reward import calculate_reward
+from .ppo_numpy import save_numpy_weights
+from .ppo_normalize import ObservationNormalizer, RewardScaler, normalize_advantages
+from .ppo_registry import ModelRegistry
+from .ppo_telemetry import telemetry
 from .ppo_actor import ActorNetwork
 from .ppo_critic import CriticNetwork
 
 
 class Agent:
-    def __init__(self, n_actions, input_dims, save_folder_actor, save_folder_critic, gamma=0.99, alpha=0.0003, gae_lambda=0.95, policy_clip=0.2, batch_size=64, n_epochs=10, entropy_coeff=0.1):
+    def __init__(self, n_actions, input_dims, save_folder_actor, save_folder_critic, gamma=0.99, alpha=0.0003, gae_lambda=0.95, policy_clip=0.2, batch_size=64, n_epochs=10, entropy_coeff=0.1, jit_compile=False, target_kl=None, normalize_obs=False, scale_rewards=False, normalize_advantage=False, recorder=None):
         self.gamma = gamma
         self.policy_clip = policy_clip
         self.n_epochs = n_epochs
         self.gae_lambda = gae_lambda
         self.entropy_coeff = entropy_coeff
         self.learning_trigger = 100
+        self.n_actions = n_actions
+        self.input_dims = input_dims
+        self.jit_compile = jit_compile
+        # Epochs of an update stop early once their mean approximate KL exceeds this (None runs all n_epochs)
+        self.target_kl = target_kl
+
+        # Optional running statistics (see benchmarks/bench_normalize.py); normalized
+        # observations are what the networks see wherever the policy runs
+        self.obs_normalizer = ObservationNormalizer(input_dims) if normalize_obs else None
+        self.reward_scaler = RewardScaler(gamma) if scale_rewards else None
+        self.normalize_advantage = normalize_advantage
+        # Optional TrajectoryRecorder that keeps every rollout learn trains on, for offline replay
+        self.recorder = recorder
 
         self.actor = ActorNetwork(n_actions, input_dims, alpha)
         self.critic = CriticNetwork(input_dims, alpha)
-        self.memory = PPOMemory(batch_size)
+        self.memory = PPOMemory(batch_size, input_dims)
+        self._policy_and_value = self._build_policy_and_value()
+        self._train_step = self._build_train_step()
 
         self.save_folder_actor = save_folder_actor
         self.save_folder_critic = save_folder_critic
+        self.registry = ModelRegistry.for_save_folders(save_folder_actor) if save_folder_actor else None
 
         self.prev_average_track_completion = 0
+        # Mean losses, entropy, approximate KL and clip fraction of the last learn call
+        self.last_learn_stats = {}
+
+    def remember(self, state, action, probs, vals, reward, done, agent_id=None):
+        self.memory.store_memory(
+            state, action, probs, vals, reward, done, agent_id)
 
-    def remember(self, state, action, probs, vals, reward, done):
-        self.memory.store_memory(state, action, probs, vals, reward, done)
+    def remember_batch(self, states, actions, probs, vals, rewards, dones, agent_ids):
+        self.memory.store_batch(
+            states, actions, probs, vals, rewards, dones, agent_ids)
+
+    def _build_policy_and_value(self):
+        # Actor and critic run in one traced graph that accepts any batch size
+        @tf.function(input_signature=[tf.TensorSpec([None, self.input_dims], tf.float32)])
+        def policy_and_value(states):
+            return self.actor(states), self.critic(states)
+        return policy_and_value
 
     def choose_action(self, observation):
-        state = np.array([observation], dtype=np.float32)
-        pi = self.actor(state)
-        dist = Categorical(probs=pi)
-        action = dist.sample().numpy()[0]
-        value = self.critic(state)
+        actions, probs, values = self.choose_actions([observation])
+        return actions[0], probs[0], values[0]
+
+    def choose_actions(self, observations):
+        """Sample actions for a batch of observations with a single forward pass."""
+        states = np.asarray(observations, dtype=np.float32)
+        if self.obs_normalizer is not None:
+            states = self.obs_normalizer(states)
+        with telemetry.time("forward"):
+            pi, values = self._policy_and_value(states)
+            pi = pi.numpy()
+
+        # Inverse-CDF sampling from each row of the categorical distribution
+        thresholds = np.random.random_sample((len(states), 1)) * pi.sum(axis=1, keepdims=True)
+        actions = np.minimum((pi.cumsum(axis=1) < thresholds).sum(axis=1), self.n_actions - 1)
+
+        probs = np.log(pi[np.arange(len(states)), actions])
+        return actions, probs, values.numpy()[:, 0]
+
+    def _build_train_step(self):
+        # Minibatches always have batch_size rows so the step is traced once; the
+        # final partial minibatch is padded and the padding masked out of every mean
+        batch_size = self.memory.batch_size
+        signature = [tf.TensorSpec([batch_size, self.input_dims], tf.float32),
+                     tf.TensorSpec([batch_size], tf.int32),
+                     tf.TensorSpec([batch_size], tf.float32),
+                     tf.TensorSpec([batch_size], tf.float32),
+                     tf.TensorSpec([batch_size], tf.float32),
+                     tf.TensorSpec([batch_size], tf.float32),
+                     tf.TensorSpec([], tf.float32)]
 
-        probs = np.log(pi[0, action])
-        value = value.numpy()[0, 0]
+        @tf.function(input_signature=signature, jit_compile=self.jit_compile)
+        def train_step(states, actions, old_probs, advantage, returns, mask, entropy_coeff):
+            n_valid = tf.reduce_sum(mask)
+            with tf.GradientTape() as tape:
+                pi = self.actor(states)
+                new_probs = tf.math.log(tf.gather(pi, actions, batch_dims=1))
+                prob_ratio = tf.exp(new_probs - old_probs)
+                weighted_probs = advantage * prob_ratio
+                weighted_clipped_probs = tf.clip_by_value(
+                    prob_ratio, 1-self.policy_clip, 1+self.policy_clip) * advantage
+                actor_loss = -tf.reduce_sum(tf.minimum(
+                    weighted_probs, weighted_clipped_probs) * mask) / n_valid
 
-        return action, probs, value
+                critic_value = self.critic(states)[:, 0]
+                critic_loss = tf.reduce_sum(
+                    tf.square(returns - critic_value) * mask) / n_valid
+
+                entropy = -tf.reduce_sum(tf.math.xlogy(pi, pi), axis=1)
+                entropy_loss = -entropy_coeff * \
+                    tf.reduce_sum(entropy * mask) / n_valid
+
+                total_loss = actor_loss + 0.5 * critic_loss + entropy_loss
+
+            actor_variables = self.actor.trainable_variables
+            critic_variables = self.critic.trainable_variables
+            grads = tape.gradient(total_loss, actor_variables + critic_variables)
+            self.actor.optimizer.apply_gradients(
+                zip(grads[:len(actor_variables)], actor_variables))
+            self.critic.optimizer.apply_gradients(
+                zip(grads[len(actor_variables):], critic_variables))
+            # KL(old || new) estimated as (r - 1) - log r, which is never negative
+            approx_kl = tf.reduce_sum(((prob_ratio - 1) - (new_probs - old_probs)) * mask) / n_valid
+            clipped = tf.cast(tf.abs(prob_ratio - 1) > self.policy_clip, tf.float32)
+            clip_fraction = tf.reduce_sum(clipped * mask) / n_valid
+            return actor_loss, critic_loss, tf.reduce_sum(entropy * mask) / n_valid, approx_kl, clip_fraction
+
+        return train_step
+
+    def _minibatch(self, batch, state_arr, action_arr, old_prob_arr, advantage, returns):
+        n_padding = self.memory.batch_size - len(batch)
+        mask = np.ones(self.memory.batch_size, dtype=np.float32)
+        if n_padding:
+            mask[len(batch):] = 0
+            batch = np.pad(batch, (0, n_padding))
+        return state_arr[batch], action_arr[batch], old_prob_arr[batch], \
+            advantage[batch], returns[batch], mask, np.float32(self.entropy_coeff)
 
     def learn(self, total_completed_games, average_track_completion):
-        if len(self.memory.states) < self.learning_trigger:
+        # Below the trigger the rollout stays in memory for the next call, so it is recorded once
+        if len(self.memory) < self.learning_trigger:
             return False
 
+        if self.recorder is not None:
+            with telemetry.time("record"):
+                self.recorder.record_update(self.memory, total_completed_games, average_track_completion)
+
+        with telemetry.time("generate_batches"):
+            state_arr, action_arr, old_prob_arr, vals_arr, reward_arr, dones_arr, _ = self.memory.generate_batches()
+
+        # The rollout is normalized with the statistics its actions were chosen with;
+        # they only take in the new observations once the update is done
+        with telemetry.time("normalize"):
+            raw_state_arr = state_arr
+            if self.obs_normalizer is not None:
+                state_arr = self.obs_normalizer(state_arr)
+            if self.reward_scaler is not None:
+                self.reward_scaler.update(reward_arr, dones_arr, self.memory.agent_ids)
+                reward_arr = self.reward_scaler(reward_arr)
+
+        # Advantages only depend on the stored rollout, so they are computed once per update.
+        # Each agent's trajectory is scanned as its own segment so interleaved agents never
+        # bootstrap from each other's values.
+        with telemetry.time("gae"):
+            advantage, returns = compute_gae(
+                reward_arr, vals_arr, dones_arr, self.gamma, self.gae_lambda,
+                segment_ids=self.memory.agent_ids)
+        if self.normalize_advantage:
+            advantage = normalize_advantages(advantage)
+
+        epoch_stats = []
         for _ in range(self.n_epochs):
-            state_arr, action_arr, old_prob_arr, vals_arr, reward_arr, dones_arr, batches = self.memory.generate_batches()
-
-            values = vals_arr
-            advantage = np.zeros(len(reward_arr), dtype=np.float32)
-
-            for t in range(len(reward_arr)-1):
-                discount = 1
-                a_t = 0
-                for k in range(t, len(reward_arr)-1):
-                    a_t += discount * \
-                        (reward_arr[k] + self.gamma * values[k+1]
-                         * (1 - int(dones_arr[k])) - values[k])
-                    discount *= self.gamma * self.gae_lambda
-                advantage[t] = a_t
-
-            values = np.array(values, dtype=np.float32)
-            for batch in batches:
-                states = np.array(state_arr[batch], dtype=np.float32)
-                old_probs = np.array(old_prob_arr[batch], dtype=np.float32)
-                actions = np.array(action_arr[batch], dtype=np.int32)
-
-                with tf.GradientTape() as tape_a, tf.GradientTape() as tape_c:
-                    pi = self.actor(states)
-                    dist = Categorical(probs=pi)
-                    new_probs = dist.log_prob(actions)
-                    prob_ratio = tf.exp(new_probs - old_probs)
-                    weighted_probs = advantage[batch] * prob_ratio
-                    weighted_clipped_probs = tf.clip_by_value(
-                        prob_ratio, 1-self.policy_clip, 1+self.policy_clip) * advantage[batch]
-                    actor_loss = - \
-                        tf.reduce_mean(tf.minimum(
-                            weighted_probs, weighted_clipped_probs))
-
-                    critic_value = self.critic(states)
-                    critic_value = tf.squeeze(critic_value)
-                    returns = advantage[batch] + values[batch]
-                    # Ensure returns has the correct shape
-                    returns = tf.expand_dims(returns, 1)
-
-                    critic_loss = self.critic.compiled_loss(
-                        returns, critic_value)
-
-                    entropy = dist.entropy()
-                    entropy_loss = -self.entropy_coeff * \
-                        tf.reduce_mean(entropy)
-
-                    total_loss = actor_loss + 0.5 * critic_loss + entropy_loss
-
-                grad_a = tape_a.gradient(
-                    total_loss, self.actor.trainable_variables)
-                grad_c = tape_c.gradient(
-                    total_loss, self.critic.trainable_variables)
-                self.actor.optimizer.apply_gradients(
-                    zip(grad_a, self.actor.trainable_variables))
-                self.critic.optimizer.apply_gradients(
-                    zip(grad_c, self.critic.trainable_variables))
-
-            # Call adjust_entropy_coeff at the end of the learn method
-            self.adjust_entropy_coeff(
-                average_track_completion, self.prev_average_track_completion)
-            self.prev_average_track_completion = average_track_completion
-            print("Entropy Coeff: ", self.entropy_coeff)
-            # Clear memory and save models
-            self.memory.clear_memory()
-            self.save_models(total_completed_games, average_track_completion)
-            return True
+            step_stats = []
+            for batch in self.memory.generate_batch_indices():
+                with telemetry.time("minibatch"):
+                    minibatch = self._minibatch(batch, state_arr, action_arr, old_prob_arr, advantage, returns)
+                with telemetry.time("train_step"):
+                    step_stats.append(self._train_step(*minibatch))
+            epoch_stats.append(np.mean(np.array(step_stats, dtype=np.float32), axis=0))
+            # Later epochs would move the policy further from the one that collected the rollout
+            if self.target_kl is not None and epoch_stats[-1][3] > self.target_kl:
+                break
+        epoch_stats = np.array(epoch_stats)
+        self.last_learn_stats = dict(zip(
+            ("actor_loss", "critic_loss", "entropy", "approx_kl", "clip_fraction"), epoch_stats.mean(axis=0).tolist()))
+        self.last_learn_stats["epochs"] = len(epoch_stats)
+        self.last_learn_stats["epoch_approx_kl"] = epoch_stats[:, 3].tolist()
+        self.last_learn_stats["epoch_clip_fraction"] = epoch_stats[:, 4].tolist()
+        self.last_learn_stats["transitions"] = len(self.memory)
+        telemetry.count("epochs", len(epoch_stats))
+        if self.obs_normalizer is not None:
+            self.obs_normalizer.update(raw_state_arr)
+
+        # Call adjust_entropy_coeff at the end of the learn method
+        self.adjust_entropy_coeff(
+            average_track_completion, self.prev_average_track_completion)
+        self.prev_average_track_completion = average_track_completion
+        print("Entropy Coeff: ", self.entropy_coeff)
+        print(f"Epochs: {len(epoch_stats)}/{self.n_epochs}, approx KL: {self.last_learn_stats['approx_kl']:.4f}")
+        # Clear memory and save models
+        self.memory.clear_memory()
+        # Agents without save folders (policy copies, offline replay) keep their models in memory
+        if self.save_folder_actor is not None:
+            with telemetry.time("save_models"):
+                self.save_models(total_completed_games, average_track_completion)
+        telemetry.count("updates")
+        return True
 
     # Loss gets -1, anything else is based on % completed difference
     def calculateReward(self, last_state, observation, done, win):
-        if done and not win:
-            return -1  # Penalty for losing the game
-
-        percent_completed = observation[0] * 100
-        last_percent_completed = last_state[0] * 100
-        difference = percent_completed - last_percent_completed
-        return difference
+        return calculate_reward(last_state, observation, done, win)
 
     def adjust_entropy_coeff(self, average_track_completion, prev_average_track_completion):
         pass
@@ -133,6 +227,7 @@ class Agent:
 
     def save_models(self, episode_number, average_track_completion):
         print('... saving models ...')
+        exact_average_track_completion = average_track_completion
         average_track_completion = int(average_track_completion)
         actor_file_path = os.path.join(
             self.save_folder_actor, f'actor_episodes_{episode_number}_avg_{average_track_completion}')
@@ -146,6 +241,97 @@ class Agent:
 
         self.actor.save(actor_file_path, save_format="tf")
         self.critic.save(critic_file_path, save_format="tf")
+        # Plain NumPy copies of the weights for TensorFlow-free inference (ppo_numpy.NumpyPolicy)
+        save_numpy_weights(self.actor.get_weights(), actor_file_path)
+        save_numpy_weights(self.critic.get_weights(), critic_file_path)
+        if self.obs_normalizer is not None:
+            self.obs_normalizer.save(actor_file_path)
+            self.obs_normalizer.save(critic_file_path)
+        # Index the pair so tools can find models without parsing directory names
+        self.registry.record(episode_number, exact_average_track_completion, actor_file_path, critic_file_path)
+
+    def get_training_state(self):
+        """
+        Snapshot everything needed to resume training: weights, Adam slots and hyperparameters.
+
+        Returns:
+        dict: NumPy copies of the weights and optimizer variables of the actor and critic,
+            and JSON-serializable dicts of hyperparameters and normalizer statistics.
+        """
+        self._build_optimizers()
+        return {
+            "actor": self.actor.get_weights(),
+            "critic": self.critic.get_weights(),
+            "actor_optimizer": [v.numpy() for v in self.actor.optimizer.variables],
+            "critic_optimizer": [v.numpy() for v in self.critic.optimizer.variables],
+            "hyperparameters": {
+                "n_actions": self.n_actions,
+                "input_dims": self.input_dims,
+                "gamma": self.gamma,
+                "alpha": float(self.actor.optimizer.learning_rate.numpy()),
+                "gae_lambda": self.gae_lambda,
+                "policy_clip": self.policy_clip,
+                "batch_size": self.memory.batch_size,
+                "n_epochs": self.n_epochs,
+                "target_kl": self.target_kl,
+                "entropy_coeff": self.entropy_coeff,
+                "prev_average_track_completion": self.prev_average_track_completion,
+            },
+            "normalizer": self.get_normalizer_state(),
+        }
+
+    def get_normalizer_state(self):
+        """JSON-serializable running statistics of the observation normalizer and reward scaler."""
+        return {
+            "observations": self.obs_normalizer.state_dict() if self.obs_normalizer is not None else None,
+            "rewards": self.reward_scaler.state_dict() if self.reward_scaler is not None else None,
+        }
+
+    def set_normalizer_state(self, state):
+        """Restore statistics from get_normalizer_state; parts this agent does not use are ignored."""
+        if self.obs_normalizer is not None and state.get("observations") is not None:
+            self.obs_normalizer.load_state_dict(state["observations"])
+        if self.reward_scaler is not None and state.get("rewards") is not None:
+            self.reward_scaler.load_state_dict(state["rewards"])
+
+    def set_training_state(self, state):
+        """
+        Restore a snapshot from get_training_state.
+
+        The batch size and target_kl are run-time settings and keep the values
+        the agent was created with.
+        """
+        hyperparameters = state["hyperparameters"]
+        if (hyperparameters["n_actions"], hyperparameters["input_dims"]) != (self.n_actions, self.input_dims):
+            raise ValueError(
+                f"Checkpoint is for {hyperparameters['n_actions']} actions and {hyperparameters['input_dims']} "
+                f"inputs, the agent has {self.n_actions} and {self.input_dims}")
+        self._build_optimizers()
+        self.actor.set_weights(state["actor"])
+        self.critic.set_weights(state["critic"])
+        for model, values in ((self.actor, state["actor_optimizer"]), (self.critic, state["critic_optimizer"])):
+            for variable, value in zip(model.optimizer.variables, values):
+                variable.assign(value)
+            model.optimizer.learning_rate.assign(hyperparameters["alpha"])
+        self.gamma = hyperparameters["gamma"]
+        self.gae_lambda = hyperparameters["gae_lambda"]
+        self.policy_clip = hyperparameters["policy_clip"]
+        self.n_epochs = hyperparameters["n_epochs"]
+        self.entropy_coeff = hyperparameters["entropy_coeff"]
+        self.prev_average_track_completion = hyperparameters["prev_average_track_completion"]
+        normalizer = state.get("normalizer") or {}
+        if normalizer.get("observations") is not None and self.obs_normalizer is None:
+            raise ValueError("Checkpoint was trained on normalized observations; create the agent with normalize_obs=True")
+        self.set_normalizer_state(normalizer)
+        # policy_clip is baked into the traced train step
+        self._train_step = self._build_train_step()
+
+    def _build_optimizers(self):
+        # Weights and Adam slots are created lazily; build them so they can be read or assigned
+        if not self.actor.built:
+            self.choose_actions(np.zeros((1, self.input_dims), dtype=np.float32))
+        self.actor.optimizer.build(self.actor.trainable_variables)
+        self.critic.optimizer.build(self.critic.trainable_variables)
 
     def load_models(self, episode_number, average_track_completion):
         print('... loading models ...')
@@ -158,3 +344,9 @@ class Agent:
             self.actor = tf.keras.models.load_model(actor_file_path)
         if os.path.exists(critic_file_path):
             self.critic = tf.keras.models.load_model(critic_file_path)
+        if self.obs_normalizer is not None:
+            saved_normalizer = ObservationNormalizer.load(actor_file_path)
+            if saved_normalizer is not None:
+                self.obs_normalizer = saved_normalizer
+        self._policy_and_value = self._build_policy_and_value()
+        self._train_step = self._build_train_step()
@@ -0,0 +1,108 @@
+import numpy as np
+
+
+def compute_gae(rewards, values, dones, gamma=0.99, gae_lambda=0.95, last_value=0.0, segment_ids=None, block_size=64):
+    """
+    Generalized Advantage Estimation over a whole rollout in O(n).
+
+    The recurrence A[t] = delta[t] + gamma * lambda * (1 - done[t]) * A[t+1] is
+    evaluated as a blocked reverse scan: each block of `block_size` steps is
+    solved in closed form with NumPy, and only the carry between blocks is
+    propagated sequentially. Episode boundaries (dones) stop both the
+    bootstrap and the accumulation.
+
+    Args:
+    rewards (array-like): Reward for each step.
+    values (array-like): Critic value for each step.
+    dones (array-like): Whether each step ended its episode.
+    gamma (float): Discount factor.
+    gae_lambda (float): GAE smoothing factor.
+    last_value (float): Value used to bootstrap the final step if it is not done.
+    segment_ids (array-like, optional): Trajectory id for each step (e.g. the agent
+        that produced it). Steps are grouped per id, in order, before the scan so
+        interleaved trajectories never bootstrap from each other.
+    block_size (int): Number of steps solved in closed form per block.
+
+    Returns:
+    tuple: (advantages, returns) as float32 arrays in the original step order.
+    """
+    rewards = np.asarray(rewards, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    dones = np.asarray(dones, dtype=bool)
+    n = len(rewards)
+    if n == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+    order = None
+    ends = np.zeros(n, dtype=bool)
+    ends[-1] = True
+    if segment_ids is not None:
+        segment_ids = np.asarray(segment_ids)
+        order = np.argsort(segment_ids, kind='stable')
+        rewards, values, dones = rewards[order], values[order], dones[order]
+        sorted_ids = segment_ids[order]
+        ends[:-1] = sorted_ids[1:] != sorted_ids[:-1]
+
+    # One-step TD errors; a trajectory that ends without a done is bootstrapped from last_value
+    next_values = np.empty(n, dtype=np.float64)
+    next_values[:-1] = values[1:]
+    next_values[ends] = last_value
+    deltas = rewards + gamma * next_values * (1.0 - dones) - values
+    resets = dones | ends
+
+    decay = gamma * gae_lambda
+    if decay == 0:
+        # One-step TD: nothing accumulates, and the closed form below would divide 0 by 0
+        advantages = deltas
+    else:
+        if decay < 1:
+            # Keep decay ** (block_size - 1) far above the float64 underflow limit
+            block_size = max(1, min(block_size, int(np.log(1e-150) / np.log(decay)) + 1))
+        advantages = _blocked_scan(deltas, resets, decay, block_size)[:n]
+    returns = advantages + values
+
+    if order is not None:
+        unsorted = np.empty_like(advantages)
+        unsorted[order] = advantages
+        advantages = unsorted
+        unsorted = np.empty_like(returns)
+        unsorted[order] = returns
+        returns = unsorted
+
+    return advantages.astype(np.float32), returns.astype(np.float32)
+
+
+def _blocked_scan(deltas, resets, decay, block_size):
+    """
+    Solve A[t] = delta[t] + decay * (1 - reset[t]) * A[t+1] for 0 < decay.
+
+    Returns:
+    numpy.ndarray: Advantages, padded to a whole number of blocks.
+    """
+    # Pad to whole blocks; padding steps are resets with zero error
+    n = len(deltas)
+    n_blocks = -(-n // block_size)
+    padded = n_blocks * block_size
+    deltas = np.pad(deltas, (0, padded - n)).reshape(n_blocks, block_size)
+    resets = np.pad(resets, (0, padded - n), constant_values=True).reshape(n_blocks, block_size)
+
+    # Index of the first reset at or after each step within its block (block_size if none)
+    idx = np.arange(block_size)
+    next_reset = np.where(resets, idx, block_size)
+    next_reset = np.minimum.accumulate(next_reset[:, ::-1], axis=1)[:, ::-1]
+
+    # Closed form inside a block: A[t] = sum_{k=t}^{r(t)} decay^(k-t) * delta[k]
+    powers = decay ** idx
+    suffix = np.zeros((n_blocks, block_size + 1), dtype=np.float64)
+    suffix[:, :block_size] = np.cumsum((deltas * powers)[:, ::-1], axis=1)[:, ::-1]
+    stop = np.minimum(next_reset, block_size - 1) + 1
+    local = (suffix[:, :block_size] - np.take_along_axis(suffix, stop, axis=1)) / powers
+
+    # Steps with no reset before the block end also receive the next block's advantage
+    carry_gain = np.where(next_reset == block_size, decay ** (block_size - idx), 0.0)
+    carry = np.zeros(n_blocks + 1, dtype=np.float64)
+    block_heads = local[:, 0].tolist()
+    head_gains = carry_gain[:, 0].tolist()
+    for b in range(n_blocks - 1, -1, -1):
+        carry[b] = block_heads[b] + head_gains[b] * carry[b + 1]
+    return (local + carry_gain * carry[1:, None]).reshape(-1)
@@ -0,0 +1,173 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+import numpy as np
+
+CHECKPOINT_PATTERN = re.compile(r'^checkpoint_(\d+)\.npz$')
+_LIST_KEYS = ("actor", "critic", "actor_optimizer", "critic_optimizer")
+
+
+def write_checkpoint(path, state, metadata):
+    """
+    Write a training checkpoint as a single .npz file, atomically.
+
+    The file is written under a temporary name, flushed to disk and then renamed
+    over path, so a crash never leaves a half-written checkpoint behind.
+
+    Args:
+    path (str): Destination .npz path.
+    state (dict): Output of Agent.get_training_state.
+    metadata (dict): JSON-serializable training counters stored next to the arrays.
+    """
+    arrays = {f"{key}/{i}": value for key in _LIST_KEYS for i, value in enumerate(state[key])}
+    header = {"hyperparameters": state["hyperparameters"], "normalizer": state.get("normalizer"),
+              "metadata": metadata, "counts": {key: len(state[key]) for key in _LIST_KEYS}}
+    arrays["header"] = np.array(json.dumps(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path):
+    """
+    Read a checkpoint written by write_checkpoint.
+
+    Returns:
+    tuple: (state, metadata) where state can be passed to Agent.set_training_state.
+    """
+    with np.load(path) as data:
+        header = json.loads(str(data["header"]))
+        state = {key: [data[f"{key}/{i}"] for i in range(header["counts"][key])] for key in _LIST_KEYS}
+    state["hyperparameters"] = header["hyperparameters"]
+    state["normalizer"] = header.get("normalizer")
+    return state, header["metadata"]
+
+
+def read_checkpoint_metadata(path):
+    """Read only the metadata of a checkpoint; the weight arrays are not loaded."""
+    with np.load(path) as data:
+        return json.loads(str(data["header"]))["metadata"]
+
+
+class CheckpointManager:
+    """
+    Writes resumable training checkpoints from a background thread.
+
+    save() takes a snapshot of the agent on the calling thread (copies of the
+    weights and optimizer slots) and queues it; a writer thread serializes it
+    with write_checkpoint. After every write the retention policy keeps the
+    keep_last most recent checkpoints plus the keep_best with the highest
+    average track completion and deletes the rest.
+    """
+
+    def __init__(self, directory, keep_last=3, keep_best=1):
+        self.directory = directory
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        os.makedirs(directory, exist_ok=True)
+
+        # episode -> metadata of every checkpoint on disk
+        self._index = {}
+        for name in os.listdir(directory):
+            match = CHECKPOINT_PATTERN.match(name)
+            if match:
+                self._index[int(match.group(1))] = read_checkpoint_metadata(os.path.join(directory, name))
+        self._index_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def path(self, episode):
+        return os.path.join(self.directory, f"checkpoint_{episode:09d}.npz")
+
+    def save(self, agent, total_completed_games, average_track_completion, extra=None):
+        """
+        Queue a checkpoint of the agent; returns without waiting for the write.
+
+        Args:
+        agent (Agent): Agent to snapshot.
+        total_completed_games (int): Episode counter; also names the checkpoint.
+        average_track_completion (float): Used to rank checkpoints for keep_best.
+        extra (dict, optional): More JSON-serializable state to restore, e.g. plotting history.
+        """
+        metadata = {
+            "episode": int(total_completed_games),
+            "average_track_completion": float(average_track_completion),
+            "created": time.time(),
+            "extra": extra or {},
+        }
+        self._queue.put((agent.get_training_state(), metadata))
+
+    def wait(self):
+        """Block until every queued checkpoint has been written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            state, metadata = self._queue.get()
+            try:
+                write_checkpoint(self.path(metadata["episode"]), state, metadata)
+                with self._index_lock:
+                    self._index[metadata["episode"]] = metadata
+                self._apply_retention()
+            except Exception as e:
+                print(f"Failed to write checkpoint for episode {metadata['episode']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _apply_retention(self):
+        with self._index_lock:
+            episodes = sorted(self._index)
+            keep = set(episodes[-self.keep_last:] if self.keep_last > 0 else [])
+            best = sorted(episodes, key=lambda e: self._index[e]["average_track_completion"], reverse=True)
+            keep.update(best[:self.keep_best])
+            removed = [e for e in episodes if e not in keep]
+            for episode in removed:
+                del self._index[episode]
+        for episode in removed:
+            try:
+                os.remove(self.path(episode))
+            except FileNotFoundError:
+                pass
+
+    def checkpoints(self):
+        """Metadata of the checkpoints on disk, oldest first."""
+        with self._index_lock:
+            return [self._index[episode] for episode in sorted(self._index)]
+
+    def latest(self):
+        """Path of the most recent checkpoint, or None."""
+        with self._index_lock:
+            return self.path(max(self._index)) if self._index else None
+
+    def best(self):
+        """Path of the checkpoint with the highest average track completion, or None."""
+        with self._index_lock:
+            if not self._index:
+                return None
+            return self.path(max(self._index, key=lambda e: self._index[e]["average_track_completion"]))
+
+    def restore_latest(self, agent):
+        """
+        Restore the agent from the latest checkpoint.
+
+        Returns:
+        dict: The checkpoint metadata, or None if there is no checkpoint.
+        """
+        self.wait()
+        path = self.latest()
+        if path is None:
+            return None
+        state, metadata = read_checkpoint(path)
+        agent.set_training_state(state)
+        print(f"Resumed from {path} (episode {metadata['episode']})")
+        return metadata
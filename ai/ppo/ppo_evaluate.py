@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+
+# Per-episode result columns, in the order evaluate_episodes returns them
+EPISODE_FIELDS = ('win', 'percent_completed', 'length', 'reward')
+
+_cached_env = None
+_cached_policy = (None, None)
+
+
+class EvaluationPolicy:
+    """
+    Actor of a saved checkpoint, run with the NumPy forward pass.
+
+    Deterministic policies take the most likely action; stochastic ones sample
+    with NumpyPolicy, as serving does, from a generator seeded per episode so
+    results do not depend on how episodes are split across workers.
+    """
+
+    def __init__(self, actor_dir):
+        from .ppo_numpy import NumpyPolicy
+
+        self.policy = NumpyPolicy.load(actor_dir, None)
+
+    def act(self, observation, rng=None):
+        pi = self.policy.probabilities([observation])
+        if rng is None:
+            return int(pi[0].argmax())
+        return int(self.policy.sample_actions(pi, rng)[0])
+
+
+def evaluate_episodes(actor_dir, seeds, stochastic=False, max_steps=2000):
+    """
+    Play one episode of the headless racetrack per seed with a saved actor.
+
+    The seed sets the car's start heading and, for stochastic evaluation, the
+    action sampling, so every checkpoint is evaluated on the same episodes.
+    Runs in evaluation worker processes; the environment and the last loaded
+    policy are kept between calls.
+
+    Args:
+    actor_dir (str): TensorFlow.js or SavedModel directory of the actor.
+    seeds (list): Episode seeds.
+    stochastic (bool): Sample actions instead of taking the most likely one.
+    max_steps (int): Steps after which an unfinished episode is cut off.
+
+    Returns:
+    dict: Seed -> [won, % completed, length in steps, total reward].
+    """
+    global _cached_env, _cached_policy
+    from ..env.racetrack_env import RacetrackEnv
+
+    if _cached_env is None or _cached_env.max_steps != max_steps:
+        _cached_env = RacetrackEnv(max_steps=max_steps)
+    if _cached_policy[0] != actor_dir:
+        _cached_policy = (actor_dir, EvaluationPolicy(actor_dir))
+    env, policy = _cached_env, _cached_policy[1]
+
+    results = {}
+    for seed in seeds:
+        rng = np.random.default_rng([seed, 1]) if stochastic else None
+        observation, done, total_reward, info = env.reset(seed=seed), False, 0.0, {}
+        while not done:
+            observation, reward, done, info = env.step(policy.act(observation, rng))
+            total_reward += reward
+        results[seed] = [bool(info["win"]), float(info["percent_completed"]), int(env.steps), float(total_reward)]
+    return results
+
+
+def mean_interval(values, z=1.96):
+    """Mean and the half-width of its normal-approximation confidence interval (95% for z=1.96)."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return float(values.mean()) if len(values) else float('nan'), float('nan')
+    return float(values.mean()), float(z * values.std(ddof=1) / math.sqrt(len(values)))
+
+
+def wilson_interval(successes, n, z=1.96):
+    """
+    Wilson score interval of a success rate. Unlike mean +/- z * standard error
+    it stays inside [0, 1] and is not empty when every episode won or lost.
+
+    Returns:
+    tuple: (rate, lower bound, upper bound).
+    """
+    if n == 0:
+        return float('nan'), float('nan'), float('nan')
+    rate = successes / n
+    denominator = 1 + z ** 2 / n
+    center = (rate + z ** 2 / (2 * n)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return rate, max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def summarize(episodes, z=1.96):
+    """
+    Leaderboard statistics of one checkpoint.
+
+    Args:
+    episodes (list): [won, % completed, length, reward] per episode.
+    z (float): Normal quantile of the confidence level.
+
+    Returns:
+    dict: Episode count, completion rate with its Wilson interval, and the mean
+        and confidence half-width of % completed, length and reward.
+    """
+    columns = dict(zip(EPISODE_FIELDS, np.asarray(episodes, dtype=np.float64).reshape(-1, 4).T))
+    rate, low, high = wilson_interval(int(columns['win'].sum()), len(episodes), z)
+    summary = {"episodes": len(episodes), "completion_rate": rate,
+               "completion_rate_low": low, "completion_rate_high": high}
+    for field in EPISODE_FIELDS[1:]:
+        summary[field], summary[f"{field}_ci"] = mean_interval(columns[field], z)
+    return summary
@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class BatchedInference:
+    """
+    Micro-batching front end for Agent.choose_actions.
+
+    Callers on any thread submit a single observation and block on the result.
+    A worker thread collects pending observations until either max_batch_size
+    are queued or max_wait_ms has passed since the first one arrived, runs one
+    batched forward pass, and hands each caller its own row of the result.
+    """
+
+    def __init__(self, choose_actions, max_batch_size=64, max_wait_ms=2.0, latency_window=10000):
+        self.choose_actions = choose_actions
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._batch_sizes = deque(maxlen=latency_window)
+        self._requests = 0
+        self._batches = 0
+        self._started_at = None
+
+    def start(self):
+        if self._thread is None:
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(
+                target=self._run, name="batched-inference", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, observation):
+        """Queue one observation; the returned Future resolves to (action, log_prob, value)."""
+        future = Future()
+        self._queue.put((np.asarray(observation, dtype=np.float32), future, time.perf_counter()))
+        return future
+
+    def choose_action(self, observation):
+        return self.submit(observation).result()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the stop marker back so the run loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            observations, futures, submitted = zip(*batch)
+
+            try:
+                actions, probs, values = self.choose_actions(np.stack(observations))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for i, future in enumerate(futures):
+                future.set_result((actions[i], probs[i], values[i]))
+
+            done_at = time.perf_counter()
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._batch_sizes.append(len(batch))
+                self._latencies.extend(done_at - t for t in submitted)
+
+    def stats(self):
+        """Counters since start plus latency percentiles (ms) over the recent window."""
+        with self._stats_lock:
+            latencies = np.array(self._latencies) * 1000
+            batch_sizes = np.array(self._batch_sizes)
+            requests, batches = self._requests, self._batches
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+
+        stats = {
+            "requests": requests,
+            "batches": batches,
+            "requests_per_sec": requests / elapsed if elapsed > 0 else 0.0,
+            "mean_batch_size": float(batch_sizes.mean()) if len(batch_sizes) else 0.0,
+            "max_batch_size": int(batch_sizes.max()) if len(batch_sizes) else 0,
+            "queued": self._queue.qsize(),
+        }
+        for p in (50, 90, 99):
+            stats[f"latency_p{p}_ms"] = float(np.percentile(latencies, p)) if len(latencies) else 0.0
+        return stats
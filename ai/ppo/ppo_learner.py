@@ -0,0 +1,162 @@
+import threading
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+from .ppo import Agent
+from .ppo_memory import PPOMemory
+from .ppo_telemetry import telemetry
+
+
+class BackgroundLearner:
+    """
+    Runs Agent.learn on a background thread while agents keep acting.
+
+    Actions are served by two inference-only copies of the policy (front and
+    back buffer). Transitions are stored in a live PPOMemory; when an update is
+    requested its finished episodes are handed to the training agent, and the
+    episodes still in progress stay in the live buffer, which keeps receiving
+    transitions during training. If the finished episodes are fewer than the
+    agent's learning_trigger, they are put back into the live buffer and count
+    toward the next round, as with Agent.learn. Once learn finishes, the new
+    weights are copied into the back buffer and the buffers are swapped, so
+    in-flight forward passes never see half-written weights.
+
+    If a CheckpointManager is given, a resumable checkpoint is queued after
+    every update, with checkpoint_extra() stored alongside it. If a
+    MetricsLogger is given, the losses and wall time of every update are logged.
+    If a ProfileCapture is given, updates run under it so they can be profiled on request.
+
+    If an update fails, the error is printed and counted in stats(), and its
+    rollout is dropped: learn may have stepped the optimizer before failing, so
+    the rollout can no longer be assumed on-policy.
+    """
+
+    def __init__(self, agent, before_update=None, checkpoints=None, checkpoint_extra=None, metrics=None,
+                 profiler=None):
+        self.agent = agent
+        self.before_update = before_update
+        self.checkpoints = checkpoints
+        self.checkpoint_extra = checkpoint_extra
+        self.metrics = metrics
+        self.profiler = profiler
+
+        self._lock = threading.Lock()
+        self._memory = PPOMemory(agent.memory.batch_size, agent.input_dims)
+        self._training = threading.Event()
+        self._thread = None
+
+        self._policies = [self._make_policy(), self._make_policy()]
+        self._front = 0
+        self._publish()
+        self.version = 0
+        self.updates = 0
+        self.training_seconds = 0.0
+        self.last_update_seconds = 0.0
+        self.failed_updates = 0
+        self.last_error = None
+
+    def _make_policy(self):
+        policy = Agent(n_actions=self.agent.n_actions, input_dims=self.agent.input_dims,
+                       save_folder_actor=None, save_folder_critic=None,
+                       normalize_obs=self.agent.obs_normalizer is not None, scale_rewards=False)
+        # Subclassed Keras models only create their weights on the first call
+        policy.choose_actions(np.zeros((1, self.agent.input_dims), dtype=np.float32))
+        return policy
+
+    def _publish(self):
+        if not self.agent.actor.built:
+            self.agent.choose_actions(np.zeros((1, self.agent.input_dims), dtype=np.float32))
+        back = self._policies[1 - self._front]
+        back.actor.set_weights(self.agent.actor.get_weights())
+        back.critic.set_weights(self.agent.critic.get_weights())
+        back.set_normalizer_state(self.agent.get_normalizer_state())
+        self._front = 1 - self._front
+
+    @property
+    def is_training(self):
+        return self._training.is_set()
+
+    def __len__(self):
+        return len(self._memory)
+
+    def choose_actions(self, observations):
+        """Agent.choose_actions with the most recently published weights."""
+        return self._policies[self._front].choose_actions(observations)
+
+    def remember(self, state, action, probs, vals, reward, done, agent_id=None):
+        with telemetry.time("remember"), self._lock:
+            self._memory.store_memory(state, action, probs, vals, reward, done, agent_id)
+
+    def request_update(self, total_completed_games, average_track_completion):
+        """
+        Start a training round in the background unless one is already running.
+
+        Returns:
+        bool: True if a new round was started.
+        """
+        with self._lock:
+            if self._training.is_set():
+                return False
+            self._training.set()
+            self.agent.memory, self._memory = self._memory, self.agent.memory
+            # Agents still driving keep their episode in the live buffer; GAE would bootstrap its cut-off end from 0
+            self.agent.memory.move_unfinished(self._memory)
+        self._thread = threading.Thread(
+            target=self._update, args=(total_completed_games, average_track_completion),
+            name="ppo-learner", daemon=True)
+        self._thread.start()
+        return True
+
+    def _update(self, total_completed_games, average_track_completion):
+        start = time.perf_counter()
+        did_train = False
+        try:
+            if self.before_update is not None:
+                self.before_update()
+            with self.profiler.update(total_completed_games) if self.profiler is not None else nullcontext():
+                did_train = self.agent.learn(total_completed_games, average_track_completion)
+            print("did_train:", did_train)
+            if did_train:
+                self._publish()
+                self.version += 1
+                self.updates += 1
+                if self.checkpoints is not None:
+                    extra = self.checkpoint_extra() if self.checkpoint_extra is not None else None
+                    self.checkpoints.save(self.agent, total_completed_games, average_track_completion, extra)
+            else:
+                # Below the learning trigger: the weights are unchanged, so the rollout is still on-policy
+                # and goes back in front of the transitions stored since the swap
+                with self._lock:
+                    self._memory.move_all(self.agent.memory)
+                    self.agent.memory, self._memory = self._memory, self.agent.memory
+        except Exception as e:
+            print(f"Training update at game {total_completed_games} failed: {e!r}")
+            self.failed_updates += 1
+            self.last_error = repr(e)
+            with self._lock:
+                self.agent.memory.clear_memory()
+        finally:
+            self.last_update_seconds = time.perf_counter() - start
+            self.training_seconds += self.last_update_seconds
+            telemetry.observe("update", self.last_update_seconds)
+            if did_train and self.metrics is not None:
+                self.metrics.log_update(total_completed_games, self.agent.last_learn_stats, self.last_update_seconds)
+            self._training.clear()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "policy_version": self.version,
+            "updates": self.updates,
+            "is_training": self.is_training,
+            "buffered_transitions": len(self),
+            "training_seconds": self.training_seconds,
+            "last_update_seconds": self.last_update_seconds,
+            "failed_updates": self.failed_updates,
+            "last_error": self.last_error,
+        }
@@ -2,42 +2,184 @@ import numpy as np
 
 
 class PPOMemory:
-    def __init__(self, batch_size):
-        self.states = []
-        self.probs = []
-        self.vals = []
-        self.actions = []
-        self.rewards = []
-        self.dones = []
+    """
+    Columnar rollout buffer backed by preallocated, typed NumPy arrays.
+
+    Transitions are written in place; the stored columns are exposed as views of
+    the filled prefix so generate_batches never copies the rollout. When a rollout
+    outgrows the capacity the columns are reallocated at double the size.
+
+    Every transition is tagged with the agent that produced it, so trajectories
+    from concurrent agents (browser tabs) that arrive interleaved can be split
+    back into one contiguous segment per agent.
+    """
+
+    def __init__(self, batch_size, input_dims, capacity=4096):
         self.batch_size = batch_size
+        self.input_dims = input_dims
+        self.size = 0
+        self._agent_index = {}
+        self._allocate(capacity)
 
-    def generate_batches(self):
-        n_states = len(self.states)
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._states = np.zeros((capacity, self.input_dims), dtype=np.float32)
+        self._actions = np.zeros(capacity, dtype=np.int32)
+        self._probs = np.zeros(capacity, dtype=np.float32)
+        self._vals = np.zeros(capacity, dtype=np.float32)
+        self._rewards = np.zeros(capacity, dtype=np.float32)
+        self._dones = np.zeros(capacity, dtype=bool)
+        self._agents = np.zeros(capacity, dtype=np.int32)
+
+    def _columns(self):
+        return [self._states, self._actions, self._probs,
+                self._vals, self._rewards, self._dones, self._agents]
+
+    def _grow(self, min_capacity):
+        old_columns = self._columns()
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        self._allocate(capacity)
+        for new, old in zip(self._columns(), old_columns):
+            new[:self.size] = old[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def states(self):
+        return self._states[:self.size]
+
+    @property
+    def actions(self):
+        return self._actions[:self.size]
+
+    @property
+    def probs(self):
+        return self._probs[:self.size]
+
+    @property
+    def vals(self):
+        return self._vals[:self.size]
+
+    @property
+    def rewards(self):
+        return self._rewards[:self.size]
+
+    @property
+    def dones(self):
+        return self._dones[:self.size]
+
+    @property
+    def agent_ids(self):
+        """Per-transition agent index, in the order agents were first seen since the last clear."""
+        return self._agents[:self.size]
+
+    @property
+    def agent_keys(self):
+        """The agent_id behind each agent index, in index order."""
+        return list(self._agent_index)
+
+    @property
+    def nbytes(self):
+        """Bytes allocated for all columns, independent of how many are filled."""
+        return sum(column.nbytes for column in self._columns())
+
+    def generate_batch_indices(self):
+        n_states = self.size
         batch_start = np.arange(0, n_states, self.batch_size)
         indices = np.arange(n_states, dtype=np.int64)
         np.random.shuffle(indices)
-        batches = [indices[i:i+self.batch_size] for i in batch_start]
-
-        return np.array(self.states), \
-            np.array(self.actions), \
-            np.array(self.probs), \
-            np.array(self.vals), \
-            np.array(self.rewards), \
-            np.array(self.dones), \
+        return [indices[i:i+self.batch_size] for i in batch_start]
+
+    def generate_batches(self):
+        batches = self.generate_batch_indices()
+
+        return self.states, \
+            self.actions, \
+            self.probs, \
+            self.vals, \
+            self.rewards, \
+            self.dones, \
             batches
 
-    def store_memory(self, state, action, probs, vals, reward, done):
-        self.states.append(state)
-        self.actions.append(action)
-        self.probs.append(probs)
-        self.vals.append(vals)
-        self.rewards.append(reward)
-        self.dones.append(done)
+    def store_memory(self, state, action, probs, vals, reward, done, agent_id=None):
+        if self.size == self.capacity:
+            self._grow(self.size + 1)
+        i = self.size
+        self._states[i] = state
+        self._actions[i] = action
+        self._probs[i] = probs
+        self._vals[i] = vals
+        self._rewards[i] = reward
+        self._dones[i] = done
+        self._agents[i] = self._agent_index.setdefault(agent_id, len(self._agent_index))
+        self.size += 1
+
+    def store_batch(self, states, actions, probs, vals, rewards, dones, agent_ids):
+        """Store one step of N agents (e.g. a VectorEnv) as whole-array writes."""
+        n = len(actions)
+        if self.size + n > self.capacity:
+            self._grow(self.size + n)
+        rows = slice(self.size, self.size + n)
+        self._states[rows] = states
+        self._actions[rows] = actions
+        self._probs[rows] = probs
+        self._vals[rows] = vals
+        self._rewards[rows] = rewards
+        self._dones[rows] = dones
+        self._agents[rows] = [self._agent_index.setdefault(agent_id, len(self._agent_index))
+                              for agent_id in np.asarray(agent_ids).tolist()]
+        self.size += n
+
+    def move_unfinished(self, target):
+        """
+        Move every agent's unfinished trajectory (its rows after its last done) into target.
+
+        The rows left behind are complete episodes, so GAE can treat the end of
+        every agent's segment as terminal. The moved rows keep their order and
+        agent ids and continue in target until the episode is done.
+
+        Args:
+        target (PPOMemory): Buffer the unfinished tails are appended to.
+
+        Returns:
+        int: Number of rows moved.
+        """
+        agents, dones = self.agent_ids, self.dones
+        rows = np.arange(self.size)
+        last_done = np.full(len(self._agent_index), -1, dtype=np.int64)
+        np.maximum.at(last_done, agents[dones], rows[dones])
+        unfinished = rows > last_done[agents]
+        moved = int(unfinished.sum())
+        if moved:
+            self._copy_rows(target, unfinished)
+            keep = ~unfinished
+            for column in self._columns():
+                column[:self.size - moved] = column[:self.size][keep]
+            self.size -= moved
+        return moved
+
+    def move_all(self, target):
+        """
+        Append every row to target, in order and with its agent id, and clear this buffer.
+
+        Returns:
+        int: Number of rows moved.
+        """
+        moved = self.size
+        if moved:
+            self._copy_rows(target, slice(None))
+        self.clear_memory()
+        return moved
+
+    def _copy_rows(self, target, rows):
+        keys = self.agent_keys
+        target.store_batch(self.states[rows], self.actions[rows], self.probs[rows], self.vals[rows],
+                           self.rewards[rows], self.dones[rows],
+                           [keys[agent] for agent in self.agent_ids[rows].tolist()])
 
     def clear_memory(self):
-        self.states = []
-        self.probs = []
-        self.actions = []
-        self.rewards = []
-        self.dones = []
-        self.vals = []
+        self.size = 0
+        self._agent_index = {}
@@ -0,0 +1,130 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+EPISODE = "episode"
+UPDATE = "update"
+UPDATE_FIELDS = ("actor_loss", "critic_loss", "entropy", "approx_kl", "clip_fraction", "epochs", "update_seconds")
+
+
+class MetricsLogger:
+    """
+    Streams training metrics to an NDJSON file from a background writer thread.
+
+    Every record is one JSON object per line with a "kind" ("episode" or
+    "update"), a wall-clock "time" and the metric fields. log() only queues the
+    record and updates a few in-memory aggregates, so it is cheap enough to
+    call from request handlers; summary() serves those aggregates without
+    reading the file back. Plots are rendered separately from the file
+    (see plot_metrics.py).
+    """
+
+    def __init__(self, path, append=False, window=100):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a' if append else 'w')
+        self._lock = threading.Lock()
+        self._episodes = 0
+        self._updates = 0
+        self._recent_episodes = deque(maxlen=window)
+        self._last_update = None
+        self._started = time.time()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, kind, **fields):
+        record = {"kind": kind, "time": time.time(), **fields}
+        with self._lock:
+            if kind == EPISODE:
+                self._episodes += 1
+                self._recent_episodes.append(record)
+            elif kind == UPDATE:
+                self._updates += 1
+                self._last_update = record
+        self._queue.put(record)
+
+    def log_episode(self, episode, completion, reward=None, length=None, agent_id=None):
+        self.log(EPISODE, episode=int(episode), completion=float(completion),
+                 reward=None if reward is None else float(reward),
+                 length=None if length is None else int(length), agent_id=agent_id)
+
+    def log_update(self, episode, stats, update_seconds):
+        """
+        Args:
+        episode (int): Total completed games at the time of the update.
+        stats (dict): Agent.last_learn_stats.
+        update_seconds (float): Wall time of the whole training round.
+        """
+        self.log(UPDATE, episode=int(episode), update_seconds=float(update_seconds), **stats)
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    self._file.close()
+                    return
+                self._file.write(json.dumps(record) + "\n")
+                # Flush whenever the queue drains so readers see whole lines promptly
+                if self._queue.empty():
+                    self._file.flush()
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def summary(self):
+        """Latest aggregates: totals, means over the recent episodes and the last update's metrics."""
+        with self._lock:
+            recent = list(self._recent_episodes)
+            last_update = dict(self._last_update) if self._last_update else None
+            episodes, updates = self._episodes, self._updates
+
+        def mean(key):
+            values = [r[key] for r in recent if r.get(key) is not None]
+            return sum(values) / len(values) if values else None
+
+        return {
+            "episodes": episodes,
+            "updates": updates,
+            "uptime_seconds": time.time() - self._started,
+            "recent": {
+                "episodes": len(recent),
+                "mean_completion": mean("completion"),
+                "mean_reward": mean("reward"),
+                "mean_length": mean("length"),
+            },
+            "last_update": last_update,
+        }
+
+
+def read_metrics(path):
+    """
+    Read a metrics log written by MetricsLogger.
+
+    Returns:
+    tuple: (episodes, updates), each a list of records in the order they were logged.
+    """
+    episodes, updates = [], []
+    with open(path) as f:
+        for line in f:
+            # The last line may still be being written
+            if not line.endswith("\n"):
+                break
+            record = json.loads(line)
+            if record["kind"] == EPISODE:
+                episodes.append(record)
+            elif record["kind"] == UPDATE:
+                updates.append(record)
+    return episodes, updates
@@ -0,0 +1,159 @@
+import json
+import os
+
+import numpy as np
+
+# Written next to the SavedModel files by Agent.save_models and copied next to
+# model.json by convert_tf_to_tfjs.py, so every runtime normalizes the same way
+NORMALIZER_FILE = 'normalizer.json'
+
+
+class RunningMeanStd:
+    """
+    Running mean and variance of a stream of samples.
+
+    Batches are merged with the parallel variance formula (Chan et al.), so an
+    update costs the same whether it follows ten samples or ten million, and a
+    single step is just a batch of one.
+    """
+
+    def __init__(self, shape=(), epsilon=1e-4):
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.var = np.ones(shape, dtype=np.float64)
+        # A tiny prior count keeps the first merge from dividing by zero
+        self.count = epsilon
+
+    def update(self, batch):
+        """Add a batch of samples, stacked along the first axis."""
+        batch = np.asarray(batch, dtype=np.float64).reshape((-1,) + self.mean.shape)
+        if len(batch):
+            self.update_moments(batch.mean(axis=0), batch.var(axis=0), len(batch))
+
+    def update_moments(self, batch_mean, batch_var, batch_count):
+        delta = batch_mean - self.mean
+        total = self.count + batch_count
+        self.mean = self.mean + delta * batch_count / total
+        m2 = self.var * self.count + batch_var * batch_count + delta ** 2 * self.count * batch_count / total
+        self.var = m2 / total
+        self.count = total
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def state_dict(self):
+        """JSON-serializable copy of the statistics."""
+        return {"mean": self.mean.tolist(), "var": self.var.tolist(), "count": float(self.count)}
+
+    def load_state_dict(self, state):
+        self.mean = np.asarray(state["mean"], dtype=np.float64).reshape(self.mean.shape)
+        self.var = np.asarray(state["var"], dtype=np.float64).reshape(self.var.shape)
+        self.count = float(state["count"])
+
+
+class ObservationNormalizer:
+    """
+    Standardizes observations with running statistics: (x - mean) / sqrt(var + epsilon), clipped.
+
+    Normalizing is a pure function of the current statistics; they only change
+    through update(), so a whole rollout can be normalized with the statistics
+    its actions were chosen with.
+    """
+
+    def __init__(self, input_dims, clip=10.0, epsilon=1e-8):
+        self.stats = RunningMeanStd((input_dims,))
+        self.clip = clip
+        self.epsilon = epsilon
+        self._refresh()
+
+    def _refresh(self):
+        # Cached in float32 so normalizing a batch is one subtract, multiply and clip
+        self._mean = self.stats.mean.astype(np.float32)
+        self._scale = (1.0 / np.sqrt(self.stats.var + self.epsilon)).astype(np.float32)
+
+    def __call__(self, observations):
+        x = (np.asarray(observations, dtype=np.float32) - self._mean) * self._scale
+        return np.clip(x, -self.clip, self.clip, out=x)
+
+    def update(self, observations):
+        self.stats.update(observations)
+        self._refresh()
+
+    def state_dict(self):
+        return {**self.stats.state_dict(), "clip": self.clip, "epsilon": self.epsilon}
+
+    def load_state_dict(self, state):
+        self.stats.load_state_dict(state)
+        self.clip = state.get("clip", self.clip)
+        self.epsilon = state.get("epsilon", self.epsilon)
+        self._refresh()
+
+    def save(self, model_dir):
+        """Write the statistics as NORMALIZER_FILE in model_dir."""
+        os.makedirs(model_dir, exist_ok=True)
+        with open(os.path.join(model_dir, NORMALIZER_FILE), 'w') as f:
+            json.dump(self.state_dict(), f)
+
+    @classmethod
+    def load(cls, model_dir):
+        """
+        Read NORMALIZER_FILE from a SavedModel or TensorFlow.js model directory.
+
+        Returns:
+        ObservationNormalizer: The normalizer, or None for models trained on raw observations.
+        """
+        path = os.path.join(model_dir, NORMALIZER_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        normalizer = cls(len(state["mean"]))
+        normalizer.load_state_dict(state)
+        return normalizer
+
+
+class RewardScaler:
+    """
+    Divides rewards by the running standard deviation of the discounted return.
+
+    Returns are accumulated per agent within each rollout (and reset when an
+    episode ends), so interleaved trajectories from concurrent agents do not
+    mix. The mean is not subtracted, which keeps the sign of every reward and
+    the loss penalty.
+    """
+
+    def __init__(self, gamma=0.99, clip=10.0, epsilon=1e-8):
+        self.gamma = gamma
+        self.clip = clip
+        self.epsilon = epsilon
+        self.stats = RunningMeanStd()
+
+    def update(self, rewards, dones, agent_ids):
+        """Add the discounted returns of a rollout, one O(1) step per transition in order."""
+        returns = np.empty(len(rewards), dtype=np.float64)
+        running = {}
+        gamma = self.gamma
+        for i, (reward, done, agent_id) in enumerate(zip(np.asarray(rewards).tolist(), np.asarray(dones).tolist(),
+                                                         np.asarray(agent_ids).tolist())):
+            value = running.get(agent_id, 0.0) * gamma + reward
+            returns[i] = value
+            running[agent_id] = 0.0 if done else value
+        self.stats.update(returns)
+
+    def __call__(self, rewards):
+        scaled = np.asarray(rewards, dtype=np.float32) / np.float32(np.sqrt(self.stats.var + self.epsilon))
+        return np.clip(scaled, -self.clip, self.clip)
+
+    def state_dict(self):
+        return {**self.stats.state_dict(), "gamma": self.gamma, "clip": self.clip}
+
+    def load_state_dict(self, state):
+        self.stats.load_state_dict(state)
+        self.gamma = state.get("gamma", self.gamma)
+        self.clip = state.get("clip", self.clip)
+
+
+def normalize_advantages(advantages, epsilon=1e-8):
+    """Standardize the advantages of one update to zero mean and unit variance."""
+    advantages = np.asarray(advantages, dtype=np.float32)
+    return (advantages - advantages.mean()) / (advantages.std() + epsilon)
@@ -0,0 +1,192 @@
+import json
+import os
+
+import numpy as np
+
+from .ppo_normalize import ObservationNormalizer
+
+# Written next to the SavedModel files by Agent.save_models, so the weights can
+# be read back without TensorFlow
+NUMPY_WEIGHTS_FILE = 'weights.npz'
+
+_QUANTIZED_DTYPES = {'uint8': np.uint8, 'uint16': np.uint16, 'float16': np.float16}
+
+
+def save_numpy_weights(weights, model_dir):
+    """
+    Save Keras layer weights (kernel, bias, kernel, bias, ...) as an .npz file in model_dir.
+
+    Args:
+    weights (list): Arrays as returned by Model.get_weights().
+    model_dir (str): The SavedModel directory of the model.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    np.savez(os.path.join(model_dir, NUMPY_WEIGHTS_FILE), *weights)
+
+
+def load_saved_model_weights(model_dir):
+    """
+    Read the weights of a model saved by Agent.save_models.
+
+    Args:
+    model_dir (str): The SavedModel directory of the model.
+
+    Returns:
+    list: Float32 arrays in layer order (kernel, bias, kernel, bias, ...).
+    """
+    path = os.path.join(model_dir, NUMPY_WEIGHTS_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found; models saved before NumPy export can only be loaded with TensorFlow")
+    with np.load(path) as data:
+        return [data[f'arr_{i}'].astype(np.float32) for i in range(len(data.files))]
+
+
+def load_tfjs_weights(model_dir):
+    """
+    Read the weights of a TensorFlow.js model from its binary shards.
+
+    Weights are listed in model.json in the order the converter wrote them,
+    which for the actor and critic is layer order (kernel, bias, ...).
+    Quantized weights (uint8, uint16 or float16) are converted back to float32.
+
+    Args:
+    model_dir (str): Directory with model.json and its group*-shard*.bin files.
+
+    Returns:
+    list: Float32 arrays in layer order.
+    """
+    with open(os.path.join(model_dir, 'model.json')) as f:
+        manifest = json.load(f)['weightsManifest']
+
+    weights = []
+    for group in manifest:
+        data = b''.join(_read_file(os.path.join(model_dir, path)) for path in group['paths'])
+        offset = 0
+        for spec in group['weights']:
+            shape = spec['shape']
+            quantization = spec.get('quantization')
+            dtype = _QUANTIZED_DTYPES[quantization['dtype']] if quantization else np.dtype(spec['dtype'])
+            count = int(np.prod(shape))
+            values = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += count * np.dtype(dtype).itemsize
+            if quantization and quantization['dtype'] != 'float16':
+                values = values * np.float32(quantization['scale']) + np.float32(quantization['min'])
+            weights.append(values.astype(np.float32).reshape(shape))
+    return weights
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def load_weights(model_dir):
+    """Load weights from either a TensorFlow.js model directory or a SavedModel directory."""
+    if os.path.exists(os.path.join(model_dir, 'model.json')):
+        return load_tfjs_weights(model_dir)
+    return load_saved_model_weights(model_dir)
+
+
+class NumpyMLP:
+    """
+    Forward pass of a Dense/ReLU stack like ActorNetwork and CriticNetwork.
+
+    Activations are written into buffers that are allocated once per power of
+    two batch size and sliced to the batch, so repeated calls do not allocate
+    and varying batch sizes keep only a few buffers around.
+    """
+
+    def __init__(self, weights):
+        self.set_weights(weights)
+
+    def set_weights(self, weights):
+        self.layers = [(np.ascontiguousarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32))
+                       for kernel, bias in zip(weights[0::2], weights[1::2])]
+        self._buffers = {}
+
+    def _get_buffers(self, batch_size):
+        capacity = 1 << max(batch_size - 1, 0).bit_length()
+        buffers = self._buffers.get(capacity)
+        if buffers is None:
+            buffers = [np.empty((capacity, bias.shape[0]), dtype=np.float32) for _, bias in self.layers]
+            self._buffers[capacity] = buffers
+        return [buffer[:batch_size] for buffer in buffers]
+
+    def __call__(self, inputs):
+        """Returns the pre-activation output of the last layer; the returned buffer is reused."""
+        x = np.asarray(inputs, dtype=np.float32)
+        buffers = self._get_buffers(len(x))
+        for i, ((kernel, bias), out) in enumerate(zip(self.layers, buffers)):
+            np.matmul(x, kernel, out=out)
+            out += bias
+            if i < len(self.layers) - 1:
+                np.maximum(out, 0, out=out)
+            x = out
+        return x
+
+
+class NumpyPolicy:
+    """
+    TensorFlow-free stand-in for Agent.choose_action(s).
+
+    Runs the actor and critic MLPs in NumPy and samples actions the same way
+    Agent.choose_actions does, returning (actions, log_probs, values).
+    Observations are normalized first if the model was trained with an
+    ObservationNormalizer. Without critic weights only probabilities and
+    sample_actions are available.
+    """
+
+    def __init__(self, actor_weights, critic_weights, seed=None, obs_normalizer=None):
+        self.actor = NumpyMLP(actor_weights)
+        self.critic = NumpyMLP(critic_weights) if critic_weights is not None else None
+        self.n_actions = self.actor.layers[-1][1].shape[0]
+        self.rng = np.random.default_rng(seed)
+        self.obs_normalizer = obs_normalizer
+
+    @classmethod
+    def load(cls, actor_dir, critic_dir, seed=None):
+        """Load from TensorFlow.js model directories or SavedModel directories written by Agent.save_models."""
+        critic_weights = load_weights(critic_dir) if critic_dir is not None else None
+        return cls(load_weights(actor_dir), critic_weights, seed, ObservationNormalizer.load(actor_dir))
+
+    def set_weights(self, actor_weights, critic_weights):
+        self.actor.set_weights(actor_weights)
+        if self.critic is not None:
+            self.critic.set_weights(critic_weights)
+
+    def _states(self, observations):
+        states = np.asarray(observations, dtype=np.float32)
+        if self.obs_normalizer is not None:
+            states = self.obs_normalizer(states)
+        return states
+
+    def policy(self, states):
+        """Action probabilities for already normalized states."""
+        logits = self.actor(states)
+        pi = np.exp(logits - logits.max(axis=1, keepdims=True))
+        pi /= pi.sum(axis=1, keepdims=True)
+        return pi
+
+    def probabilities(self, observations):
+        """Action probabilities for a batch of raw observations."""
+        return self.policy(self._states(observations))
+
+    def sample_actions(self, pi, rng=None):
+        """Inverse-CDF sampling from each row of the categorical distribution pi, with self.rng by default."""
+        rng = self.rng if rng is None else rng
+        thresholds = rng.random((len(pi), 1), dtype=np.float32)
+        return np.minimum((pi.cumsum(axis=1) < thresholds).sum(axis=1), self.n_actions - 1)
+
+    def choose_actions(self, observations):
+        states = self._states(observations)
+        pi = self.policy(states)
+        values = self.critic(states)[:, 0].copy()
+        actions = self.sample_actions(pi)
+
+        probs = np.log(pi[np.arange(len(states)), actions])
+        return actions, probs, values
+
+    def choose_action(self, observation):
+        actions, probs, values = self.choose_actions([observation])
+        return actions[0], probs[0], values[0]
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+INDEX_FILE = 'index.jsonl'
+COLUMNS = ('states', 'actions', 'probs', 'vals', 'rewards', 'dones', 'agent_ids')
+# Row numbers of each episode, grouped by episode and in time order (see TrajectoryReader.episode)
+EPISODE_ROWS = 'episode_rows'
+
+
+class TrajectoryRecorder:
+    """
+    Records every rollout Agent.learn consumes as one chunk on disk.
+
+    A chunk is a directory of .npy columns (states, actions, probs, vals,
+    rewards, dones, agent_ids) in the order the transitions were stored, so
+    they can be memory-mapped and fed back into PPOMemory unchanged. Chunks
+    are written under a temporary name and renamed once complete. index.jsonl
+    starts with a "recording" record holding the agent's action and
+    observation sizes. After each chunk, lines are appended to it: one "chunk"
+    record with the arguments of the learn call and the agents' ids, and one
+    "episode" record per agent trajectory in it. Recording into an existing
+    directory continues it.
+
+    Every transition takes about 73 bytes on disk (4 * input_dims + 29), so a
+    training run grows the recording by that much per step until it is
+    deleted; nothing is rotated.
+    """
+
+    def __init__(self, directory, n_actions, input_dims):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        records = read_index(directory)
+        self._chunks = sum(1 for record in records if record["kind"] == "chunk")
+        if not records:
+            self._append([{"kind": "recording", "n_actions": n_actions, "input_dims": input_dims,
+                           "time": time.time()}])
+        elif (records[0]["n_actions"], records[0]["input_dims"]) != (n_actions, input_dims):
+            raise ValueError(f"{directory} holds a recording for {records[0]['n_actions']} actions and "
+                             f"{records[0]['input_dims']} inputs, not {n_actions} and {input_dims}")
+
+    def _append(self, records):
+        with open(os.path.join(self.directory, INDEX_FILE), 'a') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+
+    def record_update(self, memory, total_completed_games, average_track_completion):
+        """
+        Write the transitions in memory as the next chunk.
+
+        Args:
+        memory (PPOMemory): The rollout about to be trained on.
+        total_completed_games (int): First argument of the learn call.
+        average_track_completion (float): Second argument of the learn call.
+        """
+        columns = dict(zip(COLUMNS, (memory.states, memory.actions, memory.probs, memory.vals,
+                                     memory.rewards, memory.dones, memory.agent_ids)))
+        agents = [str(agent_id) for agent_id in memory.agent_keys]
+        episodes, columns[EPISODE_ROWS] = _split_episodes(columns['agent_ids'], columns['dones'])
+
+        with self._lock:
+            chunk = self._chunks
+            name = f"chunk_{chunk:06d}"
+            tmp_path = os.path.join(self.directory, f"{name}.tmp")
+            os.makedirs(tmp_path, exist_ok=True)
+            for column, values in columns.items():
+                np.save(os.path.join(tmp_path, f"{column}.npy"), values)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+
+            records = [{"kind": "chunk", "chunk": chunk, "path": name, "rows": len(memory),
+                        "episode": int(total_completed_games),
+                        "average_track_completion": float(average_track_completion),
+                        "agents": agents, "time": time.time()}]
+            records += [{"kind": "episode", "chunk": chunk, "agent": agents[agent], "offset": offset,
+                         "length": length, "done": done}
+                        for agent, offset, length, done in episodes]
+            self._append(records)
+            self._chunks += 1
+
+
+def _split_episodes(agent_ids, dones):
+    """
+    Group the rows of a rollout into one trajectory per agent and episode.
+
+    Returns:
+    tuple: ([(agent index, offset, length, ended with done)], row numbers ordered by agent and time)
+    """
+    rows = np.argsort(agent_ids, kind='stable')
+    sorted_agents, sorted_dones = agent_ids[rows], dones[rows]
+    # A trajectory ends at a done or where the next row belongs to another agent
+    ends = sorted_dones.copy()
+    if len(rows):
+        ends[:-1] |= sorted_agents[1:] != sorted_agents[:-1]
+        ends[-1] = True
+    episodes, start = [], 0
+    for end in np.flatnonzero(ends).tolist():
+        episodes.append((int(sorted_agents[end]), start, end + 1 - start, bool(sorted_dones[end])))
+        start = end + 1
+    return episodes, rows.astype(np.int64)
+
+
+def read_index(directory):
+    """All records of a recording's index.jsonl, in the order they were written."""
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class TrajectoryReader:
+    """
+    Reads a recording written by TrajectoryRecorder.
+
+    Columns are memory-mapped, so iterating over a long recording only keeps
+    the chunk being consumed in memory.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        records = read_index(directory)
+        if not records:
+            raise FileNotFoundError(f"No recording in {directory}")
+        self.n_actions = records[0]["n_actions"]
+        self.input_dims = records[0]["input_dims"]
+        self.chunks = [r for r in records if r["kind"] == "chunk"]
+        self.episodes = [r for r in records if r["kind"] == "episode"]
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @property
+    def transitions(self):
+        return sum(chunk["rows"] for chunk in self.chunks)
+
+    def load_chunk(self, chunk, mmap=True):
+        """
+        Args:
+        chunk (dict): A record from self.chunks.
+        mmap (bool): Memory-map the columns instead of reading them.
+
+        Returns:
+        dict: Column name -> array, in the order the transitions were stored.
+        """
+        path = os.path.join(self.directory, chunk["path"])
+        return {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r' if mmap else None)
+                for column in COLUMNS + (EPISODE_ROWS,)}
+
+    def __iter__(self):
+        """Yields (chunk record, columns) in recording order."""
+        for chunk in self.chunks:
+            yield chunk, self.load_chunk(chunk)
+
+    def agent_episodes(self, agent):
+        """Episode records of one agent (e.g. a browser tab's agent_id), oldest first."""
+        return [episode for episode in self.episodes if episode["agent"] == str(agent)]
+
+    def episode(self, episode, columns=None):
+        """
+        Transitions of one episode record, in time order.
+
+        Args:
+        episode (dict): A record from self.episodes.
+        columns (dict, optional): The loaded chunk, to avoid loading it again.
+
+        Returns:
+        dict: Column name -> array with the episode's rows.
+        """
+        if columns is None:
+            columns = self.load_chunk(self.chunks[episode["chunk"]])
+        rows = np.asarray(columns[EPISODE_ROWS][episode["offset"]:episode["offset"] + episode["length"]])
+        return {column: np.asarray(columns[column][rows]) for column in COLUMNS}
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import threading
+import time
+
+REGISTRY_FILE = 'models.jsonl'
+_SAVED_MODEL_NAME = re.compile(r'^(actor|critic)_episodes_(\d+)_avg_(-?\d+)$')
+
+
+def directory_size(path):
+    """Total size in bytes of the files under path."""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+class ModelRegistry:
+    """
+    Append-only JSONL index of the actor/critic pairs saved by Agent.save_models.
+
+    Each line records one save: episode, average track completion, creation
+    time, and the paths (relative to the registry file) and sizes of the actor
+    and critic SavedModel directories. Readers only parse lines appended since
+    their last read, so queries stay cheap however many models a run produces.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self._entries = []
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_save_folders(cls, save_folder_actor):
+        """Registry next to the actor/ and critic/ folders, e.g. ai/saved_ppo_tf_models/models.jsonl."""
+        return cls(os.path.join(os.path.dirname(os.path.normpath(save_folder_actor)), REGISTRY_FILE))
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def record(self, episode, average_track_completion, actor_path, critic_path, created=None):
+        """Append an entry for a freshly saved actor/critic pair."""
+        entry = {
+            "episode": int(episode),
+            "average_track_completion": float(average_track_completion),
+            "created": time.time() if created is None else created,
+            "actor_path": os.path.relpath(actor_path, self.root),
+            "critic_path": os.path.relpath(critic_path, self.root),
+            "actor_bytes": directory_size(actor_path),
+            "critic_bytes": directory_size(critic_path),
+        }
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def entries(self):
+        """All entries in the order they were saved, with absolute paths."""
+        with self._lock:
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    f.seek(self._offset)
+                    for line in f:
+                        # A line still being written by another process has no newline yet
+                        if not line.endswith("\n"):
+                            break
+                        self._offset += len(line.encode())
+                        entry = json.loads(line)
+                        entry["actor_path"] = os.path.join(self.root, entry["actor_path"])
+                        entry["critic_path"] = os.path.join(self.root, entry["critic_path"])
+                        self._entries.append(entry)
+            return list(self._entries)
+
+    def latest(self):
+        """Entry with the highest episode number, or None."""
+        return max(self.entries(), key=lambda e: (e["episode"], e["created"]), default=None)
+
+    def best(self):
+        """Entry with the highest average track completion, or None."""
+        return max(self.entries(), key=lambda e: (e["average_track_completion"], e["episode"]), default=None)
+
+    def at_episode(self, episode):
+        """Most recent entry saved at the given episode, or None."""
+        matches = [e for e in self.entries() if e["episode"] == episode]
+        return max(matches, key=lambda e: e["created"], default=None)
+
+    def range(self, start=None, end=None):
+        """Entries with start <= episode <= end (either bound optional), sorted by episode."""
+        return sorted((e for e in self.entries()
+                       if (start is None or e["episode"] >= start) and (end is None or e["episode"] <= end)),
+                      key=lambda e: e["episode"])
+
+    def rebuild(self):
+        """
+        Create the registry for models saved before it existed by scanning the
+        actor/ and critic/ folders next to it once.
+
+        Returns:
+        int: Number of entries written.
+        """
+        if self.exists():
+            raise FileExistsError(f"{self.path} already exists")
+        pairs = {}
+        for model_type in ('actor', 'critic'):
+            folder = os.path.join(self.root, model_type)
+            for name in os.listdir(folder) if os.path.isdir(folder) else []:
+                match = _SAVED_MODEL_NAME.match(name)
+                if match and match.group(1) == model_type:
+                    key = (int(match.group(2)), int(match.group(3)))
+                    pairs.setdefault(key, {})[model_type] = os.path.join(folder, name)
+
+        count = 0
+        for (episode, average), paths in sorted(pairs.items()):
+            if len(paths) == 2:
+                self.record(episode, average, paths['actor'], paths['critic'],
+                            created=os.path.getmtime(paths['actor']))
+                count += 1
+        return count
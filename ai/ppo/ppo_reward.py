@@ -0,0 +1,9 @@
+# Loss gets -1, anything else is based on % completed difference
+def calculate_reward(last_state, observation, done, win):
+    if done and not win:
+        return -1  # Penalty for losing the game
+
+    percent_completed = observation[0] * 100
+    last_percent_completed = last_state[0] * 100
+    difference = percent_completed - last_percent_completed
+    return difference
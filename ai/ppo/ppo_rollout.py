@@ -0,0 +1,301 @@
+import multiprocessing as mp
+import queue
+import time
+
+import numpy as np
+
+ROLLOUT_FIELDS = ('states', 'actions', 'probs', 'vals', 'rewards', 'dones', 'agent_ids', 'versions')
+
+
+class _EpisodeBuffer:
+    """
+    Per-step arrays of one worker's VectorEnv, shipped to the learner one
+    finished episode at a time. Unfinished episodes stay in the buffer until
+    their car is done, so every trajectory the learner sees ends in a done.
+    """
+
+    def __init__(self, num_envs):
+        self.num_envs = num_envs
+        self.clear()
+
+    def clear(self):
+        self.steps = []
+        self.start = np.zeros(self.num_envs, dtype=np.int64)
+
+    def add(self, states, actions, probs, vals, rewards, dones, completion, recording, version):
+        self.steps.append((states, actions, probs, vals, rewards, dones, completion, recording,
+                           np.full(self.num_envs, version, dtype=np.int64)))
+
+    def pop_finished(self, agent_ids):
+        """Remove and return the finished episodes, grouped per car and in time order."""
+        if not self.steps:
+            return None
+        states, actions, probs, vals, rewards, dones, completion, recording, versions = \
+            (np.stack(column) for column in zip(*self.steps))
+        finished = dones & recording
+
+        rows = []
+        for env in range(self.num_envs):
+            done_steps = np.flatnonzero(finished[:, env])
+            if len(done_steps):
+                rows.append((np.arange(self.start[env], done_steps[-1] + 1), env))
+                self.start[env] = done_steps[-1] + 1
+
+        # Steps every car has shipped are no longer needed
+        shipped = int(self.start.min())
+        del self.steps[:shipped]
+        self.start -= shipped
+
+        if not rows:
+            return None
+        steps = np.concatenate([r for r, _ in rows])
+        envs = np.concatenate([np.full(len(r), env) for r, env in rows])
+        dones = dones[steps, envs]
+        return {
+            'states': states[steps, envs],
+            'actions': actions[steps, envs],
+            'probs': probs[steps, envs],
+            'vals': vals[steps, envs],
+            'rewards': rewards[steps, envs],
+            'dones': dones,
+            'agent_ids': agent_ids[envs],
+            'versions': versions[steps, envs],
+            'completion': completion[steps, envs][dones],
+        }
+
+
+def _flatten(weights):
+    return np.concatenate([w.ravel() for w in weights]).astype(np.float32)
+
+
+def _unflatten(flat, like):
+    weights, offset = [], 0
+    for w in like:
+        weights.append(flat[offset:offset + w.size].reshape(w.shape))
+        offset += w.size
+    return weights
+
+
+def _policy_arrays(agent):
+    """Actor weights, critic weights and, if the agent normalizes observations, their mean and variance."""
+    arrays = agent.actor.get_weights() + agent.critic.get_weights()
+    if agent.obs_normalizer is not None:
+        arrays += [agent.obs_normalizer.stats.mean, agent.obs_normalizer.stats.var]
+    return arrays
+
+
+def _rollout_worker(worker_id, shared, shapes, layout, num_envs, rollout_steps, synchronous, seed, env_kwargs):
+    # Workers act with the NumPy forward pass, so they never import TensorFlow
+    from ..env.vector_env import VectorEnv
+    from .ppo_numpy import NumpyPolicy
+    from .ppo_normalize import ObservationNormalizer
+
+    weights, version_value, go, stop, results = shared
+    # Never keep the process alive just to flush rollouts nobody will read
+    results.cancel_join_thread()
+
+    env = VectorEnv(num_envs, seed=seed, **env_kwargs)
+    n_actor, n_critic = layout
+    n_weights = n_actor + n_critic
+    shapes = [np.empty(shape, dtype=np.float32) for shape in shapes]
+    normalizer = ObservationNormalizer(shapes[0].shape[0]) if len(shapes) > n_weights else None
+    policy = NumpyPolicy(shapes[:n_actor], shapes[n_actor:n_weights], seed=None if seed is None else [seed, 1],
+                         obs_normalizer=normalizer)
+    agent_ids = worker_id * num_envs + np.arange(num_envs)
+    buffer = _EpisodeBuffer(num_envs)
+    observations = env.last_observation.copy()
+    version = -1
+
+    while True:
+        # Synchronous workers wait for the learner after every round
+        if synchronous:
+            go.wait()
+            go.clear()
+        if stop.is_set():
+            break
+
+        if version_value.value != version:
+            with weights.get_lock():
+                version = version_value.value
+                flat = np.frombuffer(weights.get_obj(), dtype=np.float32).copy()
+            unpacked = _unflatten(flat, shapes)
+            policy.set_weights(unpacked[:n_actor], unpacked[n_actor:n_weights])
+            if normalizer is not None:
+                normalizer.load_state_dict({"mean": unpacked[n_weights], "var": unpacked[n_weights + 1], "count": 0})
+
+        if synchronous:
+            # Like paused browser tabs: every round starts from fresh games
+            observations = env.reset()
+            buffer.clear()
+
+        start = time.perf_counter()
+        recording = np.ones(num_envs, dtype=bool)
+        steps = 0
+        while True:
+            actions, probs, values = policy.choose_actions(observations)
+            next_observations, rewards, dones, infos = env.step(actions)
+            buffer.add(observations, actions, probs, values, rewards, dones,
+                       infos['percent_completed'], recording.copy(), version)
+            observations = next_observations
+            steps += 1
+            if steps >= rollout_steps:
+                if not synchronous:
+                    break
+                # Finish the games in progress but do not record any new ones
+                recording &= ~dones
+                if not recording.any():
+                    break
+
+        rollout = buffer.pop_finished(agent_ids)
+        results.put((worker_id, rollout, steps * num_envs, time.perf_counter() - start))
+
+
+class RolloutWorkers:
+    """
+    Process pool that plays the headless racetrack with copies of the policy.
+
+    Each of num_workers processes steps a VectorEnv of envs_per_worker cars with
+    its own read-only actor and critic, and puts finished episodes on a queue.
+    The learner stores them with Agent.remember_batch, runs Agent.learn and
+    publishes the new weights with resume(); weights and observation normalizer
+    statistics are broadcast through one shared-memory array, so publishing
+    never waits on a busy worker.
+
+    synchronous=True keeps the semantics of app.py: every worker plays a round of
+    rollout_steps steps, finishes the games in progress and then waits, so data
+    collection and learning never overlap. With synchronous=False the workers
+    never wait; they pick up new weights between rounds, and every transition
+    records the policy version that chose it. Episodes whose oldest transition is
+    more than max_policy_lag versions behind the learner are dropped.
+    """
+
+    def __init__(self, num_workers, envs_per_worker=16, rollout_steps=256, synchronous=True,
+                 max_policy_lag=None, seed=None, **env_kwargs):
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.rollout_steps = rollout_steps
+        self.synchronous = synchronous
+        self.max_policy_lag = max_policy_lag
+        self.seed = seed
+        self.env_kwargs = env_kwargs
+
+        self.version = 0
+        self._processes = []
+        self._go = []
+        self.stats = {'env_steps': 0, 'episodes': 0, 'transitions': 0, 'dropped_episodes': 0,
+                      'policy_lag_sum': 0, 'max_policy_lag': 0, 'worker_seconds': 0.0}
+
+    def start(self, agent):
+        # Subclassed Keras models only create their weights on the first call
+        agent.choose_actions(np.zeros((1, agent.input_dims), dtype=np.float32))
+        all_weights = _policy_arrays(agent)
+        shapes = [w.shape for w in all_weights]
+        layout = (len(agent.actor.get_weights()), len(agent.critic.get_weights()))
+        flat = _flatten(all_weights)
+
+        # The learner process has TensorFlow loaded, which is not safe to fork
+        context = mp.get_context('spawn')
+        self._weights = context.Array('f', len(flat))
+        np.frombuffer(self._weights.get_obj(), dtype=np.float32)[:] = flat
+        self._version = context.Value('l', self.version)
+        self._stop = context.Event()
+        self._results = context.Queue()
+        for worker_id in range(self.num_workers):
+            go = context.Event()
+            seed = None if self.seed is None else self.seed + worker_id
+            shared = (self._weights, self._version, go, self._stop, self._results)
+            process = context.Process(
+                target=_rollout_worker, name=f"rollout-worker-{worker_id}", daemon=True,
+                args=(worker_id, shared, shapes, layout, self.envs_per_worker, self.rollout_steps,
+                      self.synchronous, seed, self.env_kwargs))
+            process.start()
+            self._processes.append(process)
+            self._go.append(go)
+        self.resume()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for go in self._go:
+            go.set()
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._go = []
+
+    def resume(self, agent=None):
+        """
+        Publish the agent's weights as a new policy version, if given, and let
+        synchronous workers play their next round.
+        """
+        if agent is not None:
+            flat = _flatten(_policy_arrays(agent))
+            with self._weights.get_lock():
+                np.frombuffer(self._weights.get_obj(), dtype=np.float32)[:] = flat
+                self.version += 1
+                self._version.value = self.version
+        if self.synchronous:
+            for go in self._go:
+                go.set()
+
+    def collect(self):
+        """
+        Wait for rollouts: one from every worker when synchronous, otherwise
+        whatever has arrived (at least one).
+
+        Returns:
+        list: One dict of transition arrays (see ROLLOUT_FIELDS) per rollout,
+            plus 'completion', the % completed of each finished episode.
+        """
+        messages = [self._get()]
+        if self.synchronous:
+            messages += [self._get() for _ in range(self.num_workers - 1)]
+        else:
+            while not self._results.empty():
+                messages.append(self._get())
+
+        rollouts = []
+        for _, rollout, env_steps, seconds in messages:
+            self.stats['env_steps'] += env_steps
+            self.stats['worker_seconds'] += seconds
+            if rollout is not None:
+                rollout = self._drop_stale(rollout)
+            if rollout is not None:
+                rollouts.append(rollout)
+        return rollouts
+
+    def _get(self):
+        while True:
+            try:
+                return self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    raise RuntimeError("A rollout worker exited unexpectedly")
+
+    def _drop_stale(self, rollout):
+        lag = self.version - rollout['versions']
+        # Episode index of every transition; an episode ends at its done
+        episode = np.concatenate([[0], np.cumsum(rollout['dones'][:-1])])
+        episode_lag = np.maximum.reduceat(lag, np.flatnonzero(np.diff(episode, prepend=-1)))
+        keep = np.ones(len(episode_lag), dtype=bool)
+        if self.max_policy_lag is not None:
+            keep = episode_lag <= self.max_policy_lag
+            self.stats['dropped_episodes'] += int((~keep).sum())
+            if not keep.any():
+                return None
+            rows = keep[episode]
+            completion = rollout['completion'][keep]
+            rollout = {key: rollout[key][rows] for key in ROLLOUT_FIELDS}
+            rollout['completion'] = completion
+            lag = lag[rows]
+
+        self.stats['episodes'] += int(keep.sum())
+        self.stats['transitions'] += len(lag)
+        self.stats['policy_lag_sum'] += int(lag.sum())
+        self.stats['max_policy_lag'] = max(self.stats['max_policy_lag'], int(lag.max()))
+        return rollout
+
+    def mean_policy_lag(self):
+        return self.stats['policy_lag_sum'] / max(self.stats['transitions'], 1)
@@ -0,0 +1,145 @@
+import threading
+import time
+
+
+class AgentState:
+    """
+    What the server remembers about one agent (browser tab) between requests.
+
+    Requests of the same agent hold its lock from observing the new state to
+    storing the chosen action, so two overlapping requests from one tab can
+    not interleave their transitions.
+    """
+
+    __slots__ = ("agent_id", "lock", "last_state", "last_action", "last_probs", "last_value",
+                 "paused", "state_since", "acting_seconds", "paused_seconds", "games",
+                 "episode_reward", "episode_steps")
+
+    def __init__(self, agent_id):
+        self.agent_id = agent_id
+        self.lock = threading.Lock()
+        self.last_state = None
+        self.last_action = None
+        self.last_probs = None
+        self.last_value = None
+        self.paused = False
+        self.state_since = time.perf_counter()
+        self.acting_seconds = 0.0
+        self.paused_seconds = 0.0
+        self.games = 0
+        self.episode_reward = 0.0
+        self.episode_steps = 0
+
+    def set_paused(self, paused):
+        now = time.perf_counter()
+        if self.paused:
+            self.paused_seconds += now - self.state_since
+        else:
+            self.acting_seconds += now - self.state_since
+        self.state_since = now
+        if paused and not self.paused:
+            self.games += 1
+        self.paused = paused
+
+    def stats(self):
+        now = time.perf_counter()
+        acting, paused = self.acting_seconds, self.paused_seconds
+        if self.paused:
+            paused += now - self.state_since
+        else:
+            acting += now - self.state_since
+        return {
+            "paused": self.paused,
+            "games": self.games,
+            "acting_seconds": acting,
+            "paused_seconds": paused,
+            "paused_fraction": paused / max(acting + paused, 1e-9),
+        }
+
+
+class TrainingState:
+    """
+    Agents and game counters of the training server, safe to use from many request threads.
+
+    The counters only change under one lock, and the check that enough games
+    were played for a training round happens under it together with the reset
+    of the per-round counters, so concurrent requests can not start the same
+    round twice.
+    """
+
+    def __init__(self, train_frequency=20, total_completed_games=0, averages=None):
+        self.train_frequency = train_frequency
+        self._lock = threading.Lock()
+        self._agents = {}
+        self.total_completed_games = total_completed_games
+        self.averages = list(averages or [])
+        self._completed_games = 0
+        self._total_percentage_completed = 0.0
+        self._total_reward = 0.0
+
+    def agent(self, agent_id):
+        """The AgentState for agent_id, created on first use."""
+        agent = self._agents.get(agent_id)
+        if agent is None:
+            with self._lock:
+                agent = self._agents.setdefault(agent_id, AgentState(agent_id))
+        return agent
+
+    def add_reward(self, agent, reward):
+        with self._lock:
+            self._total_reward += reward
+        agent.episode_reward += reward
+
+    def finish_game(self, agent, percentage_completed, learner_idle):
+        """
+        Count a finished game and pause its agent.
+
+        Args:
+        agent (AgentState): The agent whose game ended; the caller holds agent.lock.
+        percentage_completed (float): Track completion of the game.
+        learner_idle (bool): Whether a training round could start now.
+
+        Returns:
+        tuple: (episode number of the game, average % completed of the round or None).
+            The average is only returned, once, when a training round should start.
+        """
+        with self._lock:
+            self.total_completed_games += 1
+            self._completed_games += 1
+            self._total_percentage_completed += percentage_completed
+            episode = self.total_completed_games
+
+            # Games that finish while a round is running count towards the next one
+            average = None
+            if self._completed_games >= self.train_frequency and learner_idle:
+                average = self._record_statistics()
+
+            agent.last_state = None
+            agent.last_action = None
+            agent.set_paused(True)
+        return episode, average
+
+    def _record_statistics(self):
+        # Caller holds the lock
+        avg_reward = self._total_reward / self._completed_games
+        avg_percentage = self._total_percentage_completed / self._completed_games
+        self.averages.append((avg_reward, avg_percentage))
+        self._completed_games = 0
+        self._total_percentage_completed = 0.0
+        self._total_reward = 0.0
+        return avg_percentage
+
+    def unpause(self, agent_id):
+        agent = self._agents.get(agent_id)
+        if agent is not None:
+            with self._lock:
+                agent.set_paused(False)
+
+    def counters(self):
+        """Counters saved with each checkpoint so a resumed run continues its plots and episode numbers."""
+        with self._lock:
+            return {"total_completed_games": self.total_completed_games, "averages_array": list(self.averages)}
+
+    def agent_stats(self):
+        with self._lock:
+            return {str(agent_id): agent.stats() for agent_id, agent in self._agents.items()}
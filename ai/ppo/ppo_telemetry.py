@@ -0,0 +1,195 @@
+import bisect
+import cProfile
+import os
+import threading
+import time
+
+# Upper bounds in seconds: 10us to 50s in 1 / 2.5 / 5 steps per decade
+DEFAULT_BUCKETS = tuple(m * 10.0 ** e for e in range(-5, 2) for m in (1, 2.5, 5))
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations; observe() is a bisect and three additions under a lock."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """
+        Returns:
+        tuple: (cumulative counts per bucket including +Inf, sum, count).
+        """
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Telemetry:
+    """
+    Per-stage duration histograms and event counters for the training pipeline.
+
+    Code on the hot path wraps a stage in `with telemetry.time("stage"):` and
+    bumps counters with telemetry.count(name). Both cost about a microsecond,
+    so they stay on in production. The totals are rendered in the Prometheus
+    text exposition format by prometheus_text().
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram(self.buckets))
+        return histogram
+
+    def time(self, stage):
+        """Context manager recording the wall time of the block under stage."""
+        return _Timer(self.histogram(stage))
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).observe(seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        """Stage -> {count, sum_seconds, mean_ms}, plus the counters; for JSON responses."""
+        stages = {}
+        for stage, histogram in sorted(self._histograms.items()):
+            _, total, count = histogram.snapshot()
+            stages[stage] = {"count": count, "sum_seconds": total,
+                             "mean_ms": total / count * 1000 if count else 0.0}
+        with self._lock:
+            counters = dict(self._counters)
+        return {"stages": stages, "counters": counters}
+
+    def prometheus_text(self, prefix="ppo"):
+        """Histograms and counters in the Prometheus text exposition format (version 0.0.4)."""
+        lines = [f"# HELP {prefix}_stage_seconds Wall time of training pipeline stages.",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, histogram in sorted(self._histograms.items()):
+            cumulative, total, count = histogram.snapshot()
+            for bound, c in zip(self.buckets, cumulative):
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {c}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative[-1]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {total!r}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {count}')
+        with self._lock:
+            counters = sorted(self._counters.items())
+        for name, value in counters:
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+class ProfileCapture:
+    """
+    Opt-in profiler for the next N training updates.
+
+    request() arms it; the learner wraps every update in update(). While armed,
+    each update runs under cProfile (one .prof file per update, readable with
+    pstats or snakeviz) or, with mode 'tf', all remaining updates are captured
+    into one tf.profiler trace for TensorBoard.
+    """
+
+    MODES = ("cprofile", "tf")
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._mode = None
+        self._tf_active = False
+        self.captured = []
+
+    def request(self, updates, mode="cprofile"):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {self.MODES}")
+        if int(updates) < 1:
+            raise ValueError(f"Profile at least one update, not {updates}")
+        with self._lock:
+            if self._remaining:
+                raise RuntimeError(f"A {self._mode} capture is already running "
+                                   f"({self._remaining} updates to go)")
+            self._remaining = int(updates)
+            self._mode = mode
+
+    def status(self):
+        with self._lock:
+            return {"mode": self._mode if self._remaining else None,
+                    "remaining_updates": self._remaining, "captured": list(self.captured)}
+
+    def update(self, label):
+        """Context manager around one training update; profiles it if a capture is armed."""
+        capture = self
+
+        class Update:
+            def __enter__(self):
+                with capture._lock:
+                    self.mode = capture._mode if capture._remaining else None
+                if self.mode == "cprofile":
+                    self.profile = cProfile.Profile()
+                    self.profile.enable()
+                elif self.mode == "tf" and not capture._tf_active:
+                    import tensorflow as tf
+                    tf.profiler.experimental.start(os.path.join(capture.output_dir, "tf"))
+                    capture._tf_active = True
+
+            def __exit__(self, *exc):
+                if self.mode is None:
+                    return
+                with capture._lock:
+                    capture._remaining -= 1
+                    finished = capture._remaining == 0
+                os.makedirs(capture.output_dir, exist_ok=True)
+                if self.mode == "cprofile":
+                    self.profile.disable()
+                    path = os.path.join(capture.output_dir, f"update_{label}.prof")
+                    self.profile.dump_stats(path)
+                    capture.captured.append(path)
+                elif finished:
+                    import tensorflow as tf
+                    tf.profiler.experimental.stop()
+                    capture._tf_active = False
+                    capture.captured.append(os.path.join(capture.output_dir, "tf"))
+
+        return Update()
+
+
+# Process-wide instance used by the agent, the learner and app.py
+telemetry = Telemetry()
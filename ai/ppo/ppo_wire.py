@@ -0,0 +1,94 @@
+import numpy as np
+
+# Binary counterpart of the JSON /get_action API, for clients that step many
+# agents at once. All values are little-endian.
+#
+# Request:  header, then `count` step records of the given state_space
+# Response: header, then `count` action records in the same order
+MAGIC = b'FJC1'
+CONTENT_TYPE = 'application/octet-stream'
+
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('state_space', '<u2'), ('flags', '<u2'), ('count', '<u4')])
+ACTION_DTYPE = np.dtype([('action', '<i4'), ('log_prob', '<f4'), ('value', '<f4'),
+                         ('pause', 'u1'), ('_pad', 'u1', 3)])
+
+
+def step_dtype(state_space):
+    """Record layout of one agent's step: who it is, how its last action ended, what it sees."""
+    return np.dtype([('agent_id', '<u4'), ('done', 'u1'), ('win', 'u1'), ('_pad', 'u1', 2),
+                     ('observation', '<f4', (state_space,))])
+
+
+def _header(state_space, count):
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = MAGIC
+    header['state_space'] = state_space
+    header['count'] = count
+    return header.tobytes()
+
+
+def _read_header(payload):
+    if len(payload) < HEADER_DTYPE.itemsize:
+        raise ValueError("Payload is shorter than the header")
+    header = np.frombuffer(payload, dtype=HEADER_DTYPE, count=1)[0]
+    if header['magic'] != MAGIC:
+        raise ValueError("Payload does not start with the protocol magic")
+    return int(header['state_space']), int(header['count'])
+
+
+def encode_steps(agent_ids, observations, dones, wins):
+    """
+    Pack one step for each of N agents into a request payload.
+
+    Args:
+    agent_ids (array-like): Integer agent ids, one per agent.
+    observations (array-like): Observations with shape [N, state_space].
+    dones (array-like): Whether each agent's game just ended.
+    wins (array-like): Whether each agent's game was won.
+
+    Returns:
+    bytes: The request payload.
+    """
+    observations = np.asarray(observations, dtype=np.float32)
+    count, state_space = observations.shape
+    records = np.zeros(count, dtype=step_dtype(state_space))
+    records['agent_id'] = agent_ids
+    records['done'] = dones
+    records['win'] = wins
+    records['observation'] = observations
+    return _header(state_space, count) + records.tobytes()
+
+
+def decode_steps(payload, state_space):
+    """
+    Unpack a request payload without copying the observations.
+
+    Args:
+    payload (bytes): The request body.
+    state_space (int): Expected observation size; a mismatch is rejected.
+
+    Returns:
+    numpy.ndarray: Structured array of step records (see step_dtype).
+    """
+    payload_state_space, count = _read_header(payload)
+    if payload_state_space != state_space:
+        raise ValueError(f"Observations have {payload_state_space} values, expected {state_space}")
+    dtype = step_dtype(state_space)
+    if len(payload) != HEADER_DTYPE.itemsize + count * dtype.itemsize:
+        raise ValueError("Payload size does not match the record count")
+    return np.frombuffer(payload, dtype=dtype, count=count, offset=HEADER_DTYPE.itemsize)
+
+
+def encode_actions(actions, log_probs, values, pauses):
+    """Pack the chosen action, its log-probability, the value estimate and the pause flag of each agent."""
+    records = np.zeros(len(actions), dtype=ACTION_DTYPE)
+    records['action'] = actions
+    records['log_prob'] = log_probs
+    records['value'] = values
+    records['pause'] = pauses
+    return _header(0, len(records)) + records.tobytes()
+
+
+def decode_actions(payload):
+    _, count = _read_header(payload)
+    return np.frombuffer(payload, dtype=ACTION_DTYPE, count=count, offset=HEADER_DTYPE.itemsize)
@@ -1,29 +1,31 @@
+import time
+_process_start = time.perf_counter()
+
+import argparse
 import json
 import subprocess
 import sys
+from contextlib import ExitStack
 from datetime import datetime
-from ai.ppo.ppo import Agent
 import os
-from flask import Flask, request, jsonify
-import numpy as np
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import matplotlib.pyplot as plt
-plt.switch_backend('Agg')
 
-# Initialize Flask app
-app = Flask(__name__, static_folder='dist')
-CORS(app)
+# TensorFlow and NumPy are only imported once training starts, so the build
+# and UI-only paths start without them. Plots are rendered out of band by
+# plot_metrics.py from the metrics log
+
+SAVED_MODELS_DIR = "./ai/saved_ppo_tf_models"
+COMMON_CONFIG_PATH = './ui/static/common-with-flask-config.json'
 
 
 def load_config():
-    with open('./ui/static/common-with-flask-config.json') as f:
-        common_config = json.load(f)
-        for key in common_config:
-            config[key] = common_config[key]
+    with open(COMMON_CONFIG_PATH) as f:
+        return json.load(f)
 
 
 def update_config(training_mode):
-    with open('./ui/static/common-with-flask-config.json', 'r+') as f:
+    with open(COMMON_CONFIG_PATH, 'r+') as f:
         common_config = json.load(f)
         common_config['training_mode'] = training_mode
         f.seek(0)
@@ -31,6 +33,41 @@ def update_config(training_mode):
         f.truncate()
 
 
+def make_config(saved_models_dir, record=False):
+    """Server configuration plus the settings shared with the UI."""
+    config = {
+        "save_folder_actor": f"{saved_models_dir}/actor",
+        "save_folder_critic": f"{saved_models_dir}/critic",
+        # Observations from concurrent agents are batched into one forward pass
+        "inference_max_batch_size": 64,
+        "inference_max_wait_ms": 2,
+        # Resumable checkpoints: the most recent ones plus the best by track completion
+        "checkpoint_dir": f"{saved_models_dir}/checkpoints",
+        "checkpoint_keep_last": 3,
+        "checkpoint_keep_best": 1,
+        # Per-episode and per-update metrics, streamed as NDJSON
+        "metrics_log": f"{saved_models_dir}/metrics.ndjson",
+        # Every rollout the learner trains on, for offline replay with replay_trajectories.py.
+        # Off unless record is set (--record); it grows by about 73 bytes per transition and is never pruned
+        "record_dir": f"{saved_models_dir}/recordings" if record else None,
+        # cProfile / tf.profiler captures requested through POST /profile
+        "profile_dir": f"{saved_models_dir}/profiles",
+        # Completed games between training rounds
+        "train_frequency": 20,
+        # Minibatch size of the update, and the approximate KL after which its remaining epochs
+        # are skipped (None always runs every epoch); see benchmarks/autotune_batch_size.py
+        "batch_size": 64,
+        "target_kl": None,
+        # Running-statistics preprocessing (ai/ppo/ppo_normalize.py); the observation
+        # statistics are saved with the models and applied by the web app too
+        "normalize_obs": False,
+        "scale_rewards": False,
+        "normalize_advantage": False,
+    }
+    config.update(load_config())
+    return config
+
+
 def start_ui_app():
     os.chdir('ui')
     web_app_process = subprocess.Popen(['npm', 'run', 'dev'])
@@ -48,46 +85,300 @@ def create_production_build():
     os.chdir('..')
 
 
-def plot_statistics():
-    global averages_array, completed_games, total_percentage_completed, total_reward
-    print("Plotting statistics")
-
-    # Calculate averages for the current batch of games
-    avg_reward = total_reward / completed_games
-    avg_percentage = total_percentage_completed / completed_games
-
-    # Append averages to the array
-    averages_array.append((avg_reward, avg_percentage))
-
-    # Reset counters for the next batch
-    completed_games = 0
-    total_percentage_completed = 0
-    total_reward = 0
-
-    # Extract data for plotting
-    rewards, percentages = zip(*averages_array)
-    games = [i * train_frequency for i in range(1, len(averages_array) + 1)]
-
-    # Create the plot
-    fig, ax1 = plt.subplots()
-
-    color = 'tab:red'
-    ax1.set_xlabel('Total Completed Games')
-    ax1.set_ylabel('Average Reward', color=color)
-    ax1.plot(games, rewards, color=color)
-    ax1.tick_params(axis='y', labelcolor=color)
-
-    ax2 = ax1.twinx()
-    color = 'tab:blue'
-    ax2.set_ylabel('Average % Completed', color=color)
-    ax2.plot(games, percentages, color=color)
-    ax2.tick_params(axis='y', labelcolor=color)
-
-    fig.tight_layout()
-    plt.savefig('./statistics.png')
-    plt.close()
-
-    return avg_percentage
+class StartupProfile:
+    """Wall time and number of newly imported modules for each startup step."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.sections = [("imports before main (flask)", time.perf_counter() - _process_start, len(sys.modules))]
+
+    def section(self, label):
+        profile = self
+
+        class Section:
+            def __enter__(self):
+                self.start = time.perf_counter()
+                self.modules = len(sys.modules)
+
+            def __exit__(self, *exc):
+                profile.sections.append(
+                    (label, time.perf_counter() - self.start, len(sys.modules) - self.modules))
+
+        return Section()
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("\nStartup profile (time to listen):")
+        for label, seconds, modules in self.sections:
+            print(f"  {label:<40} {seconds:>7.3f}s {modules:>6} modules")
+        print(f"  {'total':<40} {time.perf_counter() - _process_start:>7.3f}s {len(sys.modules):>6} modules\n")
+
+
+def create_app(config, training=True, resume=False, profile_updates=0, profile_mode='cprofile', profile=None):
+    """
+    Build the Flask app. In training mode it owns the model, the batched inference
+    thread and the background learner, so a process must create exactly one.
+
+    Every route is safe to call from many threads at once: shared counters live in
+    a TrainingState and each agent's requests are serialized by its own lock. Serve
+    it with app.run(threaded=True) or a single gunicorn worker with many threads
+    (see wsgi.py and gunicorn.conf.py).
+
+    Args:
+    config (dict): Output of make_config.
+    training (bool): Register the training API; otherwise only the built UI is served.
+    resume (bool): Continue from the latest checkpoint.
+    profile_updates (int): Profile the first N training updates.
+    profile_mode (str): 'cprofile' or 'tf'.
+    profile (StartupProfile, optional): Records how long the startup steps took.
+
+    Returns:
+    Flask: The application.
+    """
+    app = Flask(__name__, static_folder='dist')
+    CORS(app)
+    if not training:
+        return app
+    profile = profile or StartupProfile(False)
+
+    with profile.section("import numpy + training modules (TF)"):
+        import numpy as np
+        from ai.ppo.ppo import Agent
+        from ai.ppo.ppo_inference import BatchedInference
+        from ai.ppo.ppo_learner import BackgroundLearner
+        from ai.ppo.ppo_checkpoint import CheckpointManager
+        from ai.ppo.ppo_metrics import MetricsLogger
+        from ai.ppo.ppo_recorder import TrajectoryRecorder
+        from ai.ppo.ppo_state import TrainingState
+        from ai.ppo.ppo_telemetry import ProfileCapture, telemetry
+        from ai.ppo import ppo_wire
+
+    with profile.section("create agent and policy buffers"):
+        model = Agent(n_actions=config["action_space"],
+                      input_dims=config["state_space"],
+                      save_folder_actor=config["save_folder_actor"],
+                      save_folder_critic=config["save_folder_critic"],
+                      batch_size=config["batch_size"],
+                      target_kl=config["target_kl"],
+                      normalize_obs=config["normalize_obs"],
+                      scale_rewards=config["scale_rewards"],
+                      normalize_advantage=config["normalize_advantage"],
+                      recorder=TrajectoryRecorder(config["record_dir"], config["action_space"],
+                                                  config["state_space"]) if config["record_dir"] else None
+                      )
+        checkpoints = CheckpointManager(config["checkpoint_dir"],
+                                        keep_last=config["checkpoint_keep_last"],
+                                        keep_best=config["checkpoint_keep_best"])
+        resumed = checkpoints.restore_latest(model) if resume else None
+
+        # Agents (browser tabs) and game counters, shared by the request threads
+        if resumed is not None:
+            state = TrainingState(config["train_frequency"],
+                                  resumed["extra"].get("total_completed_games", resumed["episode"]),
+                                  [tuple(a) for a in resumed["extra"].get("averages_array", [])])
+        else:
+            state = TrainingState(config["train_frequency"])
+
+        metrics = MetricsLogger(config["metrics_log"], append=resume)
+        profiler = ProfileCapture(config["profile_dir"])
+        if profile_updates:
+            profiler.request(profile_updates, profile_mode)
+        # Training runs on a background thread; agents keep acting with the previous weights
+        learner = BackgroundLearner(model, checkpoints=checkpoints, checkpoint_extra=state.counters,
+                                    metrics=metrics, profiler=profiler)
+        inference = BatchedInference(learner.choose_actions,
+                                     max_batch_size=config["inference_max_batch_size"],
+                                     max_wait_ms=config["inference_max_wait_ms"]).start()
+
+    def observe_step(agent, observation, done, win):
+        """Store the transition that led to this observation. The caller holds agent.lock."""
+        if agent.last_state is not None:
+            with telemetry.time("reward"):
+                reward = model.calculateReward(agent.last_state, observation, done, win)
+            learner.remember(agent.last_state, agent.last_action, agent.last_probs, agent.last_value,
+                             reward, done, agent.agent_id)
+            state.add_reward(agent, reward)
+
+    def act_step(agent, observation, done, action, probs, value):
+        """Remember the chosen action; returns True if the agent should pause. The caller holds agent.lock."""
+        agent.last_state = observation
+        agent.last_action = action
+        agent.last_probs = probs
+        agent.last_value = value
+        agent.episode_steps += 1
+
+        # Decide whether to pause the agent or continue with next action
+        if not done:
+            return False
+
+        episode, average = state.finish_game(agent, observation[0] * 100, learner_idle=not learner.is_training)
+        telemetry.count("episodes")
+        metrics.log_episode(episode, observation[0] * 100, agent.episode_reward, agent.episode_steps,
+                            agent.agent_id)
+        agent.episode_reward = 0.0
+        agent.episode_steps = 0
+
+        # Train in the background once enough games are in
+        if average is not None:
+            print("Training started")
+            learner.request_update(episode, average)
+        return True
+
+    #
+    #   API endpoint used when training the AI locally
+    #   Each agent (browser tab) will call this endpoint continuously to get the next action
+    #
+    @app.route('/get_action', methods=['POST'])
+    def get_action():
+        with telemetry.time("decode"):
+            data = request.json
+            agent_id = data['agent_id']
+            observation = np.array(list(data['observation'].values()))
+            done = data['done']
+            win = data['win']
+            time_since_game_start = data['time_since_game_start']
+        telemetry.count("requests")
+
+        agent = state.agent(agent_id)
+        with agent.lock:
+            observe_step(agent, observation, done, win)
+
+            # Decide on next action; includes the wait for the batch to fill
+            with telemetry.time("inference"):
+                action, probs, value = inference.choose_action(observation)
+            pause = act_step(agent, observation, done, action, probs, value)
+
+        # Convert action int to dictionary of actions
+        action_str = str(action)
+        action_dict = dict(config["action_mappings"][action_str])
+        for action in config["actions_list"]:
+            if action not in action_dict:
+                action_dict[action] = False
+
+        return jsonify({"action": action_dict, "pause": pause})
+
+    #
+    #   Binary version of /get_action for clients that step many agents per request.
+    #   Takes packed float32 observations (see ai/ppo/ppo_wire.py) and answers with
+    #   packed action indices and log-probs from one forward pass
+    #
+    @app.route('/get_actions_binary', methods=['POST'])
+    def get_actions_binary():
+        try:
+            with telemetry.time("decode"):
+                steps = ppo_wire.decode_steps(request.get_data(), config["state_space"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if len(set(steps['agent_id'].tolist())) != len(steps):
+            return jsonify({"error": "an agent_id appears more than once in the request"}), 400
+        telemetry.count("requests")
+
+        observations = steps['observation']
+        agents = [state.agent(int(agent_id)) for agent_id in steps['agent_id']]
+        with ExitStack() as stack:
+            # Lock in a fixed order so overlapping batches can not deadlock
+            for agent in sorted(agents, key=lambda agent: agent.agent_id):
+                stack.enter_context(agent.lock)
+            for agent, observation, step in zip(agents, observations, steps):
+                observe_step(agent, observation, bool(step['done']), bool(step['win']))
+
+            actions, probs, values = learner.choose_actions(observations)
+            pauses = [act_step(agent, observation, bool(done), action, prob, value)
+                      for agent, observation, done, action, prob, value
+                      in zip(agents, observations, steps['done'], actions, probs, values)]
+
+        payload = ppo_wire.encode_actions(actions, probs, values, pauses)
+        return Response(payload, mimetype=ppo_wire.CONTENT_TYPE)
+
+    #
+    #   API endpoint used when training the AI locally
+    #   Each agent (browser tab) calls this endpoint after a game to check if it should unpause
+    #   Training never blocks this request: agents restart their game immediately
+    #   with the latest published weights
+    #
+    @app.route('/check_unpause', methods=['GET'])
+    def check_unpause():
+        state.unpause(request.args.get('agent_id'))
+        return jsonify({"unpause": True, "policy_version": learner.version})
+
+    #
+    #   Time each agent (browser tab) spent playing vs. waiting between games,
+    #   and the state of the background learner
+    #
+    @app.route('/agent_stats', methods=['GET'])
+    def agent_stats():
+        return jsonify({"agents": state.agent_stats(), "learner": learner.stats()})
+
+    #
+    #   Latency and throughput counters of the batched inference layer
+    #
+    @app.route('/inference_stats', methods=['GET'])
+    def inference_stats():
+        return jsonify(inference.stats())
+
+    #
+    #   Latest training aggregates from the metrics log (recent episodes, last update)
+    #   and the stage timers. Prometheus scrapers (Accept: text/plain) get the
+    #   histograms in the text exposition format, everything else gets JSON
+    #
+    @app.route('/metrics', methods=['GET'])
+    def training_metrics():
+        # Prometheus asks for "text/plain; version=0.0.4", which plain "text/plain" does not match
+        best = request.accept_mimetypes.best_match(
+            ['application/json', 'text/plain', 'text/plain; version=0.0.4'], default='application/json')
+        if best.startswith('text/plain') or request.args.get('format') == 'prometheus':
+            return Response(telemetry.prometheus_text(), mimetype='text/plain; version=0.0.4')
+        return jsonify({**metrics.summary(), "timers": telemetry.snapshot()})
+
+    #
+    #   Profile the next N training updates: POST /profile?updates=3&mode=cprofile (or mode=tf).
+    #   GET returns the capture status and the files written so far
+    #
+    @app.route('/profile', methods=['GET', 'POST'])
+    def profile_updates():
+        if request.method == 'POST':
+            try:
+                profiler.request(int(request.args.get('updates', 1)), request.args.get('mode', 'cprofile'))
+            except (ValueError, RuntimeError) as e:
+                return jsonify({"error": str(e)}), 400
+        return jsonify(profiler.status())
+
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run the racetrack UI and, in training mode, the PPO training server. "
+                    "Questions not answered by a flag are asked interactively.")
+    parser.add_argument('--build', action=argparse.BooleanOptionalAction, default=None,
+                        help="Create a production build of the UI app and exit.")
+    parser.add_argument('--training', action=argparse.BooleanOptionalAction, default=None,
+                        help="Run in training mode.")
+    parser.add_argument('--rename-models', action=argparse.BooleanOptionalAction, default=None,
+                        help="Rename an existing saved models directory with a datetime suffix before training.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Resume training from the latest checkpoint in the saved models directory.")
+    parser.add_argument('--ui', action=argparse.BooleanOptionalAction, default=True,
+                        help="Start the UI dev server (npm run dev).")
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8080)))
+    parser.add_argument('--record', action='store_true',
+                        help="Record every rollout to the saved models directory's recordings folder.")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="Print how long each startup step and its imports took.")
+    parser.add_argument('--profile-updates', type=int, default=0,
+                        help="Profile the first N training updates (also available through POST /profile).")
+    parser.add_argument('--profile-mode', choices=['cprofile', 'tf'], default='cprofile',
+                        help="cProfile .prof file per update, or one tf.profiler trace for TensorBoard.")
+    return parser.parse_args()
+
+
+def ask(flag_value, question):
+    """Use the command line flag if given, otherwise ask the y/n question."""
+    if flag_value is not None:
+        return flag_value
+    print(question)
+    return input().strip().lower() == "y"
 
 
 def rename_existing_save_folder(folder_path):
@@ -102,10 +393,11 @@ def rename_existing_save_folder(folder_path):
 # Main entry point and logic
 #
 if __name__ == "__main__":
+    args = parse_args()
+    profile = StartupProfile(args.startup_profile)
+    web_app_process = None
     try:
-        print("Would you like to create a production build of the UI app? (y/n)")
-        should_create_production_build = input().strip().lower()
-        if should_create_production_build == "y":
+        if ask(args.build, "Would you like to create a production build of the UI app? (y/n)"):
             try:
                 create_production_build()
                 print("\nProduction build completed successfully to ./ui/dist")
@@ -114,160 +406,33 @@ if __name__ == "__main__":
                 sys.exit(1)
             sys.exit(0)
 
-        print("Would you like to run the app in training mode? (y/n)")
-        training_mode = input().strip().lower() == "y"
-        saved_models_dir = "./ai/saved_ppo_tf_models"
-        if training_mode:
+        training_mode = ask(args.training, "Would you like to run the app in training mode? (y/n)")
+        saved_models_dir = SAVED_MODELS_DIR
+        if training_mode and not args.resume:
             if os.path.exists(saved_models_dir):
-                print(
+                rename_folder = ask(
+                    args.rename_models,
                     f"The directory {saved_models_dir} already exists. Would you like to rename it with a datetime suffix? (y/n)")
-                rename_folder = input().strip().lower() == "y"
                 if rename_folder:
                     rename_existing_save_folder(saved_models_dir)
 
         # Configuration variables
-        config = {
-            "save_folder_actor": f"{saved_models_dir}/actor",
-            "save_folder_critic": f"{saved_models_dir}/critic",
-        }
         update_config(training_mode)
-        load_config()
+        config = make_config(saved_models_dir, record=args.record)
         print(config)
-        web_app_process = start_ui_app()
+        if args.ui:
+            with profile.section("start UI app"):
+                web_app_process = start_ui_app()
 
         if not training_mode:
-            # In non-training mode, the Flask app exits after starting the UI app
-            print("UI app started in non-training mode")
-        else:
-            # Flask app continues to run in training mode
-            model = Agent(n_actions=config["action_space"],
-                          input_dims=config["state_space"],
-                          save_folder_actor=config["save_folder_actor"],
-                          save_folder_critic=config["save_folder_critic"]
-                          )
-
-            # Struct to keep track of agent-specific data for enabling multiple agents at once (multiple browser tabs)
-            agent_data = {}
-            is_training = False
-            train_frequency = 20
-
-            """Logging code"""
-            total_completed_games = 0
-            averages_array = []
-            completed_games = 0
-            total_percentage_completed = 0
-            total_reward = 0
-            """End of logging code"""
-
-            #
-            #   API endpoint used when training the AI locally
-            #   Each agent (browser tab) will call this endpoint continuously to get the next action
-            #
-            @app.route('/get_action', methods=['POST'])
-            def get_action():
-                global completed_games, total_percentage_completed, total_reward, total_completed_games
-
-                data = request.json
-                agent_id = data['agent_id']
-                observation = np.array(list(data['observation'].values()))
-                done = data['done']
-                win = data['win']
-                time_since_game_start = data['time_since_game_start']
-
-                # Initialize agent's data if not existing
-                if agent_id not in agent_data:
-                    agent_data[agent_id] = {
-                        "last_state": None,
-                        "last_action": None,
-                        "paused": False
-                    }
-
-                current_agent = agent_data[agent_id]
-
-                # Store training data from previous observation/action
-                if current_agent["last_state"] is not None:
-                    reward = model.calculateReward(
-                        current_agent["last_state"], observation, done, win)
-                    model.remember(current_agent["last_state"], current_agent["last_action"],
-                                   current_agent["last_probs"], current_agent["last_value"],
-                                   reward, done)
-
-                    """Logging code"""
-                    total_reward += reward
-                    """End of logging code"""
-
-                # Decide on next action
-                action, probs, value = model.choose_action(observation)
-
-                # Update agent's data
-                current_agent["last_state"] = observation
-                current_agent["last_action"] = action
-                current_agent["last_probs"] = probs
-                current_agent["last_value"] = value
-
-                # Convert action int to dictionary of actions
-                action_str = str(action)
-                action_dict = config["action_mappings"][action_str]
-                for action in config["actions_list"]:
-                    if action not in action_dict:
-                        action_dict[action] = False
-
-                # Decide whether to pause the agent or continue with next action
-                if done:
-                    """Logging code"""
-                    total_completed_games += 1
-                    completed_games += 1
-                    total_percentage_completed += observation[0] * 100
-                    """End of logging code"""
-
-                    # Reset agent's data
-                    current_agent["last_state"] = None
-                    current_agent["last_action"] = None
-                    current_agent["paused"] = True
-                    return jsonify({"action": action_dict, "pause": True})
-                else:
-                    return jsonify({"action": action_dict, "pause": False})
-
-            #
-            #   API endpoint used when training the AI locally
-            #   Each agent (browser tab) will call this endpoint continuously to check if it should unpause
-            #
-
-            @app.route('/check_unpause', methods=['GET'])
-            def check_unpause():
-                global is_training, completed_games
-
-                agent_id = request.args.get('agent_id')
-
-                if all([data["paused"] for data in agent_data.values()]) and not is_training:
-                    is_training = True
-                    print("Training started")
-                    did_train = False
-
-                    if completed_games >= train_frequency:
-                        print("Plotting statistics")
-                        avarage_track_completion = plot_statistics()
-                        did_train = model.learn(
-                            total_completed_games, avarage_track_completion)
-                    else:
-                        print(
-                            f"Not enough games completed for training ({completed_games}/{train_frequency})")
-
-                    for data in agent_data.values():
-                        data["paused"] = False
-                    is_training = False
-
-                    print("did_train:", did_train)
-                    return jsonify({"unpause": True})
-
-                if agent_id in agent_data and not agent_data[agent_id]["paused"]:
-                    return jsonify({"unpause": True})
-
-                return jsonify({"unpause": False})
+            print("UI app started in non-training mode" if args.ui
+                  else "Running in non-training mode without the UI app")
+        app = create_app(config, training=training_mode, resume=args.resume,
+                         profile_updates=args.profile_updates, profile_mode=args.profile_mode, profile=profile)
 
         # Start the Flask app
-        port = int(os.environ.get('PORT', 8080))
-        app.run(debug=False, host='0.0.0.0', port=port)
+        profile.report()
+        app.run(debug=False, host='0.0.0.0', port=args.port, threaded=True)
     except KeyboardInterrupt:
         print("Ctrl+C pressed. Shutting down both apps.")
         if web_app_process:
@@ -0,0 +1,118 @@
+"""
+Pick the largest minibatch size that keeps training updates under a time budget without losing sample efficiency.
+
+Trains a fresh agent on the headless racetrack with each candidate batch size
+(same seeds, same number of games) and measures the mean wall time of
+Agent.learn and the area under the learning curve (mean % completed over all
+training rounds). A candidate matches the sample efficiency of the smallest
+candidate if its area is at least --tolerance times as large. The largest
+candidate that matches and whose mean update time is within --budget is
+recommended, for train_headless.py --batch-size or "batch_size" in app.py.
+
+Run from the repository root:
+    python -m benchmarks.autotune_batch_size --budget 0.5
+"""
+import argparse
+import json
+
+import numpy as np
+
+from benchmarks.learning_curve import learning_curve, mean_completion
+
+
+def evaluate(batch_size, args):
+    """
+    Returns:
+    dict: The candidate's measurements; the update columns are None if no
+        training round reached the agent's learning trigger.
+    """
+    results = [learning_curve({"batch_size": batch_size, "target_kl": args.target_kl}, seed, args.games,
+                              args.train_frequency, args.max_steps)
+               for seed in args.seeds]
+    update_seconds = [s for r in results for s in r["update_seconds"]]
+    return {
+        "batch_size": batch_size,
+        "mean_completion": float(np.mean([mean_completion(r["curve"]) for r in results])),
+        "updates": len(update_seconds),
+        "update_seconds": float(np.mean(update_seconds)) if update_seconds else None,
+        "max_update_seconds": float(max(update_seconds)) if update_seconds else None,
+        "epochs": float(np.mean([e for r in results for e in r["epochs"]])) if update_seconds else None,
+        "seconds": float(sum(r["seconds"] for r in results)),
+    }
+
+
+def fraction(value):
+    value = float(value)
+    if not 0 < value <= 1:
+        raise argparse.ArgumentTypeError(f"must be in (0, 1], got {value:g}")
+    return value
+
+
+def choose(candidates, budget, tolerance):
+    """
+    Returns:
+    tuple: (recommended candidate or None, candidates that match the reference's sample efficiency).
+    """
+    reference = candidates[0]["mean_completion"]
+    efficient = [c for c in candidates if c["mean_completion"] >= tolerance * reference]
+    within_budget = [c for c in efficient if c["updates"] and c["update_seconds"] <= budget]
+    return (within_budget[-1] if within_budget else None), efficient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--candidates', type=int, nargs='+', default=[64, 128, 256, 512],
+                        help="Batch sizes to try; the smallest is the sample efficiency reference.")
+    parser.add_argument('--budget', type=float, required=True,
+                        help="Largest acceptable mean wall time of one update, in seconds.")
+    parser.add_argument('--tolerance', type=fraction, default=0.9,
+                        help="Fraction of the reference's mean %% completed a candidate must reach.")
+    parser.add_argument('--target-kl', type=float, default=None,
+                        help="Passed to the agent, so early stopping is tuned together with the batch size.")
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--train-frequency', type=int, default=20)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--max-steps', type=int, default=2000)
+    parser.add_argument('--json', help="Also write the measurements and the choice to this file.")
+    args = parser.parse_args()
+    if args.games < args.train_frequency:
+        parser.error(f"--games ({args.games}) must be at least --train-frequency ({args.train_frequency})")
+
+    candidates = [evaluate(batch_size, args) for batch_size in sorted(args.candidates)]
+    best, efficient = choose(candidates, args.budget, args.tolerance)
+
+    print(f"{'batch size':>10} {'mean % completed':>17} {'update (s)':>11} {'max update (s)':>15} "
+          f"{'epochs':>7} {'matches':>8}")
+    for c in candidates:
+        if not c["updates"]:
+            print(f"{c['batch_size']:>10} {c['mean_completion']:>17.1f} {'no updates':>11} {'-':>15} "
+                  f"{'-':>7} {str(c in efficient):>8}")
+            continue
+        print(f"{c['batch_size']:>10} {c['mean_completion']:>17.1f} {c['update_seconds']:>11.3f} "
+              f"{c['max_update_seconds']:>15.3f} {c['epochs']:>7.1f} {str(c in efficient):>8}")
+    if best is not None:
+        print(f"\nRecommended: --batch-size {best['batch_size']} "
+              f"({best['update_seconds']:.3f}s per update, budget {args.budget:g}s)")
+    elif not any(c["updates"] for c in candidates):
+        print("\nNo training round reached the learning trigger; nothing to recommend "
+              "(raise --games or --train-frequency)")
+    elif not efficient:
+        print(f"\nNo candidate matches the sample efficiency of --batch-size {candidates[0]['batch_size']} "
+              f"(mean % completed {candidates[0]['mean_completion']:.1f}); nothing to recommend")
+    else:
+        fastest = min((c for c in efficient if c["updates"]), key=lambda c: c["update_seconds"], default=None)
+        if fastest is None:
+            print("\nNo candidate that matches the sample efficiency recorded an update; nothing to recommend")
+        else:
+            print(f"\nNo candidate matches the sample efficiency within {args.budget:g}s per update; "
+                  f"the fastest that matches is --batch-size {fastest['batch_size']} "
+                  f"({fastest['update_seconds']:.3f}s)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"args": vars(args), "candidates": candidates,
+                       "recommended": best["batch_size"] if best else None}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Benchmark the headless racetrack simulator.
+
+Steps RacetrackEnv with uniformly random actions and reports environment
+steps per second and the average episode length.
+
+Run from the repository root:
+    python -m benchmarks.bench_env
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ai.env.racetrack_env import RacetrackEnv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    env = RacetrackEnv(seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    actions = rng.integers(env.action_space, size=args.steps)
+
+    episodes = 0
+    start = time.perf_counter()
+    for action in actions:
+        _, _, done, _ = env.step(action)
+        if done:
+            env.reset()
+            episodes += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.steps} steps in {elapsed:.2f}s: {args.steps / elapsed:,.0f} steps/s, "
+          f"{episodes} episodes (mean length {args.steps / max(episodes, 1):.0f} steps)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark the advantage computation used by Agent.learn.
+
+Compares the original nested-loop implementation against the blocked reverse
+scan in ai/ppo/ppo_advantage.py. The nested loop is O(n^2), so above
+--max-legacy-steps its time is extrapolated from the largest measured size.
+
+Before timing, it checks compute_gae against a plain reverse loop for
+several gamma/lambda settings, including one-step TD (lambda=0), and that
+replaying the same episodes from N agents interleaved through one PPOMemory
+gives the same advantages as one agent playing them back to back.
+
+Run from the repository root:
+    python -m benchmarks.bench_gae
+    python -m benchmarks.bench_gae --check    # checks only, e.g. before committing a GAE change
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ai.ppo.ppo_advantage import compute_gae
+from ai.ppo.ppo_memory import PPOMemory
+
+
+def legacy_gae(reward_arr, values, dones_arr, gamma=0.99, gae_lambda=0.95):
+    """The advantage loop Agent.learn used before compute_gae, kept for comparison."""
+    advantage = np.zeros(len(reward_arr), dtype=np.float32)
+    for t in range(len(reward_arr)-1):
+        discount = 1
+        a_t = 0
+        for k in range(t, len(reward_arr)-1):
+            a_t += discount * \
+                (reward_arr[k] + gamma * values[k+1]
+                 * (1 - int(dones_arr[k])) - values[k])
+            discount *= gamma * gae_lambda
+        advantage[t] = a_t
+    return advantage
+
+
+def reference_gae(rewards, values, dones, gamma, gae_lambda, last_value=0.0):
+    """Plain reverse loop with compute_gae's semantics (one trajectory, bootstrapped from last_value)."""
+    advantages = np.zeros(len(rewards))
+    next_value, next_advantage = last_value, 0.0
+    for t in range(len(rewards) - 1, -1, -1):
+        not_done = 1.0 - float(dones[t])
+        delta = rewards[t] + gamma * next_value * not_done - values[t]
+        next_advantage = delta + gamma * gae_lambda * not_done * next_advantage
+        advantages[t] = next_advantage
+        next_value = values[t]
+    return advantages
+
+
+def check_reference(n_steps=500, seed=0):
+    """Return the largest difference from the reference loop over settings including one-step TD (decay 0)."""
+    rng = np.random.default_rng(seed)
+    rewards, values, dones = synthetic_rollout(n_steps, episode_length=37, seed=seed)
+    dones[-1] = False
+    last_value = float(rng.normal())
+    max_diff = 0.0
+    for gamma, gae_lambda in ((0.99, 0.95), (0.99, 0.0), (0.0, 0.95), (0.99, 1.0), (0.5, 1e-6)):
+        expected = reference_gae(rewards.astype(np.float64), values.astype(np.float64), dones, gamma,
+                                 gae_lambda, last_value)
+        actual, _ = compute_gae(rewards, values, dones, gamma, gae_lambda, last_value)
+        if not np.all(np.isfinite(actual)):
+            return float('inf')
+        max_diff = max(max_diff, float(np.abs(actual - expected).max()))
+    return max_diff
+
+
+def synthetic_rollout(n_steps, episode_length=250, seed=0):
+    rng = np.random.default_rng(seed)
+    rewards = rng.normal(0.4, 0.2, n_steps).astype(np.float32)
+    values = rng.normal(0.0, 1.0, n_steps).astype(np.float32)
+    dones = np.zeros(n_steps, dtype=bool)
+    dones[episode_length-1::episode_length] = True
+    dones[-1] = True
+    return rewards, values, dones
+
+
+def check_interleaved_agents(n_agents, episodes_per_agent=3, seed=0):
+    """Return the largest advantage difference between interleaved and back-to-back replay."""
+    rng = np.random.default_rng(seed)
+    transitions = []
+    for agent in range(n_agents):
+        for _ in range(episodes_per_agent):
+            length = int(rng.integers(20, 200))
+            for step in range(length):
+                transitions.append((agent, rng.random(11), int(rng.integers(3)), float(rng.normal()),
+                                    float(rng.normal()), float(rng.normal()), step == length - 1))
+
+    single = PPOMemory(64, 11)
+    for agent, *transition in transitions:
+        single.store_memory(*transition, agent_id='solo')
+
+    # Arrival order interleaves the agents randomly but keeps each agent's own order
+    interleaved = PPOMemory(64, 11)
+    queues = [[i for i, t in enumerate(transitions) if t[0] == agent] for agent in range(n_agents)]
+    arrival = []
+    while any(queues):
+        agent = rng.choice([a for a in range(n_agents) if queues[a]])
+        i = queues[agent].pop(0)
+        arrival.append(i)
+        interleaved.store_memory(*transitions[i][1:], agent_id=f'agent-{agent}')
+
+    expected, _ = compute_gae(single.rewards, single.vals, single.dones,
+                              segment_ids=single.agent_ids)
+    actual, _ = compute_gae(interleaved.rewards, interleaved.vals, interleaved.dones,
+                            segment_ids=interleaved.agent_ids)
+    return np.abs(actual - expected[arrival]).max()
+
+
+def run_checks(n_agents):
+    """
+    Correctness checks of compute_gae, independent of any timing.
+
+    Raises:
+    SystemExit: If a check fails, so `--check` exits with a non-zero status.
+    """
+    max_diff = check_reference()
+    if not max_diff < 1e-4:
+        raise SystemExit(f"FAIL: advantages differ from the reference loop by {max_diff}")
+    print(f"Blocked scan vs reference loop (including lambda=0 and gamma=0): max difference {max_diff:.2e}")
+    max_diff = check_interleaved_agents(n_agents)
+    if not max_diff < 1e-5:
+        raise SystemExit(f"FAIL: interleaved advantages differ from single-agent replay by {max_diff}")
+    print(f"1 agent vs {n_agents} interleaved agents: max advantage difference {max_diff:.2e}")
+
+
+def time_call(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--max-legacy-steps', type=int, default=2000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--agents', type=int, default=16)
+    parser.add_argument('--check', action='store_true',
+                        help="Only run the correctness checks, without timing; exits non-zero if one fails.")
+    args = parser.parse_args()
+
+    run_checks(args.agents)
+    if args.check:
+        return
+    print()
+
+    print(f"{'steps':>8} {'legacy (s)':>14} {'scan (s)':>10} {'speedup':>10}")
+    measured = None
+    for n_steps in args.sizes:
+        rewards, values, dones = synthetic_rollout(n_steps)
+        scan_time = time_call(lambda: compute_gae(rewards, values, dones), args.repeats)
+
+        if n_steps <= args.max_legacy_steps:
+            legacy_time = time_call(lambda: legacy_gae(rewards, values, dones), 1)
+            measured = (n_steps, legacy_time)
+            legacy_label = f"{legacy_time:.4f}"
+        elif measured is not None:
+            legacy_time = measured[1] * (n_steps / measured[0]) ** 2
+            legacy_label = f"~{legacy_time:.1f}*"
+        else:
+            legacy_time = None
+            legacy_label = "skipped"
+
+        speedup = f"{legacy_time / scan_time:,.0f}x" if legacy_time else "-"
+        print(f"{n_steps:>8} {legacy_label:>14} {scan_time:>10.5f} {speedup:>10}")
+
+    print("* extrapolated quadratically from the largest measured size")
+
+
+if __name__ == "__main__":
+    main()
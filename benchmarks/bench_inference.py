@@ -0,0 +1,96 @@
+"""
+Benchmark serving actions to many concurrent agents.
+
+Each simulated agent is a thread that requests one action at a time, as a
+browser tab does through /get_action. Compares the original eager
+actor/critic + TFP Categorical path and Agent.choose_action per request
+against routing requests through BatchedInference.
+
+Run from the repository root:
+    python -m benchmarks.bench_inference
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+import numpy as np
+from tensorflow_probability.python.distributions import Categorical
+
+from ai.ppo.ppo import Agent
+from ai.ppo.ppo_inference import BatchedInference
+
+
+def legacy_choose_action(agent, observation):
+    """Agent.choose_action as it was before batched inference, kept for comparison."""
+    state = np.array([observation], dtype=np.float32)
+    pi = agent.actor(state)
+    dist = Categorical(probs=pi)
+    action = dist.sample().numpy()[0]
+    value = agent.critic(state)
+
+    probs = np.log(pi[0, action])
+    value = value.numpy()[0, 0]
+
+    return action, probs, value
+
+
+def run_agents(choose_action, n_agents, requests_per_agent, state_space):
+    latencies = [[] for _ in range(n_agents)]
+    barrier = threading.Barrier(n_agents + 1)
+
+    def agent(i):
+        rng = np.random.default_rng(i)
+        barrier.wait()
+        for _ in range(requests_per_agent):
+            observation = rng.random(state_space, dtype=np.float32)
+            start = time.perf_counter()
+            choose_action(observation)
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=agent, args=(i,)) for i in range(n_agents)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.concatenate(latencies) * 1000
+    return n_agents * requests_per_agent / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--agents', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--requests-per-agent', type=int, default=100)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--state-space', type=int, default=11)
+    args = parser.parse_args()
+
+    save_dir = tempfile.mkdtemp()
+    agent = Agent(n_actions=3, input_dims=args.state_space,
+                  save_folder_actor=f"{save_dir}/actor", save_folder_critic=f"{save_dir}/critic")
+    inference = BatchedInference(agent.choose_actions, max_batch_size=args.max_batch_size,
+                                 max_wait_ms=args.max_wait_ms).start()
+    agent.choose_actions(np.zeros((1, args.state_space)))
+
+    modes = [('legacy', lambda observation: legacy_choose_action(agent, observation)),
+             ('single', agent.choose_action),
+             ('batched', inference.choose_action)]
+
+    print(f"{'agents':>7} {'mode':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for n_agents in args.agents:
+        for mode, fn in modes:
+            rps, p50, p99 = run_agents(fn, n_agents, args.requests_per_agent, args.state_space)
+            print(f"{n_agents:>7} {mode:>8} {rps:>10,.0f} {p50:>8.2f} {p99:>8.2f}")
+
+    stats = inference.stats()
+    inference.stop()
+    print(f"\nbatched: {stats['batches']} batches, mean size {stats['mean_batch_size']:.1f}, "
+          f"max size {stats['max_batch_size']}")
+
+
+if __name__ == "__main__":
+    main()
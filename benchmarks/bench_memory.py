@@ -0,0 +1,118 @@
+"""
+Benchmark rollout storage and minibatch generation in PPOMemory.
+
+Compares the preallocated columnar buffer against the original list-backed
+memory for the access pattern of one Agent.learn update: store a rollout,
+then build minibatches for n_epochs.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ai.ppo.ppo_memory import PPOMemory
+
+
+class LegacyPPOMemory:
+    """The list-backed PPOMemory used before the columnar buffer, kept for comparison."""
+
+    def __init__(self, batch_size):
+        self.states = []
+        self.probs = []
+        self.vals = []
+        self.actions = []
+        self.rewards = []
+        self.dones = []
+        self.batch_size = batch_size
+
+    def generate_batches(self):
+        n_states = len(self.states)
+        batch_start = np.arange(0, n_states, self.batch_size)
+        indices = np.arange(n_states, dtype=np.int64)
+        np.random.shuffle(indices)
+        batches = [indices[i:i+self.batch_size] for i in batch_start]
+
+        return np.array(self.states), \
+            np.array(self.actions), \
+            np.array(self.probs), \
+            np.array(self.vals), \
+            np.array(self.rewards), \
+            np.array(self.dones), \
+            batches
+
+    def store_memory(self, state, action, probs, vals, reward, done):
+        self.states.append(state)
+        self.actions.append(action)
+        self.probs.append(probs)
+        self.vals.append(vals)
+        self.rewards.append(reward)
+        self.dones.append(done)
+
+
+def store_rollout(memory, transitions):
+    start = time.perf_counter()
+    for state, action, prob, val, reward, done in transitions:
+        memory.store_memory(state, action, prob, val, reward, done)
+    return time.perf_counter() - start
+
+
+def legacy_batches(memory, n_epochs):
+    # Agent.learn rebuilt the arrays once per epoch
+    start = time.perf_counter()
+    for _ in range(n_epochs):
+        state_arr, action_arr, prob_arr, _, _, _, batches = memory.generate_batches()
+        for batch in batches:
+            np.array(state_arr[batch], dtype=np.float32)
+            np.array(prob_arr[batch], dtype=np.float32)
+            np.array(action_arr[batch], dtype=np.int32)
+    return time.perf_counter() - start
+
+
+def columnar_batches(memory, n_epochs):
+    start = time.perf_counter()
+    state_arr, action_arr, prob_arr, _, _, _, _ = memory.generate_batches()
+    for _ in range(n_epochs):
+        for batch in memory.generate_batch_indices():
+            state_arr[batch]
+            prob_arr[batch]
+            action_arr[batch]
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--steps', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--state-space', type=int, default=11)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--n-epochs', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'steps':>8} {'impl':>9} {'store/s':>12} {'batches (s)':>12} {'MiB':>8}")
+    for n_steps in args.steps:
+        transitions = [(rng.random(args.state_space), int(rng.integers(3)), float(rng.normal()),
+                        float(rng.normal()), float(rng.normal()), bool(rng.random() < 0.01))
+                       for _ in range(n_steps)]
+
+        legacy = LegacyPPOMemory(args.batch_size)
+        store_time = store_rollout(legacy, transitions)
+        batch_time = legacy_batches(legacy, args.n_epochs)
+        legacy_bytes = sum(np.array(column).nbytes for column in
+                           [legacy.states, legacy.actions, legacy.probs, legacy.vals, legacy.rewards, legacy.dones])
+        print(f"{n_steps:>8} {'legacy':>9} {n_steps / store_time:>12,.0f} {batch_time:>12.4f} "
+              f"{legacy_bytes / 2**20:>7.2f}*")
+
+        columnar = PPOMemory(args.batch_size, args.state_space)
+        store_time = store_rollout(columnar, transitions)
+        batch_time = columnar_batches(columnar, args.n_epochs)
+        print(f"{n_steps:>8} {'columnar':>9} {n_steps / store_time:>12,.0f} {batch_time:>12.4f} "
+              f"{columnar.nbytes / 2**20:>8.2f}")
+
+    print("* size of one array copy per epoch; the lists themselves hold boxed Python objects on top")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compare training with and without observation normalization, reward scaling and advantage normalization.
+
+Trains a fresh agent on the headless racetrack for the same number of games
+with each configuration and seed, and reports the average % of the track completed
+per training round, the number of environment steps until the average first
+reaches --target, and the wall time. Also times the normalization stage of
+Agent.learn against a full update.
+
+Run from the repository root:
+    python -m benchmarks.bench_normalize
+"""
+import argparse
+
+from ai.ppo.ppo_telemetry import telemetry
+from benchmarks.learning_curve import learning_curve, steps_to_target
+
+# Agent keyword arguments of each configuration
+CONFIGS = {
+    'none': dict(normalize_obs=False, scale_rewards=False, normalize_advantage=False),
+    'obs': dict(normalize_obs=True, scale_rewards=False, normalize_advantage=False),
+    'rewards': dict(normalize_obs=False, scale_rewards=True, normalize_advantage=False),
+    'advantages': dict(normalize_obs=False, scale_rewards=False, normalize_advantage=True),
+    'all': dict(normalize_obs=True, scale_rewards=True, normalize_advantage=True),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=300)
+    parser.add_argument('--train-frequency', type=int, default=20)
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=['none', 'obs', 'all'])
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--max-steps', type=int, default=2000)
+    parser.add_argument('--target', type=float, default=90.0,
+                        help="Average % completed that counts as converged.")
+    args = parser.parse_args()
+
+    results = {}
+    for config in args.configs:
+        for seed in args.seeds:
+            results[config, seed] = learning_curve(CONFIGS[config], seed, args.games, args.train_frequency,
+                                                   args.max_steps)
+
+    print(f"{'config':>10} {'seed':>4} {'final %':>8} {'best %':>7} {'steps to target':>16} {'wall (s)':>9}")
+    for (config, seed), result in results.items():
+        curve, seconds = result["curve"], result["seconds"]
+        reached = steps_to_target(curve, args.target)
+        print(f"{config:>10} {seed:>4} {curve[-1][1]:>8.1f} {max(a for _, a in curve):>7.1f} "
+              f"{reached if reached is not None else '-':>16} {seconds:>9.1f}")
+
+    stages = telemetry.snapshot()["stages"]
+    normalize_ms, update_ms = stages["normalize"]["mean_ms"], stages["train_step"]["sum_seconds"] * 1e3
+    updates = stages["normalize"]["count"]
+    print(f"\nnormalize stage: {normalize_ms:.2f} ms per update, "
+          f"{normalize_ms * updates / update_ms:.2%} of the time spent in train steps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark the NumPy inference path against the TensorFlow/Keras path.
+
+Saves a freshly initialized agent with Agent.save_models. It then measures:
+- cold start: a new Python process imports, loads the saved actor and critic
+  and chooses one action
+- per-call latency of choose_action and of a 64-row choose_actions
+It also checks that NumpyPolicy reproduces the Keras outputs for the saved
+models, and that the shipped TensorFlow.js models load.
+
+Run from the repository root:
+    python -m benchmarks.bench_numpy_inference
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+
+import numpy as np
+
+COLD_START_NUMPY = """
+import sys, time
+start = time.perf_counter()
+from ai.ppo.ppo_numpy import NumpyPolicy
+policy = NumpyPolicy.load({actor!r}, {critic!r})
+policy.choose_action([0.0] * 11)
+assert 'tensorflow' not in sys.modules
+print(time.perf_counter() - start)
+"""
+
+COLD_START_KERAS = """
+import time
+start = time.perf_counter()
+import numpy as np
+import tensorflow as tf
+actor = tf.keras.models.load_model({actor!r})
+critic = tf.keras.models.load_model({critic!r})
+state = np.zeros((1, 11), dtype=np.float32)
+actor(state), critic(state)
+print(time.perf_counter() - start)
+"""
+
+TFJS_MODELS = os.path.join('ai', 'tfjs_models')
+
+
+def cold_start(template, actor, critic, repeats):
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', template.format(actor=actor, critic=critic)],
+                                check=True, capture_output=True, text=True).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return min(times)
+
+
+def latency(fn, observations, repeats):
+    fn(observations[0])
+    start = time.perf_counter()
+    for i in range(repeats):
+        fn(observations[i % len(observations)])
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def check_tfjs_models():
+    """The shipped tfjs shards must load as 11-input actor/critic pairs with a valid policy."""
+    from ai.ppo.ppo_numpy import NumpyPolicy
+
+    states = np.random.default_rng(1).random((16, 11), dtype=np.float32)
+    for name in sorted(os.listdir(TFJS_MODELS)):
+        if not name.startswith('actor_'):
+            continue
+        critic = name.replace('actor_', 'critic_', 1)
+        policy = NumpyPolicy.load(os.path.join(TFJS_MODELS, name), os.path.join(TFJS_MODELS, critic))
+        pi = policy.policy(states)
+        assert pi.shape == (16, 3) and np.allclose(pi.sum(axis=1), 1), name
+        assert np.isfinite(policy.critic(states)).all(), critic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cold-start-repeats', type=int, default=3)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    from ai.ppo.ppo import Agent
+    from ai.ppo.ppo_numpy import NumpyPolicy
+
+    save_dir = tempfile.mkdtemp()
+    agent = Agent(n_actions=3, input_dims=11,
+                  save_folder_actor=f"{save_dir}/actor", save_folder_critic=f"{save_dir}/critic")
+    agent.choose_action(np.zeros(11, dtype=np.float32))
+    agent.save_models(0, 0)
+    actor_dir = os.path.join(save_dir, 'actor', os.listdir(f"{save_dir}/actor")[0])
+    critic_dir = os.path.join(save_dir, 'critic', os.listdir(f"{save_dir}/critic")[0])
+
+    policy = NumpyPolicy.load(actor_dir, critic_dir)
+    states = np.random.default_rng(0).random((64, 11), dtype=np.float32)
+    assert np.allclose(policy.policy(states), agent.actor(states).numpy(), atol=1e-5)
+    assert np.allclose(policy.critic(states)[:, 0], agent.critic(states).numpy()[:, 0], atol=1e-4)
+    check_tfjs_models()
+    print("NumPy outputs match Keras\n")
+
+    print(f"{'path':>6} {'cold start (s)':>15} {'choose_action (us)':>19} {'batch of 64 (us)':>17}")
+    rows = [('keras', COLD_START_KERAS, agent), ('numpy', COLD_START_NUMPY, policy)]
+    batches = [states] * 4
+    for name, template, model in rows:
+        cold = cold_start(template, actor_dir, critic_dir, args.cold_start_repeats)
+        single = latency(model.choose_action, states, args.calls)
+        batch = latency(model.choose_actions, batches, args.calls // 4)
+        print(f"{name:>6} {cold:>15.2f} {single:>19.1f} {batch:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark collection and learning with rollout worker processes.
+
+Trains for a fixed number of PPO updates with RolloutWorkers in synchronous
+and asynchronous mode and reports environment steps per second over the
+whole run, the share of wall time the learner spent waiting for rollouts
+and the mean policy lag of the stored transitions. A core count above the
+number of workers is needed to see asynchronous collection overlap learning.
+
+Run from the repository root:
+    python -m benchmarks.bench_rollout
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+
+from ai.ppo.ppo import Agent
+from ai.ppo.ppo_rollout import RolloutWorkers
+
+
+def run(mode, args):
+    save_dir = tempfile.mkdtemp()
+    agent = Agent(n_actions=3, input_dims=11, n_epochs=args.n_epochs,
+                  save_folder_actor=f"{save_dir}/actor", save_folder_critic=f"{save_dir}/critic")
+    workers = RolloutWorkers(args.workers, envs_per_worker=args.envs_per_worker,
+                             rollout_steps=args.rollout_steps, synchronous=mode == 'sync',
+                             seed=0, max_steps=args.max_steps).start(agent)
+    # Worker start-up (importing TF) is not part of the measurement
+    workers.collect()
+    workers.resume()
+    workers.stats['env_steps'] = 0
+    agent.memory.clear_memory()
+
+    waiting = 0.0
+    start = time.perf_counter()
+    try:
+        for update in range(args.updates):
+            while len(agent.memory) < args.transitions_per_update:
+                wait_start = time.perf_counter()
+                rollouts = workers.collect()
+                waiting += time.perf_counter() - wait_start
+                for rollout in rollouts:
+                    agent.remember_batch(rollout['states'], rollout['actions'], rollout['probs'],
+                                         rollout['vals'], rollout['rewards'], rollout['dones'],
+                                         rollout['agent_ids'])
+                if len(agent.memory) < args.transitions_per_update:
+                    workers.resume()
+            agent.learn(update, 0)
+            workers.resume(agent)
+        elapsed = time.perf_counter() - start
+        return workers.stats['env_steps'] / elapsed, waiting / elapsed, workers.mean_policy_lag()
+    finally:
+        workers.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--envs-per-worker', type=int, default=16)
+    parser.add_argument('--rollout-steps', type=int, default=64)
+    parser.add_argument('--max-steps', type=int, default=500)
+    parser.add_argument('--updates', type=int, default=5)
+    parser.add_argument('--transitions-per-update', type=int, default=4096)
+    parser.add_argument('--n-epochs', type=int, default=3)
+    parser.add_argument('--modes', nargs='+', default=['sync', 'async'], choices=['sync', 'async'])
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.envs_per_worker} cars, {os.cpu_count()} cores")
+    print(f"{'mode':>6} {'env steps/s':>12} {'learner waiting':>16} {'policy lag':>11}")
+    for mode in args.modes:
+        steps_per_second, waiting, lag = run(mode, args)
+        print(f"{mode:>6} {steps_per_second:>12,.0f} {waiting:>15.0%} {lag:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
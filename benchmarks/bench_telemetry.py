@@ -0,0 +1,85 @@
+"""
+Measure the overhead of the stage timers in ai/ppo/ppo_telemetry.py.
+
+Times an empty `with telemetry.time(...)` block and a counter increment, both
+from one thread and from several threads sharing one histogram, and compares
+them with the cheapest instrumented stage (a single-row forward pass of the
+shipped model with the NumPy policy). Also checks that the Prometheus text
+output is well formed.
+
+Run from the repository root:
+    python -m benchmarks.bench_telemetry
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from ai.ppo.ppo_numpy import NumpyPolicy
+from ai.ppo.ppo_telemetry import DEFAULT_BUCKETS, Telemetry
+
+TFJS_MODELS = os.path.join('ai', 'tfjs_models')
+
+
+def per_call_us(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def check_prometheus_text(telemetry):
+    lines = telemetry.prometheus_text().splitlines()
+    buckets = [line for line in lines if line.startswith('ppo_stage_seconds_bucket{stage="empty"')]
+    assert len(buckets) == len(DEFAULT_BUCKETS) + 1, len(buckets)
+    counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+    assert counts == sorted(counts), "bucket counts must be cumulative"
+    count = next(line for line in lines if line.startswith('ppo_stage_seconds_count{stage="empty"'))
+    assert int(count.rsplit(' ', 1)[1]) == counts[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    telemetry = Telemetry()
+
+    def timed_block():
+        with telemetry.time("empty"):
+            pass
+
+    def count():
+        telemetry.count("events")
+
+    baseline = per_call_us(lambda: None, args.calls)
+    timer = per_call_us(timed_block, args.calls) - baseline
+    counter = per_call_us(count, args.calls) - baseline
+
+    calls_per_thread = args.calls // args.threads
+    threads = [threading.Thread(target=per_call_us, args=(timed_block, calls_per_thread))
+               for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    contended = (time.perf_counter() - start) / (calls_per_thread * args.threads) * 1e6 - baseline
+    check_prometheus_text(telemetry)
+
+    policy = NumpyPolicy.load(os.path.join(TFJS_MODELS, 'actor_episodes_4521'),
+                              os.path.join(TFJS_MODELS, 'critic_episodes_4521'))
+    observation = np.zeros(11, dtype=np.float32)
+    forward = per_call_us(lambda: policy.choose_action(observation), args.calls // 100)
+
+    print(f"timer:                     {timer:6.2f} us")
+    print(f"timer, {args.threads} threads contending: {contended:6.2f} us")
+    print(f"counter:                   {counter:6.2f} us")
+    print(f"numpy forward pass:        {forward:6.2f} us  (timer adds {timer / forward:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark the track geometry grid (TrackIndex) against brute force.
+
+Loads the track from racetrackRays.glb and fjcConfig.js, builds the grid
+and times building, caching and loading it. Then it samples car positions
+and headings around the centerline and compares the grid with testing
+every wall and centerline segment. Queries covered:
+- one car's 7 rays (RacetrackEnv)
+- the rays of many cars at once (VectorEnv)
+- track progress of a batch of points
+Every answer is checked against brute force. --subdivide splits each wall
+into k collinear pieces: the geometry stays the same but the walls
+multiply, which shows how each method scales with track detail.
+
+Run from the repository root:
+    python -m benchmarks.bench_track_index
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ai.env.racetrack_env import RAY_ANGLES, RacetrackEnv
+from ai.env.track import cast_rays, cast_rays_batched, load_centerline, load_wall_segments
+from ai.env.track_index import TrackIndex, build_track_arrays, load_track_index
+
+
+def best_time(fn, repeat):
+    """Fastest of 5 runs of repeat calls, in microseconds per call."""
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        times.append((time.perf_counter() - start) / repeat * 1e6)
+    return min(times)
+
+
+def sample_cars(centerline, n, rng, ride_height=RacetrackEnv.ride_height):
+    """Positions scattered around the centerline, random headings and the height of the road there."""
+    segment = rng.integers(len(centerline) - 1, size=n)
+    t = rng.random(n)[:, None]
+    points = centerline[segment] + t * (centerline[segment + 1] - centerline[segment])
+    origins = points[:, :2] + rng.normal(0.0, 2.0, (n, 2))
+    headings = rng.uniform(-np.pi, np.pi, n)
+    return origins, headings[:, None] + RAY_ANGLES, points[:, 2] + ride_height
+
+
+def subdivide(segments, wall_z, k):
+    t = np.linspace(0.0, 1.0, k + 1)[:, None, None]
+    points = segments[:, None, 0] + t.transpose(1, 0, 2) * (segments[:, None, 1] - segments[:, None, 0])
+    pieces = np.stack([points[:, :-1], points[:, 1:]], axis=2).reshape(-1, 2, 2)
+    return pieces, np.repeat(wall_z, k, axis=0)
+
+
+def brute_rays(segments, wall_z, origin, angles, z):
+    active = (wall_z[:, 0] <= z) & (wall_z[:, 1] >= z)
+    return cast_rays(origin, angles, segments[active], RacetrackEnv.ray_miss_distance)
+
+
+def brute_rays_batched(segments, wall_z, origins, angles, z):
+    active = (wall_z[None, :, 0] <= z[:, None]) & (wall_z[None, :, 1] >= z[:, None])
+    return cast_rays_batched(origins, angles, segments, active, RacetrackEnv.ray_miss_distance)
+
+
+def brute_progress(centerline, offsets, lengths, points):
+    a, b = centerline[None, :-1, :2], centerline[None, 1:, :2]
+    ab = b - a
+    t = np.clip(((points[:, None] - a) * ab).sum(axis=-1) / (ab ** 2).sum(axis=-1), 0.0, 1.0)
+    closest = a + t[..., None] * ab
+    best = np.hypot(*(closest - points[:, None]).transpose(2, 0, 1)).argmin(axis=1)
+    rows = np.arange(len(points))
+    return (offsets[best] + t[rows, best] * lengths[best]) / offsets[-1] * 100
+
+
+def check_rays(expected, actual, radius):
+    # Distances beyond the radius are clipped in the observation and need not match
+    assert np.array_equal(np.minimum(expected, radius), np.minimum(actual, radius))
+
+
+def bench_cache(args):
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, 'track_cache.npz')
+        start = time.perf_counter()
+        load_track_index(cell_size=args.cell_size, cache_path=cache_path)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        load_track_index(cell_size=args.cell_size, cache_path=cache_path)
+        cached = time.perf_counter() - start
+        size = os.path.getsize(cache_path)
+    start = time.perf_counter()
+    load_wall_segments()
+    load_centerline()
+    parse = time.perf_counter() - start
+    print(f"Parse .glb and fjcConfig.js {parse * 1e3:.1f} ms, build grid and write cache {build * 1e3:.0f} ms, "
+          f"load from cache {cached * 1e3:.1f} ms ({size / 1024:.0f} KiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--subdivide', type=int, nargs='+', default=[1, 4, 16],
+                        help="Split every wall into this many pieces (1 is the real track).")
+    parser.add_argument('--cars', type=int, default=256, help="Cars per batched query.")
+    parser.add_argument('--queries', type=int, default=2000, help="Single-car queries sampled per track.")
+    parser.add_argument('--cell-size', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    bench_cache(args)
+    segments, wall_z = load_wall_segments()
+    centerline = load_centerline()
+    radius = RacetrackEnv.max_ray_length
+    rng = np.random.default_rng(args.seed)
+    origins, angles, heights = sample_cars(centerline, args.queries, rng)
+    batch = sample_cars(centerline, args.cars, rng)
+
+    print(f"\n{'walls':>6} {'walls/cell':>11} {'1 car brute (us)':>17} {'1 car grid (us)':>16} "
+          f"{f'{args.cars} cars brute (us)':>20} {f'{args.cars} cars grid (us)':>19} {'speedup':>8}")
+    for k in args.subdivide:
+        walls, walls_z = subdivide(segments, wall_z, k)
+        index = TrackIndex(**build_track_arrays(walls, walls_z, centerline, radius, args.cell_size))
+        cells = index.cells(origins[:, 0], origins[:, 1])
+        per_cell = np.where(cells >= 0, index.wall_starts[cells + 1] - index.wall_starts[cells], 0).mean()
+
+        for origin, ray_angles, z in zip(origins, angles, heights):
+            check_rays(brute_rays(walls, walls_z, origin, ray_angles, z), index.cast_rays(origin, ray_angles, z),
+                       radius)
+        check_rays(brute_rays_batched(walls, walls_z, *batch), index.cast_rays_batched(*batch), radius)
+
+        cars = itertools.cycle(list(zip(origins, angles, heights)))
+        single_brute = best_time(lambda: brute_rays(walls, walls_z, *next(cars)), 500)
+        single_grid = best_time(lambda: index.cast_rays(*next(cars)), 500)
+        batched_brute = best_time(lambda: brute_rays_batched(walls, walls_z, *batch), 20)
+        batched_grid = best_time(lambda: index.cast_rays_batched(*batch), 20)
+        print(f"{len(walls):>6} {per_cell:>11.1f} {single_brute:>17.1f} {single_grid:>16.1f} "
+              f"{batched_brute:>20.0f} {batched_grid:>19.0f} "
+              f"{single_brute / single_grid:>4.1f}/{batched_brute / batched_grid:.1f}x")
+
+    index = load_track_index(cell_size=args.cell_size, cache_path=None)
+    points = batch[0]
+    assert np.allclose(index.progress(points)[1],
+                       brute_progress(centerline, index.centerline_offsets, index.centerline_lengths, points))
+    brute = best_time(lambda: brute_progress(centerline, index.centerline_offsets, index.centerline_lengths,
+                                             points), 50)
+    grid = best_time(lambda: index.progress(points), 50)
+    print(f"\nProgress of {len(points)} points ({len(centerline) - 1} centerline segments): "
+          f"brute force {brute:.0f} us, grid {grid:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
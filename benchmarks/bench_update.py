@@ -0,0 +1,115 @@
+"""
+Benchmark the PPO update phase on CPU.
+
+Runs the minibatch loop of Agent.learn over a synthetic rollout and reports
+minibatch steps per second for the original eager loop (TFP Categorical,
+two GradientTapes, compiled_loss) and the traced train step, optionally with
+XLA.
+
+Run from the repository root:
+    python -m benchmarks.bench_update
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+
+import numpy as np
+import tensorflow as tf
+from tensorflow_probability.python.distributions import Categorical
+
+from ai.ppo.ppo import Agent
+from ai.ppo.ppo_advantage import compute_gae
+
+
+def legacy_step(agent, states, actions, old_probs, advantage, returns):
+    """One minibatch of Agent.learn as it was before the traced train step, kept for comparison."""
+    with tf.GradientTape() as tape_a, tf.GradientTape() as tape_c:
+        pi = agent.actor(states)
+        dist = Categorical(probs=pi)
+        new_probs = dist.log_prob(actions)
+        prob_ratio = tf.exp(new_probs - old_probs)
+        weighted_probs = advantage * prob_ratio
+        weighted_clipped_probs = tf.clip_by_value(
+            prob_ratio, 1-agent.policy_clip, 1+agent.policy_clip) * advantage
+        actor_loss = - \
+            tf.reduce_mean(tf.minimum(
+                weighted_probs, weighted_clipped_probs))
+
+        critic_value = agent.critic(states)
+        critic_value = tf.squeeze(critic_value)
+        batch_returns = tf.expand_dims(returns, 1)
+
+        critic_loss = agent.critic.compiled_loss(
+            batch_returns, critic_value)
+
+        entropy = dist.entropy()
+        entropy_loss = -agent.entropy_coeff * \
+            tf.reduce_mean(entropy)
+
+        total_loss = actor_loss + 0.5 * critic_loss + entropy_loss
+
+    grad_a = tape_a.gradient(
+        total_loss, agent.actor.trainable_variables)
+    grad_c = tape_c.gradient(
+        total_loss, agent.critic.trainable_variables)
+    agent.actor.optimizer.apply_gradients(
+        zip(grad_a, agent.actor.trainable_variables))
+    agent.critic.optimizer.apply_gradients(
+        zip(grad_c, agent.critic.trainable_variables))
+
+
+def make_agent(state_space, batch_size, jit_compile, n_steps, seed=0):
+    save_dir = tempfile.mkdtemp()
+    agent = Agent(n_actions=3, input_dims=state_space, batch_size=batch_size, jit_compile=jit_compile,
+                  save_folder_actor=f"{save_dir}/actor", save_folder_critic=f"{save_dir}/critic")
+    rng = np.random.default_rng(seed)
+    for i in range(n_steps):
+        state = rng.random(state_space, dtype=np.float32)
+        action, prob, value = agent.choose_action(state)
+        agent.remember(state, action, prob, value, rng.normal(), i % 250 == 249)
+    return agent
+
+
+def run_update(agent, n_epochs, mode):
+    state_arr, action_arr, old_prob_arr, vals_arr, reward_arr, dones_arr, _ = agent.memory.generate_batches()
+    advantage, returns = compute_gae(reward_arr, vals_arr, dones_arr, segment_ids=agent.memory.agent_ids)
+
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(n_epochs):
+        for batch in agent.memory.generate_batch_indices():
+            if mode == 'eager':
+                legacy_step(agent, state_arr[batch], action_arr[batch], old_prob_arr[batch],
+                            advantage[batch], returns[batch])
+            else:
+                agent._train_step(*agent._minibatch(
+                    batch, state_arr, action_arr, old_prob_arr, advantage, returns))
+            steps += 1
+    return steps, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--steps', type=int, default=4000)
+    parser.add_argument('--n-epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--state-space', type=int, default=11)
+    parser.add_argument('--modes', nargs='+', default=['eager', 'traced', 'xla'],
+                        choices=['eager', 'traced', 'xla'])
+    args = parser.parse_args()
+
+    print(f"rollout of {args.steps} steps, {args.n_epochs} epochs, minibatch {args.batch_size}")
+    print(f"{'mode':>8} {'steps/s':>10} {'update (s)':>11}")
+    for mode in args.modes:
+        agent = make_agent(args.state_space, args.batch_size, mode == 'xla', args.steps)
+        # Warm up tracing/compilation and optimizer slot creation outside the timed run
+        run_update(agent, 1, mode)
+        steps, elapsed = run_update(agent, args.n_epochs, mode)
+        print(f"{mode:>8} {steps / elapsed:>10,.1f} {elapsed:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
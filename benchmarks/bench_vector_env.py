@@ -0,0 +1,87 @@
+"""
+Benchmark rollout collection with VectorEnv.
+
+Collects a fixed number of transitions with N cars stepped together: one
+batched Agent.choose_actions call per step, one VectorEnv.step and one
+Agent.remember_batch. Reports environment-only and full rollout throughput
+for each N, and checks a single-car VectorEnv against RacetrackEnv.
+
+Run from the repository root:
+    python -m benchmarks.bench_vector_env
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+
+import numpy as np
+
+from ai.env.racetrack_env import RacetrackEnv
+from ai.env.vector_env import VectorEnv
+from ai.ppo.ppo import Agent
+
+
+def check_matches_single_env(n_steps=300, seed=0):
+    single = RacetrackEnv(seed=seed)
+    vector = VectorEnv(1, seed=seed)
+    actions = np.random.default_rng(seed).integers(single.action_space, size=n_steps)
+    for action in actions:
+        observation, reward, done, _ = single.step(action)
+        observations, rewards, dones, _ = vector.step([action])
+        assert dones[0] == done and np.isclose(rewards[0], reward)
+        if done:
+            observation = single.reset()
+        assert np.allclose(observations[0], observation, atol=1e-5)
+
+
+def env_only(num_envs, n_steps, seed):
+    env = VectorEnv(num_envs, seed=seed)
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for _ in range(n_steps // num_envs):
+        env.step(rng.integers(env.action_space, size=num_envs))
+    return (n_steps // num_envs) * num_envs / (time.perf_counter() - start)
+
+
+def rollout(agent, num_envs, n_steps, seed):
+    env = VectorEnv(num_envs, seed=seed)
+    agent_ids = np.arange(num_envs)
+    agent.memory.clear_memory()
+    observations = env.reset()
+    start = time.perf_counter()
+    for _ in range(n_steps // num_envs):
+        actions, probs, values = agent.choose_actions(observations)
+        next_observations, rewards, dones, _ = env.step(actions)
+        agent.remember_batch(observations, actions, probs, values, rewards, dones, agent_ids)
+        observations = next_observations
+    return len(agent.memory), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--num-envs', type=int, nargs='+', default=[1, 16, 256])
+    parser.add_argument('--steps', type=int, default=100_000)
+    parser.add_argument('--single-car-steps', type=int, default=10_000,
+                        help="Rollout length for N=1, which is dominated by per-step overhead.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_matches_single_env(seed=args.seed)
+
+    save_dir = tempfile.mkdtemp()
+    agent = Agent(n_actions=3, input_dims=11,
+                  save_folder_actor=f"{save_dir}/actor", save_folder_critic=f"{save_dir}/critic")
+    agent.choose_actions(np.zeros((1, 11)))
+
+    print(f"{'N':>5} {'env steps/s':>12} {'rollout steps/s':>16} {'steps':>8} {'time (s)':>9}")
+    for num_envs in args.num_envs:
+        n_steps = args.steps if num_envs > 1 else min(args.steps, args.single_car_steps)
+        env_rate = env_only(num_envs, n_steps, args.seed)
+        collected, elapsed = rollout(agent, num_envs, n_steps, args.seed)
+        print(f"{num_envs:>5} {env_rate:>12,.0f} {collected / elapsed:>16,.0f} {collected:>8} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Learning curves of fresh agents on the headless racetrack, shared by the
+benchmarks that compare training settings (bench_normalize, autotune_batch_size).
+"""
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from ai.env.racetrack_env import RacetrackEnv
+from ai.ppo.ppo import Agent
+
+
+def learning_curve(agent_kwargs, seed, games, train_frequency=20, max_steps=2000):
+    """
+    Train a fresh agent for a number of games, one game at a time as train_headless.py does.
+
+    Args:
+    agent_kwargs (dict): Extra Agent keyword arguments (the setting under test).
+    seed (int): Seeds the initial weights, the action sampling and the environment.
+    games (int): Games to play.
+    train_frequency (int): Games between training rounds.
+    max_steps (int): Steps after which an unfinished game is cut off.
+
+    Returns:
+    dict: 'curve', a list of (environment steps so far, average % completed) per
+        training round; 'update_seconds', the wall time of each Agent.learn call;
+        'epochs', the epochs each update ran; and 'seconds', the total wall time.
+    """
+    # Same initial weights and action sampling for every setting
+    tf.keras.utils.set_random_seed(seed)
+    env = RacetrackEnv(max_steps=max_steps, seed=seed)
+    agent = Agent(n_actions=env.action_space, input_dims=env.state_space,
+                  save_folder_actor=None, save_folder_critic=None, **agent_kwargs)
+
+    curve, update_seconds, epochs, completions, steps = [], [], [], [], 0
+    start = time.perf_counter()
+    for game in range(1, games + 1):
+        observation, done = env.reset(), False
+        while not done:
+            action, probs, value = agent.choose_action(observation)
+            next_observation, reward, done, _ = env.step(action)
+            agent.remember(observation, action, probs, value, reward, done)
+            observation = next_observation
+            steps += 1
+        completions.append(observation[0] * 100)
+        if game % train_frequency == 0:
+            average = float(np.mean(completions))
+            curve.append((steps, average))
+            update_start = time.perf_counter()
+            if agent.learn(game, average):
+                update_seconds.append(time.perf_counter() - update_start)
+                epochs.append(agent.last_learn_stats["epochs"])
+            completions = []
+    return {"curve": curve, "update_seconds": update_seconds, "epochs": epochs,
+            "seconds": time.perf_counter() - start}
+
+
+def steps_to_target(curve, target):
+    """Environment steps until the average % completed first reached target, or None."""
+    return next((steps for steps, average in curve if average >= target), None)
+
+
+def mean_completion(curve):
+    """Average % completed over all training rounds: the area under the learning curve."""
+    return float(np.mean([average for _, average in curve]))
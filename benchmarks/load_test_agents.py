@@ -0,0 +1,373 @@
+"""
+Simulate many browser agents against the training API of app.py.
+
+Every agent is an asyncio task speaking the protocol of Racetrack.js in
+training mode: one /get_action POST per tick with agent_id, observation,
+done, win and time_since_game_start, and when the answer says pause,
+/check_unpause polls every 500 ms until it says unpause. Requests go over
+one keep-alive HTTP/1.1 connection per agent using only asyncio streams.
+
+Observations come from one of three sources:
+- synthetic: random rays, progress rising over an episode whose length is
+  drawn from --episode-steps
+- env: the headless racetrack driven by the actions the server returns, so
+  observations and episode lengths follow the current policy
+- a .npz file with 'observations' (N x state_space) and 'dones' (N) arrays,
+  or a directory recorded by app.py (ai/ppo/ppo_recorder.py), whose episodes
+  are replayed in order and looped
+
+For each agent count in --agents the script reports requests/s, latency
+percentiles, the share of time agents spent paused, errors and, with
+--server-pid or --spawn, the CPU the server used. The agent count where
+throughput stops growing is where app.py saturates.
+
+Start app.py in training mode, then run from the repository root:
+    python -m benchmarks.load_test_agents --agents 1 4 16 64 --server-pid <pid>
+or let the script start a scratch copy of app.py itself:
+    python -m benchmarks.load_test_agents --spawn --agents 1 4 16 64 --tick-ms 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+CONFIG_PATH = os.path.join('ui', 'static', 'common-with-flask-config.json')
+UNPAUSE_POLL_SECONDS = 0.5
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams; reconnects when the server closes."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=b'', content_type='application/json'):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.writer.write(head.encode() + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'content-length' in headers:
+            payload = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            payload = await self.reader.read()
+        if headers.get('connection', '').lower() == 'close' or 'content-length' not in headers:
+            await self.close()
+        return status, payload
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+
+class SyntheticSource:
+    def __init__(self, rng, state_space, episode_steps, win_probability):
+        self.rng = rng
+        self.state_space = state_space
+        self.episode_steps = episode_steps
+        self.win_probability = win_probability
+
+    def reset(self):
+        self.length = int(self.rng.integers(self.episode_steps[0], self.episode_steps[1] + 1))
+        self.win = bool(self.rng.random() < self.win_probability)
+        self.final_progress = 1.0 if self.win else self.rng.random()
+        self.t = 0
+        return self._observation(), False, False
+
+    def _observation(self):
+        observation = self.rng.random(self.state_space)
+        observation[0] = self.final_progress * self.t / self.length
+        return observation
+
+    def step(self, action):
+        self.t += 1
+        done = self.t >= self.length
+        return self._observation(), done, done and self.win
+
+
+class EnvSource:
+    def __init__(self, seed):
+        from ai.env.racetrack_env import RacetrackEnv
+
+        self.env = RacetrackEnv(seed=seed)
+
+    def reset(self):
+        return self.env.reset(), False, False
+
+    def step(self, action):
+        observation, _, done, info = self.env.step(action)
+        return observation, done, info["win"]
+
+
+class ReplaySource:
+    def __init__(self, observations, dones, offset):
+        self.observations = observations
+        self.dones = dones
+        self.i = offset % len(observations)
+
+    def _next(self):
+        observation, done = self.observations[self.i], bool(self.dones[self.i])
+        self.i = (self.i + 1) % len(self.observations)
+        return observation, done, False
+
+    def reset(self):
+        # Skip to the start of an episode
+        while self.i and not self.dones[self.i - 1]:
+            self.i = (self.i + 1) % len(self.observations)
+        return self._next()
+
+    def step(self, action):
+        return self._next()
+
+
+def recorded_episodes(directory):
+    """Observations and dones of every finished episode in a TrajectoryRecorder directory, one after another."""
+    from ai.ppo.ppo_recorder import TrajectoryReader
+
+    reader = TrajectoryReader(directory)
+    finished = {}
+    for episode in reader.episodes:
+        if episode["done"]:
+            finished.setdefault(episode["chunk"], []).append(episode)
+    observations, dones = [], []
+    for chunk, columns in reader:
+        for episode in finished.get(chunk["chunk"], []):
+            transitions = reader.episode(episode, columns)
+            observations.append(transitions['states'])
+            dones.append(transitions['dones'])
+    if not observations:
+        raise SystemExit(f"No finished episodes recorded in {directory}")
+    return np.concatenate(observations), np.concatenate(dones)
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {'/get_action': [], '/check_unpause': []}
+        self.errors = 0
+        self.episodes = 0
+        self.paused_seconds = 0.0
+
+
+async def run_agent(index, n_agents, args, url, action_indices, make_source, stats, deadline):
+    connection = HttpConnection(url.hostname, url.port or 80)
+    source = make_source(index)
+    agent_id = f"load-{index}-{os.getpid()}"
+    tick = args.tick_ms / 1000
+    observation, done, win = source.reset()
+    game_start = time.monotonic()
+    next_tick = time.monotonic() + tick * index / n_agents
+
+    async def call(method, path, body=b''):
+        start = time.perf_counter()
+        try:
+            status, payload = await connection.request(method, path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats.errors += 1
+            await connection.close()
+            return None
+        if status != 200:
+            stats.errors += 1
+            return None
+        stats.latencies[path.split('?')[0]].append(time.perf_counter() - start)
+        return json.loads(payload)
+
+    try:
+        while time.monotonic() < deadline:
+            # Browser ticks fire on a fixed schedule; a slow answer delays the next one
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_tick = max(next_tick + tick, time.monotonic())
+
+            body = json.dumps({
+                "agent_id": agent_id,
+                "observation": {f"o{i}": float(v) for i, v in enumerate(observation)},
+                "done": done, "win": win,
+                "time_since_game_start": int((time.monotonic() - game_start) * 1000),
+            }).encode()
+            answer = await call('POST', '/get_action', body)
+            if answer is None:
+                continue
+
+            if answer["pause"]:
+                stats.episodes += 1
+                paused_at = time.monotonic()
+                while time.monotonic() < deadline:
+                    unpause = await call('GET', f'/check_unpause?agent_id={agent_id}')
+                    if unpause is not None and unpause["unpause"]:
+                        break
+                    await asyncio.sleep(UNPAUSE_POLL_SECONDS)
+                stats.paused_seconds += time.monotonic() - paused_at
+                observation, done, win = source.reset()
+                game_start = time.monotonic()
+                next_tick = time.monotonic()
+            elif done:
+                # The server did not pause after a finished game; start the next one anyway
+                observation, done, win = source.reset()
+            else:
+                action = action_indices[tuple(answer["action"][name] for name in sorted(answer["action"]))]
+                observation, done, win = source.step(action)
+    finally:
+        await connection.close()
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process from /proc (Linux)."""
+    if pid is None:
+        return None
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def run_level(n_agents, args, url, action_indices, make_source):
+    stats = Stats()
+    cpu_before = cpu_seconds(args.server_pid)
+    start = time.monotonic()
+    deadline = start + args.seconds
+    await asyncio.gather(*(run_agent(i, n_agents, args, url, action_indices, make_source, stats, deadline)
+                           for i in range(n_agents)))
+    elapsed = time.monotonic() - start
+    cpu_after = cpu_seconds(args.server_pid)
+
+    actions = np.array(stats.latencies['/get_action']) * 1000
+    result = {
+        "agents": n_agents,
+        "seconds": elapsed,
+        "get_action_per_sec": len(actions) / elapsed,
+        "check_unpause_per_sec": len(stats.latencies['/check_unpause']) / elapsed,
+        "episodes": stats.episodes,
+        "errors": stats.errors,
+        "paused_fraction": stats.paused_seconds / (n_agents * elapsed),
+        "server_cpu": (cpu_after - cpu_before) / elapsed if cpu_before is not None else None,
+    }
+    for p in (50, 90, 99):
+        result[f"p{p}_ms"] = float(np.percentile(actions, p)) if len(actions) else None
+    return result
+
+
+def action_lookup(config):
+    """Map the action dict of a /get_action answer back to its action index."""
+    lookup = {}
+    for index, mapping in config["action_mappings"].items():
+        full = {name: mapping.get(name, False) for name in config["actions_list"]}
+        lookup[tuple(full[name] for name in sorted(full))] = int(index)
+    return lookup
+
+
+def spawn_server(port):
+    from benchmarks.run_all import scratch_app_dir, wait_for_server
+
+    root = scratch_app_dir()
+    process = subprocess.Popen(
+        [sys.executable, 'app.py', '--no-build', '--training', '--no-rename-models', '--no-ui', '--port', str(port)],
+        cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_server(port, process)
+    return process, root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--agents', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--seconds', type=float, default=15, help="Duration of each agent count.")
+    parser.add_argument('--tick-ms', type=float, default=250,
+                        help="Time between /get_action calls of an agent; the browser sends about 4 per second. "
+                             "0 sends the next request as soon as the answer arrives.")
+    parser.add_argument('--observations', default='synthetic',
+                        help="'synthetic', 'env' (headless racetrack), a .npz file or a recording directory to replay.")
+    parser.add_argument('--episode-steps', type=int, nargs=2, default=[40, 400], metavar=('MIN', 'MAX'),
+                        help="Range of synthetic episode lengths in ticks.")
+    parser.add_argument('--win-probability', type=float, default=0.05)
+    parser.add_argument('--server-pid', type=int, help="Report the CPU used by this process (Linux).")
+    parser.add_argument('--spawn', action='store_true',
+                        help="Start app.py in a scratch directory on a free port and measure it.")
+    parser.add_argument('--json', help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    with open(CONFIG_PATH) as f:
+        config = json.load(f)
+    state_space = config["state_space"]
+
+    if args.observations == 'synthetic':
+        def make_source(i):
+            return SyntheticSource(np.random.default_rng(i), state_space, args.episode_steps, args.win_probability)
+    elif args.observations == 'env':
+        def make_source(i):
+            return EnvSource(seed=i)
+    else:
+        if os.path.isdir(args.observations):
+            observations, dones = recorded_episodes(args.observations)
+        else:
+            with np.load(args.observations) as data:
+                observations, dones = data['observations'], data['dones']
+
+        def make_source(i):
+            return ReplaySource(observations, dones, offset=i * 997)
+
+    process = root = None
+    if args.spawn:
+        from benchmarks.run_all import free_port
+
+        port = free_port()
+        process, root = spawn_server(port)
+        args.url, args.server_pid = f"http://127.0.0.1:{port}", process.pid
+    url = urlparse(args.url)
+
+    results = []
+    try:
+        print(f"{'agents':>6} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+              f"{'paused':>7} {'episodes':>9} {'errors':>7} {'server CPU':>11}")
+        for n_agents in args.agents:
+            result = asyncio.run(run_level(n_agents, args, url, action_lookup(config), make_source))
+            results.append(result)
+            cpu = f"{result['server_cpu']:.0%}" if result['server_cpu'] is not None else "-"
+            latencies = [f"{result[k]:>8.1f}" if result[k] is not None else f"{'-':>8}"
+                         for k in ('p50_ms', 'p90_ms', 'p99_ms')]
+            print(f"{n_agents:>6} {result['get_action_per_sec']:>8.0f} {' '.join(latencies)} "
+                  f"{result['paused_fraction']:>7.1%} {result['episodes']:>9} {result['errors']:>7} {cpu:>11}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(root, ignore_errors=True)
+
+    # Saturation: the first step up in agents that bought less than 10% more throughput
+    for previous, current in zip(results, results[1:]):
+        if current["get_action_per_sec"] < previous["get_action_per_sec"] * 1.1:
+            print(f"\nThroughput stops scaling between {previous['agents']} and {current['agents']} agents "
+                  f"(~{max(previous['get_action_per_sec'], current['get_action_per_sec']):.0f} req/s).")
+            break
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"arguments": vars(args) | {"url": args.url}, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
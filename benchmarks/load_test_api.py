@@ -0,0 +1,116 @@
+"""
+Load-test the training API of a running app.py.
+
+Simulated agents send random observations to the JSON /get_action endpoint
+(one agent per request, as a browser tab does) and to the binary
+/get_actions_binary endpoint (several agents packed into each request), and
+the script reports requests/s, agent steps/s and p50/p99 latency for both.
+Only the standard library and NumPy are used on the client side.
+
+Start app.py in training mode, then run from the repository root:
+    python -m benchmarks.load_test_api --url http://127.0.0.1:8080
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from ai.ppo import ppo_wire
+
+
+def post(connection, path, body, content_type):
+    connection.request('POST', path, body=body, headers={'Content-Type': content_type})
+    response = connection.getresponse()
+    payload = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{path} returned {response.status}: {payload[:200]!r}")
+    return payload
+
+
+def json_client(connection, client_id, rng, state_space, done_probability):
+    def step():
+        observation = {f"o{i}": float(v) for i, v in enumerate(rng.random(state_space))}
+        body = json.dumps({"agent_id": f"load-test-{client_id}", "observation": observation,
+                           "done": bool(rng.random() < done_probability), "win": False,
+                           "time_since_game_start": 0})
+        json.loads(post(connection, '/get_action', body, 'application/json'))
+        return 1
+    return step
+
+
+def binary_client(connection, client_id, rng, state_space, done_probability, agents_per_request):
+    agent_ids = np.arange(agents_per_request) + (client_id + 1) * 100_000
+
+    def step():
+        body = ppo_wire.encode_steps(agent_ids, rng.random((agents_per_request, state_space)),
+                                     rng.random(agents_per_request) < done_probability,
+                                     np.zeros(agents_per_request, dtype=bool))
+        return len(ppo_wire.decode_actions(post(connection, '/get_actions_binary', body,
+                                                ppo_wire.CONTENT_TYPE)))
+    return step
+
+
+def run(make_step, url, clients, seconds):
+    parsed = urlparse(url)
+    latencies = [[] for _ in range(clients)]
+    agent_steps = [0] * clients
+    stop = threading.Event()
+    barrier = threading.Barrier(clients + 1)
+
+    def client(i):
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+        step = make_step(connection, i, np.random.default_rng(i))
+        barrier.wait()
+        while not stop.is_set():
+            start = time.perf_counter()
+            agent_steps[i] += step()
+            latencies[i].append(time.perf_counter() - start)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.concatenate(latencies) * 1000
+    return len(latencies) / elapsed, sum(agent_steps) / elapsed, \
+        np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--clients', type=int, default=8, help="Concurrent connections per protocol.")
+    parser.add_argument('--agents-per-request', type=int, default=32,
+                        help="Agents packed into each binary request.")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--state-space', type=int, default=11)
+    parser.add_argument('--done-probability', type=float, default=0.002)
+    parser.add_argument('--protocols', nargs='+', default=['json', 'binary'], choices=['json', 'binary'])
+    args = parser.parse_args()
+
+    steps = {
+        'json': lambda connection, i, rng: json_client(
+            connection, i, rng, args.state_space, args.done_probability),
+        'binary': lambda connection, i, rng: binary_client(
+            connection, i, rng, args.state_space, args.done_probability, args.agents_per_request),
+    }
+    print(f"{args.clients} clients, {args.agents_per_request} agents per binary request, {args.seconds:g}s each")
+    print(f"{'protocol':>9} {'req/s':>9} {'steps/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for protocol in args.protocols:
+        rps, sps, p50, p99 = run(steps[protocol], args.url, args.clients, args.seconds)
+        print(f"{protocol:>9} {rps:>9,.0f} {sps:>10,.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
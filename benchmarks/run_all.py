@@ -0,0 +1,375 @@
+"""
+Run the PPO benchmark suite and write the results as JSON.
+
+Every benchmark runs in a fresh Python process on synthetic data, so results
+do not depend on what ran before and each one reports its own peak RSS:
+- memory: rollout storage throughput of PPOMemory (per step and batched)
+- gae: compute_gae time over a long rollout
+- update: traced minibatch steps per second of Agent.learn
+- inference: single and batched choose_actions latency (TensorFlow and NumPy)
+- checkpoint: Agent.save_models and write_checkpoint time and size
+- api: /get_action requests per second under N simulated agents, against an
+  app.py started in a scratch directory
+
+The JSON holds the machine fingerprint (CPU, cores, memory, library versions,
+git commit) next to the numbers. Pass --compare with an earlier file to print
+the change of every metric.
+
+Run from the repository root:
+    python -m benchmarks.run_all
+    python -m benchmarks.run_all --quick --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+
+import numpy as np
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+STATE_SPACE = 11
+N_ACTIONS = 3
+
+
+def percentiles_ms(latencies):
+    latencies = np.asarray(latencies) * 1000
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99))}
+
+
+def make_agent(**kwargs):
+    from ai.ppo.ppo import Agent
+
+    save_dir = tempfile.mkdtemp()
+    agent = Agent(n_actions=N_ACTIONS, input_dims=STATE_SPACE,
+                  save_folder_actor=f"{save_dir}/actor", save_folder_critic=f"{save_dir}/critic", **kwargs)
+    agent.choose_actions(np.zeros((1, STATE_SPACE), dtype=np.float32))
+    return agent, save_dir
+
+
+def fill_memory(memory, n_steps, seed=0, episode_length=250):
+    rng = np.random.default_rng(seed)
+    memory.store_batch(rng.random((n_steps, STATE_SPACE), dtype=np.float32),
+                       rng.integers(N_ACTIONS, size=n_steps), rng.normal(size=n_steps),
+                       rng.normal(size=n_steps), rng.normal(size=n_steps),
+                       np.arange(n_steps) % episode_length == episode_length - 1,
+                       np.arange(n_steps) % 4)
+
+
+def bench_memory(args):
+    from ai.ppo.ppo_memory import PPOMemory
+
+    n_steps = args.steps
+    rng = np.random.default_rng(0)
+    states = rng.random((n_steps, STATE_SPACE), dtype=np.float32)
+    actions = rng.integers(N_ACTIONS, size=n_steps)
+    floats = rng.normal(size=(3, n_steps))
+    dones = rng.random(n_steps) < 0.004
+
+    memory = PPOMemory(64, STATE_SPACE)
+    start = time.perf_counter()
+    for i in range(n_steps):
+        memory.store_memory(states[i], actions[i], floats[0, i], floats[1, i], floats[2, i], dones[i], i % 4)
+    single = time.perf_counter() - start
+
+    memory = PPOMemory(64, STATE_SPACE)
+    start = time.perf_counter()
+    for chunk in range(0, n_steps, 256):
+        rows = slice(chunk, chunk + 256)
+        memory.store_batch(states[rows], actions[rows], floats[0, rows], floats[1, rows], floats[2, rows],
+                           dones[rows], np.arange(chunk, min(chunk + 256, n_steps)) % 4)
+    batched = time.perf_counter() - start
+    return {"steps": n_steps, "store_per_sec": n_steps / single, "store_batch_per_sec": n_steps / batched}
+
+
+def bench_gae(args):
+    from ai.ppo.ppo_advantage import compute_gae
+    from ai.ppo.ppo_memory import PPOMemory
+
+    memory = PPOMemory(64, STATE_SPACE)
+    fill_memory(memory, args.steps)
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        compute_gae(memory.rewards, memory.vals, memory.dones, segment_ids=memory.agent_ids)
+        times.append(time.perf_counter() - start)
+    return {"steps": args.steps, "best_seconds": min(times), "steps_per_sec": args.steps / min(times)}
+
+
+def bench_update(args):
+    from ai.ppo.ppo_advantage import compute_gae
+
+    agent, save_dir = make_agent()
+    fill_memory(agent.memory, args.update_steps)
+    state_arr, action_arr, old_prob_arr, vals_arr, reward_arr, dones_arr, _ = agent.memory.generate_batches()
+    advantage, returns = compute_gae(reward_arr, vals_arr, dones_arr, segment_ids=agent.memory.agent_ids)
+
+    def epoch():
+        steps = 0
+        for batch in agent.memory.generate_batch_indices():
+            agent._train_step(*agent._minibatch(batch, state_arr, action_arr, old_prob_arr, advantage, returns))
+            steps += 1
+        return steps
+
+    # Tracing and optimizer slot creation happen in the first epoch
+    start = time.perf_counter()
+    epoch()
+    first_epoch = time.perf_counter() - start
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(args.epochs):
+        steps += epoch()
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(save_dir)
+    return {"rollout_steps": args.update_steps, "minibatch_steps_per_sec": steps / elapsed,
+            "first_epoch_seconds": first_epoch}
+
+
+def bench_inference(args):
+    from ai.ppo.ppo_numpy import NumpyPolicy
+
+    agent, save_dir = make_agent()
+    agent.save_models(0, 0)
+    policy = NumpyPolicy.load(os.path.join(save_dir, 'actor', 'actor_episodes_0_avg_0'),
+                              os.path.join(save_dir, 'critic', 'critic_episodes_0_avg_0'))
+    observations = np.random.default_rng(0).random((64, STATE_SPACE), dtype=np.float32)
+
+    results = {}
+    for name, model in (('tf', agent), ('numpy', policy)):
+        for label, batch in (('single', observations[:1]), ('batch64', observations)):
+            model.choose_actions(batch)
+            latencies = []
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                model.choose_actions(batch)
+                latencies.append(time.perf_counter() - start)
+            results[f"{name}_{label}"] = percentiles_ms(latencies)
+    shutil.rmtree(save_dir)
+    return results
+
+
+def bench_checkpoint(args):
+    from ai.ppo.ppo_checkpoint import write_checkpoint
+
+    agent, save_dir = make_agent()
+    save_times = []
+    for episode in range(3):
+        start = time.perf_counter()
+        agent.save_models(episode, 0)
+        save_times.append(time.perf_counter() - start)
+
+    path = os.path.join(save_dir, 'checkpoint.npz')
+    snapshot_times, write_times = [], []
+    for _ in range(3):
+        start = time.perf_counter()
+        state = agent.get_training_state()
+        snapshot_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        write_checkpoint(path, state, {"episode": 0})
+        write_times.append(time.perf_counter() - start)
+    size = os.path.getsize(path)
+    shutil.rmtree(save_dir)
+    return {"save_models_seconds": min(save_times), "snapshot_seconds": min(snapshot_times),
+            "write_checkpoint_seconds": min(write_times), "checkpoint_bytes": size}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def scratch_app_dir():
+    """
+    A directory app.py can run in without touching the repository: the config and
+    the saved models it writes land in the scratch copy, the code is linked.
+    """
+    root = tempfile.mkdtemp()
+    shutil.copy('app.py', root)
+    os.makedirs(os.path.join(root, 'ai'))
+    for package in ('ppo', 'env'):
+        os.symlink(os.path.abspath(os.path.join('ai', package)), os.path.join(root, 'ai', package))
+    os.makedirs(os.path.join(root, 'ui', 'static'))
+    shutil.copy(os.path.join('ui', 'static', 'common-with-flask-config.json'), os.path.join(root, 'ui', 'static'))
+    return root
+
+
+def wait_for_server(port, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app.py exited with code {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError("app.py did not start listening")
+
+
+def bench_api(args):
+    from benchmarks.load_test_api import json_client, run
+
+    root = scratch_app_dir()
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, 'app.py', '--no-build', '--training', '--no-rename-models', '--no-ui', '--port', str(port)],
+        cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(port, process)
+        url = f"http://127.0.0.1:{port}"
+        results = {}
+        for agents in args.api_agents:
+            rps, _, p50, p99 = run(lambda connection, i, rng: json_client(connection, i, rng, STATE_SPACE, 0.002),
+                                   url, agents, args.api_seconds)
+            results[f"agents_{agents}"] = {"requests_per_sec": rps, "p50_ms": p50, "p99_ms": p99}
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(root, ignore_errors=True)
+    # The server's memory is reported separately from this client's
+    results["server_peak_rss_mb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return results
+
+
+BENCHMARKS = {
+    'memory': bench_memory,
+    'gae': bench_gae,
+    'update': bench_update,
+    'inference': bench_inference,
+    'checkpoint': bench_checkpoint,
+    'api': bench_api,
+}
+
+
+def command_output(command):
+    try:
+        return subprocess.run(command, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_fingerprint():
+    cpu_model = platform.processor()
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpu_model = next(line.split(':', 1)[1].strip() for line in f if line.startswith('model name'))
+    except (OSError, StopIteration):
+        pass
+    try:
+        memory_bytes = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError):
+        memory_bytes = None
+
+    versions = {"python": platform.python_version(), "numpy": np.__version__}
+    for module in ('tensorflow', 'flask'):
+        versions[module] = command_output([sys.executable, '-c', f"import importlib.metadata as m; "
+                                                                 f"print(m.version({module!r}))"])
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_model": cpu_model,
+        "cpu_count": os.cpu_count(),
+        "usable_cpus": len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+        "memory_bytes": memory_bytes,
+        "versions": versions,
+        "git_commit": command_output(['git', 'rev-parse', 'HEAD']),
+        "git_dirty": bool(command_output(['git', 'status', '--porcelain', '--untracked-files=no'])),
+    }
+
+
+def run_in_subprocess(name, args):
+    command = [sys.executable, '-m', 'benchmarks.run_all', '--worker', name] + args.worker_args
+    start = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed",
+                "wall_seconds": time.perf_counter() - start}
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["wall_seconds"] = time.perf_counter() - start
+    return result
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def print_comparison(current, previous):
+    before = dict(flatten(previous["results"]))
+    print(f"\nCompared with {previous['timestamp']} ({(previous['machine'].get('git_commit') or '?')[:10]}):")
+    print(f"{'metric':<48} {'before':>12} {'after':>12} {'change':>8}")
+    for key, value in flatten(current["results"]):
+        if key in before and before[key]:
+            print(f"{key:<48} {before[key]:>12.4g} {value:>12.4g} {(value / before[key] - 1):>+8.1%}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--quick', action='store_true', help="Smaller sizes, for a fast smoke run.")
+    parser.add_argument('--output', help=f"JSON file to write (default: {RESULTS_DIR}/<time>_<commit>.json).")
+    parser.add_argument('--compare', help="Earlier results JSON to compare against.")
+    parser.add_argument('--steps', type=int, default=100_000, help="Rollout length for memory and gae.")
+    parser.add_argument('--update-steps', type=int, default=4096, help="Rollout length for update.")
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--calls', type=int, default=1000, help="Timed calls per inference case.")
+    parser.add_argument('--api-agents', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--api-seconds', type=float, default=10)
+    parser.add_argument('--worker', choices=list(BENCHMARKS), help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args()
+    if args.quick:
+        args.steps, args.update_steps, args.epochs, args.calls = 20_000, 1024, 1, 200
+        args.api_agents, args.api_seconds = [1, 8], 3
+    args.worker_args = ['--steps', str(args.steps), '--update-steps', str(args.update_steps),
+                        '--epochs', str(args.epochs), '--calls', str(args.calls),
+                        '--api-seconds', str(args.api_seconds), '--api-agents', *map(str, args.api_agents)]
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        result = BENCHMARKS[args.worker](args)
+        result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(json.dumps(result))
+        return
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+              "machine": machine_fingerprint(), "arguments": args.worker_args, "results": {}}
+    for name in args.only:
+        print(f"running {name}...", flush=True)
+        report["results"][name] = result = run_in_subprocess(name, args)
+        print("  " + ", ".join(f"{key}={value:.4g}" for key, value in flatten(result)) if "error" not in result
+              else f"  failed: {result['error']}")
+
+    output = args.output
+    if output is None:
+        commit = (report["machine"]["git_commit"] or "nogit")[:10]
+        output = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
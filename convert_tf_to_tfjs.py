@@ -1,5 +1,19 @@
+import argparse
+import hashlib
+import json
+import shutil
 import subprocess
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ai.ppo.ppo_normalize import NORMALIZER_FILE
+from ai.ppo.ppo_registry import ModelRegistry
+
+REGISTRY_PATH = './ai/saved_ppo_tf_models/models.jsonl'
+DEFAULT_OUTPUT_DIR = "./ai/tfjs_models"
+ADDITIONAL_OUTPUT_DIR = "./ui/static/tfjs_models"
+CACHE_PATH = os.path.join(DEFAULT_OUTPUT_DIR, 'conversion_cache.json')
+QUANTIZE_FLAGS = {None: [], 'float16': ['--quantize_float16'], 'uint8': ['--quantize_uint8']}
 
 
 def prompt_episode_number():
@@ -27,6 +41,17 @@ def prompt_additional_save():
     return response.strip().lower() == 'y'
 
 
+def load_registry():
+    """
+    Open the saved model registry, indexing the saved model folders first if it does not exist yet.
+    """
+    registry = ModelRegistry(REGISTRY_PATH)
+    if not registry.exists():
+        print(f"Indexing saved models into '{REGISTRY_PATH}' (one time)...")
+        registry.rebuild()
+    return registry
+
+
 def find_model_path(model_type, episode_number):
     """
     Find the model path based on the model type and episode number.
@@ -38,10 +63,9 @@ def find_model_path(model_type, episode_number):
     Returns:
     str: The path to the model directory.
     """
-    base_dir = f'./ai/saved_ppo_tf_models/{model_type}'
-    for dirname in os.listdir(base_dir):
-        if f'episodes_{episode_number}_' in dirname:
-            return os.path.join(base_dir, dirname)
+    entry = load_registry().at_episode(episode_number)
+    if entry is not None:
+        return entry[f'{model_type}_path']
     print(
         f"No model found for '{model_type}' with episode number {episode_number}.")
     exit(1)
@@ -57,58 +81,263 @@ def ensure_directory_exists(directory):
     os.makedirs(directory, exist_ok=True)
 
 
-def convert_to_tfjs(model_type, episode_number, output_dirs):
+def hash_directory(directory):
+    """
+    Content hash of every file under a directory, independent of timestamps.
+
+    Args:
+    directory (str): The path to the directory.
+
+    Returns:
+    str: Hex SHA-256 digest over the relative paths and contents of the files.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, directory).encode())
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_cache():
+    """
+    Read the conversion cache manifest: output model name -> input hash and options.
+    """
+    if not os.path.exists(CACHE_PATH):
+        return {}
+    with open(CACHE_PATH) as f:
+        return json.load(f)
+
+
+def save_cache(cache):
+    ensure_directory_exists(os.path.dirname(CACHE_PATH))
+    tmp_path = f"{CACHE_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def link_or_copy_tree(source_dir, target_dir):
+    """
+    Mirror the files of source_dir into target_dir with hard links, copying when linking is not possible.
+    """
+    if os.path.exists(target_dir):
+        shutil.rmtree(target_dir)
+    ensure_directory_exists(target_dir)
+    for name in os.listdir(source_dir):
+        source, target = os.path.join(source_dir, name), os.path.join(target_dir, name)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+
+def run_converter(saved_model_dir, output_path, quantize=None):
+    """
+    Run tensorflowjs_converter on one SavedModel.
+
+    The observation normalizer statistics saved with the model, if any, are
+    copied next to model.json; PPOAgent.js applies them before every prediction.
+
+    Args:
+    saved_model_dir (str): Input SavedModel directory.
+    output_path (str): Directory the model.json and weight shards are written to.
+    quantize (str, optional): 'float16' or 'uint8' to quantize the weights.
+    """
+    # Convert into a fresh directory so shards from an earlier, differently quantized run do not linger
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    ensure_directory_exists(output_path)
+    command = [
+        "tensorflowjs_converter",
+        "--input_format=tf_saved_model",
+        *QUANTIZE_FLAGS[quantize],
+        saved_model_dir,
+        output_path
+    ]
+    subprocess.run(command, check=True, capture_output=True, text=True)
+    normalizer_path = os.path.join(saved_model_dir, NORMALIZER_FILE)
+    if os.path.exists(normalizer_path):
+        shutil.copy2(normalizer_path, output_path)
+
+
+def convert_to_tfjs(model_type, episode_number, output_dirs, quantize=None):
     """
     Convert a TensorFlow saved model to TensorFlow.js format and save to specified directories.
 
+    The model is converted once into the first directory and linked into the others.
+
     Args:
     model_type (str): Type of the model ('actor' or 'critic').
-    episode_number (int): Episode number of the model. 
-    output_dirs (list): Directories where the TensorFlow.js model will be saved. 
+    episode_number (int): Episode number of the model.
+    output_dirs (list): Directories where the TensorFlow.js model will be saved.
+    quantize (str, optional): 'float16' or 'uint8' to quantize the weights.
     """
     saved_model_dir = find_model_path(model_type, episode_number)
+    name = f'{model_type}_episodes_{episode_number}'
+    output_path = os.path.join(output_dirs[0], name)
 
-    for output_dir in output_dirs:
-        output_path = os.path.join(
-            output_dir, f'{model_type}_episodes_{episode_number}')
+    try:
+        run_converter(saved_model_dir, output_path, quantize)
+        for output_dir in output_dirs[1:]:
+            link_or_copy_tree(output_path, os.path.join(output_dir, name))
+        print()
+        print()
+        print(
+            f"Model '{model_type}' for episode {episode_number} converted successfully and saved to {output_dirs}")
+    except subprocess.CalledProcessError as e:
+        print()
+        print()
+        print(
+            f"Error occurred while converting model '{model_type}' for episode {episode_number}: {e}\n{e.stderr}")
 
-        # Ensure the output directory exists
-        ensure_directory_exists(output_path)
 
-        # Command to convert the model
-        command = [
-            "tensorflowjs_converter",
-            "--input_format=tf_saved_model",
-            saved_model_dir,
-            output_path
-        ]
+def is_cached_conversion(cache, name, quantize):
+    """
+    Whether the cache records a finished conversion of the named model with this quantization
+    whose output is still on disk.
+    """
+    cached = cache.get(name)
+    return (cached is not None and cached.get('quantize') == quantize
+            and os.path.exists(os.path.join(DEFAULT_OUTPUT_DIR, name, 'model.json')))
 
-        try:
-            subprocess.run(command, check=True)
-            print()
-            print()
-            print(
-                f"Model '{model_type}' for episode {episode_number} converted successfully and saved to '{output_path}'")
-        except subprocess.CalledProcessError as e:
-            print()
-            print()
-            print(
-                f"Error occurred while converting model '{model_type}' for episode {episode_number}: {e}")
+
+def plan_conversions(registry, episodes, cache, quantize, force=False):
+    """
+    Work out which models need converting.
+
+    Args:
+    registry (ModelRegistry): Index of the saved models.
+    episodes (list or None): Episode numbers to convert, or None for every saved episode not in the cache.
+    cache (dict): Conversion cache manifest.
+    quantize (str or None): Requested weight quantization.
+    force (bool): Convert even when the cache says the output is up to date.
+
+    Returns:
+    tuple: (jobs, skipped) where jobs is a list of (name, saved_model_dir, input_hash, episode) and
+        skipped lists the names whose cached conversion is still valid.
+    """
+    if episodes is None:
+        # An episode only counts as converted once both of its models are, with the requested quantization
+        latest = {entry['episode']: entry for entry in registry.range()
+                  if not all(is_cached_conversion(cache, f"{model_type}_episodes_{entry['episode']}", quantize)
+                             for model_type in ('actor', 'critic'))}
+        entries = [latest[episode] for episode in sorted(latest)]
+    else:
+        entries = []
+        for episode in episodes:
+            entry = registry.at_episode(episode)
+            if entry is None:
+                print(f"No saved model with episode number {episode}, skipping.")
+            else:
+                entries.append(entry)
+
+    jobs, skipped = [], []
+    for entry in entries:
+        for model_type in ('actor', 'critic'):
+            name = f"{model_type}_episodes_{entry['episode']}"
+            saved_model_dir = entry[f'{model_type}_path']
+            input_hash = hash_directory(saved_model_dir)
+            up_to_date = (is_cached_conversion(cache, name, quantize)
+                          and cache[name]['input_hash'] == input_hash)
+            if up_to_date and not force:
+                skipped.append(name)
+            else:
+                jobs.append((name, saved_model_dir, input_hash, entry['episode']))
+    return jobs, skipped
+
+
+def convert_batch(episodes, output_dirs, quantize=None, workers=None, force=False):
+    """
+    Convert many models concurrently, skipping inputs whose content hash matches the cache.
+
+    Each model is converted once into DEFAULT_OUTPUT_DIR and then linked into the other output dirs.
+
+    Args:
+    episodes (list or None): Episode numbers to convert, or None for all new since the last run.
+    output_dirs (list): Extra directories to mirror the converted models into.
+    quantize (str, optional): 'float16' or 'uint8' to quantize the weights.
+    workers (int, optional): Number of concurrent converter processes; defaults to the CPU count.
+    force (bool): Ignore the cache.
+
+    Returns:
+    int: Number of models that failed to convert.
+    """
+    cache = load_cache()
+    jobs, skipped = plan_conversions(load_registry(), episodes, cache, quantize, force)
+    for name in skipped:
+        print(f"{name}: unchanged, skipped")
+        for output_dir in output_dirs:
+            if not os.path.exists(os.path.join(output_dir, name)):
+                link_or_copy_tree(os.path.join(DEFAULT_OUTPUT_DIR, name), os.path.join(output_dir, name))
+    if not jobs:
+        print("Nothing to convert.")
+        return 0
+
+    failures = 0
+    # The converters are separate processes, so threads are enough to keep workers of them busy
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(run_converter, saved_model_dir, os.path.join(DEFAULT_OUTPUT_DIR, name), quantize):
+                   (name, input_hash, episode) for name, saved_model_dir, input_hash, episode in jobs}
+        for future in as_completed(futures):
+            name, input_hash, episode = futures[future]
+            try:
+                future.result()
+            except subprocess.CalledProcessError as e:
+                failures += 1
+                print(f"{name}: conversion failed\n{e.stderr}")
+                continue
+            for output_dir in output_dirs:
+                link_or_copy_tree(os.path.join(DEFAULT_OUTPUT_DIR, name), os.path.join(output_dir, name))
+            cache[name] = {"episode": episode, "input_hash": input_hash, "quantize": quantize}
+            save_cache(cache)
+            print(f"{name}: converted")
+    print(f"Converted {len(jobs) - failures}, skipped {len(skipped)}, failed {failures}.")
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert saved TensorFlow models to TensorFlow.js. Without arguments the episode is prompted for.")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument('--episodes', type=int, nargs='+', metavar='N',
+                           help="Convert the actor and critic of these episodes without prompting")
+    selection.add_argument('--all-new', action='store_true',
+                           help="Convert every saved episode that has not been converted before")
+    parser.add_argument('--ui', action='store_true',
+                        help=f"Also place the converted models in '{ADDITIONAL_OUTPUT_DIR}'")
+    parser.add_argument('--output-dir', action='append', default=[], metavar='DIR',
+                        help="Another directory to place the converted models in (repeatable)")
+    parser.add_argument('--quantize', choices=['float16', 'uint8'],
+                        help="Quantize the weights to shrink the shards the browser downloads")
+    parser.add_argument('--workers', type=int, help="Number of conversions to run at once (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="Convert even if the cache says nothing changed")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    additional_output_dirs = args.output_dir + ([ADDITIONAL_OUTPUT_DIR] if args.ui else [])
+
+    if args.episodes or args.all_new:
+        failures = convert_batch(None if args.all_new else args.episodes, additional_output_dirs,
+                                 args.quantize, args.workers, args.force)
+        exit(1 if failures else 0)
+
     episode_number = prompt_episode_number()
-    save_additional = prompt_additional_save()
-    default_output_dir = "./ai/tfjs_models"
-    additional_output_dir = "./ui/static/tfjs_models"
+    save_additional = args.ui or prompt_additional_save()
 
-    output_dirs = [default_output_dir]
+    output_dirs = [DEFAULT_OUTPUT_DIR] + args.output_dir
     if save_additional:
-        output_dirs.append(additional_output_dir)
+        output_dirs.append(ADDITIONAL_OUTPUT_DIR)
 
     # Convert both the actor and critic models
     for model_type in ['actor', 'critic']:
-        convert_to_tfjs(model_type, episode_number, output_dirs)
+        convert_to_tfjs(model_type, episode_number, output_dirs, args.quantize)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ai.ppo.ppo_evaluate import evaluate_episodes, summarize
+from ai.ppo.ppo_registry import ModelRegistry
+from convert_tf_to_tfjs import DEFAULT_OUTPUT_DIR, REGISTRY_PATH, hash_directory
+
+CACHE_PATH = './ai/evaluation_cache.json'
+_EPISODE_IN_NAME = re.compile(r'actor_episodes_(\d+)')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Evaluate saved actor checkpoints on the headless racetrack with a fixed set of episode "
+                    "seeds and print a leaderboard.")
+    parser.add_argument('models', nargs='*',
+                        help="Actor directories (TensorFlow.js or SavedModel). Default: the actors in "
+                             f"'{DEFAULT_OUTPUT_DIR}' unless --registry is given.")
+    parser.add_argument('--registry', nargs='?', const=REGISTRY_PATH, metavar='PATH',
+                        help=f"Evaluate the models in a saved model registry (default: '{REGISTRY_PATH}').")
+    parser.add_argument('--start', type=int, help="With --registry: first episode to include.")
+    parser.add_argument('--end', type=int, help="With --registry: last episode to include.")
+    parser.add_argument('--episodes', type=int, default=50, help="Episodes per checkpoint (seeds --seed and up).")
+    parser.add_argument('--seed', type=int, default=0, help="First episode seed.")
+    parser.add_argument('--stochastic', action='store_true',
+                        help="Sample actions from the policy instead of taking the most likely one.")
+    parser.add_argument('--max-steps', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Evaluation processes.")
+    parser.add_argument('--chunk', type=int, default=10, help="Episodes per task sent to a worker.")
+    parser.add_argument('--cache', default=CACHE_PATH,
+                        help="Episode results per checkpoint hash; only missing episodes are played.")
+    parser.add_argument('--top', type=int, help="Print only the best N checkpoints.")
+    parser.add_argument('--json', help="Also write the leaderboard to this file.")
+    return parser.parse_args()
+
+
+def find_checkpoints(args):
+    """
+    Returns:
+    list: One dict per actor directory with its name, path, episode and training-time average (if known).
+    """
+    checkpoints = []
+    if args.registry:
+        registry = ModelRegistry(args.registry)
+        if not registry.exists():
+            registry.rebuild()
+        for entry in registry.range(args.start, args.end):
+            checkpoints.append({"name": os.path.basename(entry["actor_path"]), "path": entry["actor_path"],
+                                "episode": entry["episode"],
+                                "training_average": entry["average_track_completion"]})
+    paths = args.models or ([] if args.registry else sorted(glob.glob(os.path.join(DEFAULT_OUTPUT_DIR, 'actor_*'))))
+    for path in paths:
+        match = _EPISODE_IN_NAME.search(os.path.basename(os.path.normpath(path)))
+        checkpoints.append({"name": os.path.basename(os.path.normpath(path)), "path": path,
+                            "episode": int(match.group(1)) if match else None, "training_average": None})
+    return checkpoints
+
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cache(cache, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def settings_key(args):
+    """Results are only reused for the same policy mode and episode cutoff."""
+    return f"{'stochastic' if args.stochastic else 'deterministic'}/max_steps={args.max_steps}"
+
+
+def evaluate(args):
+    checkpoints = find_checkpoints(args)
+    if not checkpoints:
+        print("No checkpoints to evaluate.")
+        return []
+
+    cache = load_cache(args.cache)
+    key = settings_key(args)
+    seeds = list(range(args.seed, args.seed + args.episodes))
+    tasks = []
+    for checkpoint in checkpoints:
+        checkpoint["hash"] = hash_directory(checkpoint["path"])
+        results = cache.setdefault(checkpoint["hash"], {}).setdefault(key, {})
+        missing = [seed for seed in seeds if str(seed) not in results]
+        tasks += [(checkpoint, missing[i:i + args.chunk]) for i in range(0, len(missing), args.chunk)]
+
+    episodes = sum(len(task_seeds) for _, task_seeds in tasks)
+    print(f"{len(checkpoints)} checkpoints, {len(seeds)} episodes each ({key}): "
+          f"{episodes} episodes to play, {len(checkpoints) * len(seeds) - episodes} cached")
+    start = time.perf_counter()
+    if tasks:
+        # Workers only import NumPy and the headless racetrack, never TensorFlow
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(tasks)),
+                                 mp_context=mp.get_context('spawn')) as pool:
+            futures = {pool.submit(evaluate_episodes, checkpoint["path"], task_seeds, args.stochastic,
+                                   args.max_steps): checkpoint
+                       for checkpoint, task_seeds in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                checkpoint = futures[future]
+                cache[checkpoint["hash"]][key].update({str(seed): result for seed, result in future.result().items()})
+                save_cache(cache, args.cache)
+                print(f"\r{done}/{len(futures)} tasks", end="", flush=True)
+        print(f"\nPlayed {episodes} episodes in {time.perf_counter() - start:.1f}s")
+
+    leaderboard = []
+    for checkpoint in checkpoints:
+        results = cache[checkpoint["hash"]][key]
+        row = {column: checkpoint[column] for column in ("name", "path", "episode", "training_average", "hash")}
+        row.update(summarize([results[str(seed)] for seed in seeds]))
+        leaderboard.append(row)
+    leaderboard.sort(key=lambda row: (row["completion_rate"], row["percent_completed"]), reverse=True)
+    return leaderboard
+
+
+def print_leaderboard(leaderboard, top=None):
+    print(f"\n{'rank':>4}  {'checkpoint':<36} {'completed (95% CI)':>22} {'% of track':>13} "
+          f"{'length':>13} {'reward':>15} {'training avg':>12}")
+    for rank, row in enumerate(leaderboard[:top], 1):
+        completion = (f"{row['completion_rate'] * 100:5.1f}% "
+                      f"[{row['completion_rate_low'] * 100:.0f}-{row['completion_rate_high'] * 100:.0f}%]")
+        training = '' if row['training_average'] is None else f"{row['training_average']:.1f}"
+        print(f"{rank:>4}  {row['name'][:36]:<36} {completion:>22} "
+              f"{row['percent_completed']:>6.1f} ±{row['percent_completed_ci']:>5.1f} "
+              f"{row['length']:>6.0f} ±{row['length_ci']:>5.0f} "
+              f"{row['reward']:>7.1f} ±{row['reward_ci']:>6.1f} {training:>12}")
+
+
+def main():
+    args = parse_args()
+    leaderboard = evaluate(args)
+    if not leaderboard:
+        return
+    print_leaderboard(leaderboard, args.top)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"settings": settings_key(args), "seeds": [args.seed, args.seed + args.episodes],
+                       "leaderboard": leaderboard}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
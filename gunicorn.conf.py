@@ -0,0 +1,25 @@
+"""
+gunicorn settings for wsgi.py.
+
+One worker process holds the model and all agent state; concurrency comes from
+its threads. More workers would each train their own copy of the model on a
+share of the games, so the server refuses to start with workers != 1.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = 1
+worker_class = 'gthread'
+# Each browser tab holds about one request open at a time
+threads = int(os.environ.get('PPO_THREADS', 32))
+# Loading the model in the master would fork TensorFlow into the worker
+preload_app = False
+# Training rounds run on a background thread, but the first tf.function traces can be slow
+timeout = 120
+graceful_timeout = 30
+
+
+def on_starting(server):
+    if server.cfg.workers != 1:
+        raise SystemExit(f"wsgi:app keeps the model and agent state in one process; "
+                         f"run it with 1 worker (got {server.cfg.workers}), scale with PPO_THREADS instead")
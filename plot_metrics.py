@@ -0,0 +1,75 @@
+import argparse
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from ai.ppo.ppo_metrics import UPDATE_FIELDS, read_metrics
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Render training plots from a metrics log written during training.")
+    parser.add_argument('--metrics', default='./ai/saved_ppo_tf_models/metrics.ndjson',
+                        help="Metrics log to read (app.py writes it next to the saved models).")
+    parser.add_argument('--output', default='./statistics.png')
+    parser.add_argument('--window', type=int, default=20,
+                        help="Games averaged into each point of the episode plot.")
+    return parser.parse_args()
+
+
+def window_means(values, window):
+    """Mean of each consecutive block of window values; a trailing partial block is dropped."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values) // window * window
+    return values[:n].reshape(-1, window).mean(axis=1)
+
+
+def plot_episodes(ax1, episodes, window):
+    completions = window_means([e["completion"] for e in episodes], window)
+    rewards = window_means([e["reward"] if e.get("reward") is not None else np.nan for e in episodes], window)
+    games = [episodes[(i + 1) * window - 1]["episode"] for i in range(len(completions))]
+
+    color = 'tab:red'
+    ax1.set_xlabel('Total Completed Games')
+    ax1.set_ylabel('Average Reward', color=color)
+    ax1.plot(games, rewards, color=color)
+    ax1.tick_params(axis='y', labelcolor=color)
+
+    ax2 = ax1.twinx()
+    color = 'tab:blue'
+    ax2.set_ylabel('Average % Completed', color=color)
+    ax2.plot(games, completions, color=color)
+    ax2.tick_params(axis='y', labelcolor=color)
+
+
+def plot_updates(axes, updates):
+    games = [u["episode"] for u in updates]
+    for ax, field in zip(axes, UPDATE_FIELDS):
+        ax.plot(games, [u.get(field, np.nan) for u in updates])
+        ax.set_title(field.replace('_', ' ').capitalize(), fontsize=10)
+        ax.set_xlabel('Total Completed Games')
+
+
+def main():
+    args = parse_args()
+    episodes, updates = read_metrics(args.metrics)
+    if len(episodes) < args.window and not updates:
+        print(f"Not enough data in {args.metrics} to plot yet.")
+        return
+
+    update_rows = -(-len(UPDATE_FIELDS) // 3)
+    fig = plt.figure(figsize=(12, 3 * (1 + update_rows)))
+    grid = fig.add_gridspec(1 + update_rows, 3)
+    plot_episodes(fig.add_subplot(grid[0, :]), episodes, args.window)
+    plot_updates([fig.add_subplot(grid[1 + i // 3, i % 3]) for i in range(len(UPDATE_FIELDS))], updates)
+
+    fig.tight_layout()
+    plt.savefig(args.output)
+    plt.close()
+    print(f"Plotted {len(episodes)} games and {len(updates)} updates to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+
+from ai.ppo.ppo import Agent
+from ai.ppo.ppo_metrics import MetricsLogger
+from ai.ppo.ppo_recorder import TrajectoryReader
+from ai.ppo.ppo_telemetry import telemetry
+from train_headless import report_timers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Train a fresh agent on recorded rollouts (see TrajectoryRecorder) without a browser or "
+                    "simulator, as fast as the learner can consume them.")
+    parser.add_argument('recording', help="Directory written by TrajectoryRecorder, e.g. "
+                                          "./ai/saved_ppo_tf_models/recordings.")
+    parser.add_argument('--limit', type=int, default=None, help="Replay only the first N rollouts.")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seeds the initial weights and minibatch shuffling; same seed, same result.")
+    parser.add_argument('--save-dir', default=None,
+                        help="Save models and metrics here after each update (default: keep them in memory).")
+    parser.add_argument('--n-epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--target-kl', type=float, default=None)
+    parser.add_argument('--normalize-obs', action='store_true')
+    parser.add_argument('--scale-rewards', action='store_true')
+    parser.add_argument('--normalize-advantages', action='store_true')
+    parser.add_argument('--jit-compile', action='store_true')
+    parser.add_argument('--timers', action='store_true', help="Print the per-stage timers at the end.")
+    return parser.parse_args()
+
+
+def weights_digest(agent):
+    """Short hash of the actor and critic weights; equal digests mean identical replays."""
+    digest = hashlib.sha256()
+    for weights in agent.actor.get_weights() + agent.critic.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def replay(args):
+    reader = TrajectoryReader(args.recording)
+    chunks = reader.chunks[:args.limit]
+    if not chunks:
+        print(f"{args.recording} holds no rollouts yet.")
+        return
+
+    tf.keras.utils.set_random_seed(args.seed)
+    tf.config.experimental.enable_op_determinism()
+    model = Agent(n_actions=reader.n_actions,
+                  input_dims=reader.input_dims,
+                  save_folder_actor=f"{args.save_dir}/actor" if args.save_dir else None,
+                  save_folder_critic=f"{args.save_dir}/critic" if args.save_dir else None,
+                  n_epochs=args.n_epochs,
+                  batch_size=args.batch_size,
+                  jit_compile=args.jit_compile,
+                  target_kl=args.target_kl,
+                  normalize_obs=args.normalize_obs,
+                  scale_rewards=args.scale_rewards,
+                  normalize_advantage=args.normalize_advantages
+                  )
+    # Recordings already hold every rollout in full; train on all of them
+    model.learning_trigger = 0
+    metrics = MetricsLogger(f"{args.save_dir}/metrics.ndjson") if args.save_dir else None
+
+    def load(chunk):
+        # Read the memory-mapped columns on a helper thread while the learner trains on the previous rollout
+        return {column: np.ascontiguousarray(values) for column, values in reader.load_chunk(chunk).items()}
+
+    start = time.perf_counter()
+    learn_seconds = 0.0
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        pending = prefetch.submit(load, chunks[0])
+        for i, chunk in enumerate(chunks):
+            columns = pending.result()
+            if i + 1 < len(chunks):
+                pending = prefetch.submit(load, chunks[i + 1])
+
+            model.remember_batch(columns['states'], columns['actions'], columns['probs'], columns['vals'],
+                                 columns['rewards'], columns['dones'], columns['agent_ids'])
+            update_start = time.perf_counter()
+            model.learn(chunk["episode"], chunk["average_track_completion"])
+            update_seconds = time.perf_counter() - update_start
+            learn_seconds += update_seconds
+            telemetry.observe("update", update_seconds)
+            if metrics is not None:
+                metrics.log_update(chunk["episode"], model.last_learn_stats, update_seconds)
+            stats = model.last_learn_stats
+            print(f"Rollout {i + 1}/{len(chunks)}: {chunk['rows']} transitions, epochs {stats['epochs']}, "
+                  f"approx KL {stats['approx_kl']:.4f}, {update_seconds:.2f}s")
+
+    transitions = sum(chunk["rows"] for chunk in chunks)
+    elapsed = time.perf_counter() - start
+    print(f"\nReplayed {len(chunks)} rollouts ({transitions} transitions) in {elapsed:.1f}s, "
+          f"{transitions / learn_seconds:.0f} transitions/s through learn")
+    print(f"Weights digest: {weights_digest(model)}")
+    if metrics is not None:
+        metrics.close()
+    report_timers(args)
+
+
+if __name__ == "__main__":
+    replay(parse_args())
@@ -0,0 +1,200 @@
+import argparse
+import time
+
+from ai.env.racetrack_env import RacetrackEnv
+from ai.ppo.ppo import Agent
+from ai.ppo.ppo_checkpoint import CheckpointManager
+from ai.ppo.ppo_metrics import MetricsLogger
+from ai.ppo.ppo_recorder import TrajectoryRecorder
+from ai.ppo.ppo_rollout import RolloutWorkers
+from ai.ppo.ppo_telemetry import ProfileCapture, telemetry
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Train the PPO agent on the headless racetrack simulator (no browser, UI or Node needed).")
+    parser.add_argument('--episodes', type=int, default=200,
+                        help="Number of games to play before stopping.")
+    parser.add_argument('--train-frequency', type=int, default=20,
+                        help="Completed games between training rounds, as in app.py.")
+    parser.add_argument('--save-dir', default='./ai/saved_ppo_tf_models_headless',
+                        help="Where actor/critic models are saved after each training round.")
+    parser.add_argument('--max-steps', type=int, default=2000,
+                        help="Steps after which an unfinished game is cut off.")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Rollout worker processes. 0 plays one game at a time in this process.")
+    parser.add_argument('--envs-per-worker', type=int, default=16,
+                        help="Cars each worker steps together in a VectorEnv.")
+    parser.add_argument('--rollout-steps', type=int, default=256,
+                        help="Steps each worker plays between checks for new weights.")
+    parser.add_argument('--async', dest='asynchronous', action='store_true',
+                        help="Keep collecting while the learner trains instead of pausing every worker.")
+    parser.add_argument('--max-policy-lag', type=int, default=None,
+                        help="With --async, drop episodes played by a policy this many updates old.")
+    parser.add_argument('--keep-checkpoints', type=int, default=3,
+                        help="Most recent checkpoints to keep, besides the best one.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue from the latest checkpoint in --save-dir.")
+    parser.add_argument('--profile-updates', type=int, default=0,
+                        help="Profile the first N training updates into --save-dir/profiles.")
+    parser.add_argument('--profile-mode', choices=['cprofile', 'tf'], default='cprofile')
+    parser.add_argument('--batch-size', type=int, default=64,
+                        help="Minibatch size of the update (see benchmarks/autotune_batch_size.py).")
+    parser.add_argument('--target-kl', type=float, default=None,
+                        help="Skip the remaining epochs of an update once an epoch's mean approximate KL exceeds this.")
+    parser.add_argument('--normalize-obs', action='store_true',
+                        help="Standardize observations with running statistics (saved and exported with the models).")
+    parser.add_argument('--scale-rewards', action='store_true',
+                        help="Divide rewards by the running standard deviation of the discounted return.")
+    parser.add_argument('--normalize-advantages', action='store_true',
+                        help="Standardize the advantages of every update.")
+    parser.add_argument('--record', action='store_true',
+                        help="Record every rollout to --save-dir/recordings for replay_trajectories.py.")
+    parser.add_argument('--timers', action='store_true',
+                        help="Print the per-stage timers at the end of the run.")
+    return parser.parse_args()
+
+
+def make_agent(env, args):
+    """Returns the agent, its checkpoint manager and the number of games already played."""
+    model = Agent(n_actions=env.action_space,
+                  input_dims=env.state_space,
+                  save_folder_actor=f"{args.save_dir}/actor",
+                  save_folder_critic=f"{args.save_dir}/critic",
+                  batch_size=args.batch_size,
+                  target_kl=args.target_kl,
+                  normalize_obs=args.normalize_obs,
+                  scale_rewards=args.scale_rewards,
+                  normalize_advantage=args.normalize_advantages,
+                  recorder=TrajectoryRecorder(f"{args.save_dir}/recordings", env.action_space,
+                                              env.state_space) if args.record else None
+                  )
+    checkpoints = CheckpointManager(f"{args.save_dir}/checkpoints", keep_last=args.keep_checkpoints)
+    resumed = checkpoints.restore_latest(model) if args.resume else None
+    return model, checkpoints, resumed["episode"] if resumed else 0
+
+
+def make_profiler(args):
+    profiler = ProfileCapture(f"{args.save_dir}/profiles")
+    if args.profile_updates:
+        profiler.request(args.profile_updates, args.profile_mode)
+    return profiler
+
+
+def report_timers(args):
+    if not args.timers:
+        return
+    print(f"{'stage':>18} {'count':>8} {'mean (ms)':>10} {'total (s)':>10}")
+    for stage, timer in telemetry.snapshot()["stages"].items():
+        print(f"{stage:>18} {timer['count']:>8} {timer['mean_ms']:>10.3f} {timer['sum_seconds']:>10.2f}")
+
+
+def learn(model, checkpoints, metrics, profiler, total_completed_games, average_track_completion):
+    """Run a training round, then checkpoint it and log its metrics. Returns Agent.learn's result."""
+    start = time.perf_counter()
+    with profiler.update(total_completed_games):
+        did_train = model.learn(total_completed_games, average_track_completion)
+    update_seconds = time.perf_counter() - start
+    telemetry.observe("update", update_seconds)
+    if not did_train:
+        return False
+    metrics.log_update(total_completed_games, model.last_learn_stats, update_seconds)
+    checkpoints.save(model, total_completed_games, average_track_completion)
+    return True
+
+
+def train(args):
+    env = RacetrackEnv(max_steps=args.max_steps, seed=args.seed)
+    model, checkpoints, total_completed_games = make_agent(env, args)
+    metrics = MetricsLogger(f"{args.save_dir}/metrics.ndjson", append=args.resume)
+    profiler = make_profiler(args)
+
+    completed_games = 0
+    total_percentage_completed = 0
+    total_steps = 0
+    start = time.perf_counter()
+
+    for _ in range(args.episodes):
+        observation = env.reset()
+        done = False
+        episode_reward = 0
+        episode_steps = 0
+        while not done:
+            action, probs, value = model.choose_action(observation)
+            next_observation, reward, done, _ = env.step(action)
+            model.remember(observation, action, probs, value, reward, done, "headless")
+            observation = next_observation
+            episode_reward += reward
+            episode_steps += 1
+        total_steps += episode_steps
+
+        total_completed_games += 1
+        completed_games += 1
+        total_percentage_completed += observation[0] * 100
+        metrics.log_episode(total_completed_games, observation[0] * 100, episode_reward, episode_steps)
+
+        if completed_games >= args.train_frequency:
+            average_track_completion = total_percentage_completed / completed_games
+            elapsed = time.perf_counter() - start
+            print(f"Games: {total_completed_games}, average % completed: {average_track_completion:.1f}, "
+                  f"steps/s: {total_steps / elapsed:.0f}")
+            learn(model, checkpoints, metrics, profiler, total_completed_games, average_track_completion)
+            completed_games = 0
+            total_percentage_completed = 0
+    checkpoints.wait()
+    metrics.close()
+    report_timers(args)
+
+
+def train_parallel(args):
+    env = RacetrackEnv(max_steps=args.max_steps)
+    model, checkpoints, total_completed_games = make_agent(env, args)
+    metrics = MetricsLogger(f"{args.save_dir}/metrics.ndjson", append=args.resume)
+    profiler = make_profiler(args)
+    workers = RolloutWorkers(args.workers, envs_per_worker=args.envs_per_worker,
+                             rollout_steps=args.rollout_steps, synchronous=not args.asynchronous,
+                             max_policy_lag=args.max_policy_lag, seed=args.seed,
+                             max_steps=args.max_steps).start(model)
+
+    completed_games = 0
+    total_percentage_completed = 0
+    last_game = total_completed_games + args.episodes
+    start = time.perf_counter()
+    try:
+        while total_completed_games < last_game:
+            for rollout in workers.collect():
+                model.remember_batch(rollout['states'], rollout['actions'], rollout['probs'],
+                                     rollout['vals'], rollout['rewards'], rollout['dones'],
+                                     rollout['agent_ids'])
+                for completion in rollout['completion']:
+                    total_completed_games += 1
+                    metrics.log_episode(total_completed_games, completion)
+                completed_games += len(rollout['completion'])
+                total_percentage_completed += rollout['completion'].sum()
+
+            if completed_games >= args.train_frequency:
+                average_track_completion = total_percentage_completed / completed_games
+                elapsed = time.perf_counter() - start
+                print(f"Games: {total_completed_games}, average % completed: {average_track_completion:.1f}, "
+                      f"steps/s: {workers.stats['env_steps'] / elapsed:.0f}, "
+                      f"mean policy lag: {workers.mean_policy_lag():.2f}")
+                if learn(model, checkpoints, metrics, profiler, total_completed_games, average_track_completion):
+                    workers.resume(model)
+                    completed_games = 0
+                    total_percentage_completed = 0
+                    continue
+            workers.resume()
+    finally:
+        workers.stop()
+        checkpoints.wait()
+        metrics.close()
+        report_timers(args)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.workers > 0:
+        train_parallel(args)
+    else:
+        train(args)
@@ -4,6 +4,8 @@ class PPOAgent {
   constructor(path_to_tfjs_actor, path_to_tfjs_critic, actions_list, action_mappings, state_space) {
     this.path_to_tfjs_actor = path_to_tfjs_actor + '/model.json';
     this.path_to_tfjs_critic = path_to_tfjs_critic + '/model.json';
+    this.path_to_normalizer = path_to_tfjs_actor + '/normalizer.json';
+    this.normalizer = null;
     this.actions_list = actions_list;
     this.action_mappings = action_mappings;
     this.state_space = state_space;
@@ -14,13 +16,37 @@ class PPOAgent {
   async loadModels() {
     this.actorModel = await tf.loadGraphModel(this.path_to_tfjs_actor);
     this.criticModel = await tf.loadGraphModel(this.path_to_tfjs_critic);
+    this.normalizer = await this.loadNormalizer();
     // console.log('Actor and critic models loaded');
     // console.log(this.actorModel);
     // console.log(this.criticModel);
   }
 
+  // Running observation statistics exported with models trained with normalization;
+  // older models were trained on the raw state and have none
+  async loadNormalizer() {
+    try {
+      const response = await fetch(this.path_to_normalizer);
+      if (!response.ok) {
+        return null;
+      }
+      const { mean, var: variance, clip, epsilon } = await response.json();
+      return { mean, scale: variance.map(v => 1 / Math.sqrt(v + epsilon)), clip };
+    } catch (error) {
+      return null;
+    }
+  }
+
+  normalize(stateArray) {
+    if (!this.normalizer) {
+      return stateArray;
+    }
+    const { mean, scale, clip } = this.normalizer;
+    return stateArray.map((x, i) => Math.min(Math.max((Number(x) - mean[i]) * scale[i], -clip), clip));
+  }
+
   async chooseAction(stateObject) {
-    const stateArray = Object.values(stateObject);
+    const stateArray = this.normalize(Object.values(stateObject));
 
     // Create a tensor from the state array
     const n = this.state_space;
@@ -0,0 +1,20 @@
+"""
+WSGI entry point for serving the training API with gunicorn:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app owns the model, the inference batcher and the background learner, so it
+must run in exactly one process; gunicorn.conf.py keeps it to one worker with
+many threads. Set PPO_RESUME=1 to continue from the latest checkpoint and
+PPO_SAVED_MODELS_DIR to train into another directory. PPO_RECORD=1 records
+every rollout for replay_trajectories.py. Build the UI first with
+`python app.py --build` if it should be served too.
+"""
+import os
+
+from app import SAVED_MODELS_DIR, create_app, make_config, update_config
+
+update_config(True)
+app = create_app(make_config(os.environ.get('PPO_SAVED_MODELS_DIR', SAVED_MODELS_DIR),
+                             record=os.environ.get('PPO_RECORD') == '1'),
+                 resume=os.environ.get('PPO_RESUME') == '1')